@@ -0,0 +1,348 @@
+import json
+
+# AudioSessionState value pycaw reports once a session is gone for good
+AUDIO_SESSION_STATE_EXPIRED = 2
+
+
+class AudioSession:
+    """One application audio session as seen by a backend"""
+
+    def __init__(self, pid, name, identifier, handle=None):
+        self.pid = pid
+        self.name = name
+        self.identifier = identifier
+        self.handle = handle
+
+    @property
+    def key(self):
+        return (self.pid, self.identifier)
+
+    def __repr__(self):
+        return f"AudioSession(pid={self.pid}, name={self.name!r})"
+
+
+class SessionControls:
+    """Meter and volume access for one session, resolved once and reused"""
+
+    def __init__(self, backend, session):
+        self._backend = backend
+        self._session = session
+
+    def get_peak(self):
+        return self._backend.get_peak(self._session)
+
+    def get_volume(self):
+        return self._backend.get_volume(self._session)
+
+    def set_volume(self, level):
+        self._backend.set_volume(self._session, level)
+
+
+class AudioBackend:
+    """Enumerate sessions, read their peak meter and get/set their volume"""
+
+    # Backends that can push session created/expired events set this and
+    # implement subscribe()/unsubscribe()/watch_session()
+    supports_notifications = False
+
+    def thread_init(self):
+        """Prepare the calling worker thread for backend calls"""
+
+    def subscribe(self, on_created, on_expired):
+        """Deliver session created/expired events; returns True if active"""
+        return False
+
+    def unsubscribe(self):
+        pass
+
+    def watch_session(self, session):
+        """Ask for an expired event when this particular session goes away"""
+
+    def get_sessions(self):
+        raise NotImplementedError
+
+    def get_peak(self, session):
+        raise NotImplementedError
+
+    def get_volume(self, session):
+        raise NotImplementedError
+
+    def set_volume(self, session, level):
+        raise NotImplementedError
+
+    def is_alive(self, session):
+        """False once the session has expired or its process has exited"""
+        return True
+
+    def open_controls(self, session):
+        """Resolve the meter/volume handles for session"""
+        return SessionControls(self, session)
+
+    def find_session(self, name_variants):
+        """Return the first session whose process name contains one of name_variants"""
+        for session in self.get_sessions():
+            if session.name:
+                name_lower = session.name.lower()
+                if any(variant in name_lower for variant in name_variants):
+                    return session
+        return None
+
+
+class PycawBackend(AudioBackend):
+    """Windows Core Audio sessions through pycaw/comtypes"""
+
+    supports_notifications = True
+
+    def __init__(self):
+        from pycaw.pycaw import AudioUtilities, IAudioMeterInformation, ISimpleAudioVolume
+
+        self._utilities = AudioUtilities
+        self._meter_iid = IAudioMeterInformation
+        self._volume_iid = ISimpleAudioVolume
+        self._manager = None
+        self._created_callback = None
+        self._session_callbacks = {}
+        self._on_expired = None
+
+    def _wrap(self, session):
+        if not session.Process:
+            return None
+        try:
+            if session.State == AUDIO_SESSION_STATE_EXPIRED:
+                return None
+            process_name = session.Process.name()
+            identifier = session.InstanceIdentifier
+        except (AttributeError, OSError):
+            # Process may have terminated, skip it
+            return None
+        except Exception:
+            return None
+        return AudioSession(session.ProcessId, process_name, identifier, session)
+
+    def get_sessions(self):
+        sessions = []
+        for session in self._utilities.GetAllSessions():
+            wrapped = self._wrap(session)
+            if wrapped is not None:
+                sessions.append(wrapped)
+        return sessions
+
+    def thread_init(self):
+        # Core Audio session objects are free-threaded, so worker threads
+        # join the multithreaded apartment and share them with the monitor
+        import comtypes
+
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+
+    def subscribe(self, on_created, on_expired):
+        from pycaw.callbacks import AudioSessionNotification
+
+        backend = self
+
+        class _CreatedCallback(AudioSessionNotification):
+            def on_session_created(self, new_session):
+                on_created(backend._wrap(new_session))
+
+        self._on_expired = on_expired
+        self._manager = self._utilities.GetAudioSessionManager()
+        self._created_callback = _CreatedCallback()
+        self._manager.RegisterSessionNotification(self._created_callback)
+        # Windows only starts delivering notifications after one enumeration
+        self._manager.GetSessionEnumerator()
+        return True
+
+    def unsubscribe(self):
+        if self._manager is not None and self._created_callback is not None:
+            self._manager.UnregisterSessionNotification(self._created_callback)
+        for session, _ in self._session_callbacks.values():
+            try:
+                session.handle.unregister_notification()
+            except Exception:
+                pass
+        self._manager = None
+        self._created_callback = None
+        self._session_callbacks.clear()
+
+    def watch_session(self, session):
+        if self._on_expired is None or session.key in self._session_callbacks:
+            return
+        from pycaw.callbacks import AudioSessionEvents
+
+        on_expired = self._on_expired
+        callbacks = self._session_callbacks
+
+        class _SessionCallback(AudioSessionEvents):
+            def on_state_changed(self, new_state, new_state_id):
+                if new_state_id == AUDIO_SESSION_STATE_EXPIRED:
+                    callbacks.pop(session.key, None)
+                    on_expired(session)
+
+            def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+                callbacks.pop(session.key, None)
+                on_expired(session)
+
+        callback = _SessionCallback()
+        session.handle.register_notification(callback)
+        callbacks[session.key] = (session, callback)
+
+    def get_peak(self, session):
+        meter = session.handle._ctl.QueryInterface(self._meter_iid)
+        return meter.GetPeakValue()
+
+    def get_volume(self, session):
+        vol_iface = session.handle._ctl.QueryInterface(self._volume_iid)
+        return vol_iface.GetMasterVolume()
+
+    def set_volume(self, session, level):
+        vol_iface = session.handle._ctl.QueryInterface(self._volume_iid)
+        vol_iface.SetMasterVolume(level, None)
+
+    def is_alive(self, session):
+        try:
+            if session.handle.State == AUDIO_SESSION_STATE_EXPIRED:
+                return False
+            process = session.handle.Process
+            return bool(process and process.is_running())
+        except Exception:
+            return False
+
+    def open_controls(self, session):
+        meter = session.handle._ctl.QueryInterface(self._meter_iid)
+        vol_iface = session.handle._ctl.QueryInterface(self._volume_iid)
+        return _PycawControls(meter, vol_iface)
+
+
+class _PycawControls:
+    """COM interfaces queried once per session instead of once per call"""
+
+    def __init__(self, meter, vol_iface):
+        self.get_peak = meter.GetPeakValue
+        self.get_volume = vol_iface.GetMasterVolume
+        self._vol_iface = vol_iface
+
+    def set_volume(self, level):
+        self._vol_iface.SetMasterVolume(level, None)
+
+
+class PeakTrace:
+    """Scripted peak meter readings sampled at a fixed rate
+
+    events lists the (onset, end) times in seconds where the trace contains
+    audio the limiter is expected to catch.
+    """
+
+    def __init__(self, peaks, sample_rate=100.0, events=None, name="discord.exe",
+                 start=0.0, end=None):
+        # start/end bound the lifetime of the simulated session itself
+        self.peaks = [float(p) for p in peaks]
+        self.sample_rate = float(sample_rate)
+        self.events = [tuple(e) for e in (events or [])]
+        self.name = name
+        self.start = float(start)
+        self.end = end
+
+    @property
+    def duration(self):
+        return len(self.peaks) / self.sample_rate
+
+    def peak_at(self, t):
+        # Clock times built up from repeated additions land a hair short of
+        # the sample they were scheduled for
+        index = int((t - self.start) * self.sample_rate + 1e-6)
+        if 0 <= index < len(self.peaks):
+            return self.peaks[index]
+        return 0.0
+
+    def is_alive(self, t):
+        return t >= self.start and (self.end is None or t < self.end)
+
+    @classmethod
+    def load(cls, path):
+        """Load a trace from JSON: {"sample_rate", "peaks", "events", "name"}"""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(
+            data["peaks"],
+            sample_rate=data.get("sample_rate", 100.0),
+            events=data.get("events", []),
+            name=data.get("name", "discord.exe"),
+            start=data.get("start", 0.0),
+            end=data.get("end"),
+        )
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "name": self.name,
+                "sample_rate": self.sample_rate,
+                "events": [list(e) for e in self.events],
+                "start": self.start,
+                "end": self.end,
+                "peaks": self.peaks,
+            }, f)
+
+
+class SimulatedBackend(AudioBackend):
+    """Replays PeakTrace objects on a clock and records every volume write
+
+    With notifications=True it also acts as a fake notification source,
+    firing created/expired events at each trace's start and end time.
+    """
+
+    def __init__(self, clock, traces, meter_follows_volume=True, notifications=False):
+        self.clock = clock
+        self.meter_follows_volume = meter_follows_volume
+        self.supports_notifications = notifications
+        self._subscribed = False
+        self.volume_writes = []
+        self._sessions = []
+        self._traces = {}
+        self._volumes = {}
+        for index, trace in enumerate(traces):
+            pid = 1000 + index
+            session = AudioSession(pid, trace.name, f"sim-{pid}", trace)
+            self._sessions.append(session)
+            self._traces[pid] = trace
+            self._volumes[pid] = 1.0
+
+    def get_sessions(self):
+        now = self.clock.time()
+        return [s for s in self._sessions if self._traces[s.pid].is_alive(now)]
+
+    def get_peak(self, session):
+        peak = self._traces[session.pid].peak_at(self.clock.time())
+        if self.meter_follows_volume:
+            peak *= self._volumes[session.pid]
+        return peak
+
+    def get_volume(self, session):
+        return self._volumes[session.pid]
+
+    def set_volume(self, session, level):
+        self._volumes[session.pid] = level
+        self.volume_writes.append((self.clock.time(), session.pid, level))
+
+    def is_alive(self, session):
+        return self._traces[session.pid].is_alive(self.clock.time())
+
+    def subscribe(self, on_created, on_expired):
+        if not self.supports_notifications:
+            return False
+        self._subscribed = True
+        now = self.clock.time()
+        for session in self._sessions:
+            trace = self._traces[session.pid]
+            if trace.start > now:
+                self.clock.schedule(trace.start, self._notifier(on_created, session))
+            if trace.end is not None and trace.end > now:
+                self.clock.schedule(trace.end, self._notifier(on_expired, session))
+        return True
+
+    def unsubscribe(self):
+        self._subscribed = False
+
+    def _notifier(self, callback, session):
+        def notify():
+            if self._subscribed:
+                callback(session)
+        return notify
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from worker import BackgroundWorker
+
+BINS = 100  # level resolution of 0.01
+# Samples below this are silence and say nothing about the usual level
+ACTIVE_LEVEL = 0.02
+MIN_TRIP = 0.1
+MAX_TRIP = 0.99
+# Decayed samples (at the fast rate) a baseline needs before it is trusted
+WARMUP_SECONDS = 60.0
+# Rescale the growing sample weight long before it can overflow
+MAX_WEIGHT = 2.0 ** 40
+
+
+class BaselineTable:
+    """Decaying level histograms, one per process name, as rows of one array
+
+    Levels are window means, as compared with the trip point. Each sample
+    adds a weight of 2 ** (age / half_life) to the bin of its
+    level instead of decaying every bin on every tick, so an update is a
+    single vectorized index-and-add whatever the number of sessions; the
+    weights are renormalised once they grow large. Memory is BINS floats
+    per process name. trip_levels() reads the configured quantile of each
+    histogram (a cumulative sum over BINS, run about once a second) and
+    puts the trip point margin_db above it. Background saves run on one
+    writer thread that start() creates and close() drains.
+    """
+
+    def __init__(self, quantile=0.95, margin_db=5.0, half_life=1800.0, sample_rate=50.0):
+        self.configure(quantile, margin_db, half_life, sample_rate)
+        self.names = []
+        self._counts = np.zeros((0, BINS))
+        self._stored = {}
+        self._origin = None
+        self._writer = BackgroundWorker("baseline-save", queue_size=2)
+
+    def configure(self, quantile, margin_db, half_life, sample_rate):
+        self.quantile = quantile
+        self.margin = 10.0 ** (margin_db / 20.0)
+        self.half_life = half_life
+        self.warmup = WARMUP_SECONDS * sample_rate
+
+    def _weight(self, now):
+        if self._origin is None:
+            self._origin = now
+        weight = 2.0 ** ((now - self._origin) / self.half_life)
+        if weight > MAX_WEIGHT:
+            self._counts /= weight
+            for name, counts in self._stored.items():
+                self._stored[name] = counts / weight
+            self._origin = now
+            weight = 1.0
+        return weight
+
+    def set_rows(self, names):
+        """Switch to a new set of rows, keeping every histogram learned so far"""
+        for row, name in enumerate(self.names):
+            self._stored[name] = self._counts[row]
+        self.names = list(names)
+        self._fill_rows()
+
+    def _fill_rows(self):
+        self._counts = np.array([self._stored.get(name, np.zeros(BINS)) for name in self.names]).reshape(-1, BINS)
+
+    def add(self, levels, count, now, mask=None):
+        """Count levels (one per row) as count fast-rate samples; mask picks the rows to learn from"""
+        if mask is None and len(levels) == 1:
+            # Single-session fast path: plain float arithmetic, no temporary arrays
+            level = float(levels[0])
+            if level >= ACTIVE_LEVEL and len(self.names):
+                self._counts[0, min(int(level * BINS), BINS - 1)] += count * self._weight(now)
+            return
+        levels = np.asarray(levels, dtype=np.float64)
+        learn = levels >= ACTIVE_LEVEL
+        if mask is not None:
+            learn &= mask
+        if not learn.any():
+            return
+        rows = np.flatnonzero(learn)
+        bins = np.minimum((levels[rows] * BINS).astype(np.int64), BINS - 1)
+        self._counts[rows, bins] += count * self._weight(now)
+
+    def baselines(self, now):
+        """Learned quantile level per row, NaN for rows still warming up"""
+        if not len(self.names):
+            return np.zeros(0)
+        cumulative = np.cumsum(self._counts, axis=1)
+        totals = cumulative[:, -1]
+        target = self.quantile * totals
+        index = np.minimum((cumulative < target[:, None]).sum(axis=1), BINS - 1)
+        rows = np.arange(len(self.names))
+        below = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0.0)
+        inside = np.maximum(self._counts[rows, index], 1e-300)
+        levels = (index + np.clip((target - below) / inside, 0.0, 1.0)) / BINS
+        warm = totals / self._weight(now) >= self.warmup
+        return np.where(warm, levels, np.nan)
+
+    def trip_levels(self, fallback, now):
+        """Trip point per row: margin above the baseline, or fallback until it is learned"""
+        levels = self.baselines(now) * self.margin
+        return np.where(np.isnan(levels), fallback, np.clip(levels, MIN_TRIP, MAX_TRIP))
+
+    def snapshot(self, now):
+        """Every histogram scaled to weight 1 at now (what save() writes)"""
+        weight = self._weight(now)
+        histograms = {name: counts / weight for name, counts in self._stored.items()}
+        for row, name in enumerate(self.names):
+            histograms[name] = self._counts[row] / weight
+        return histograms
+
+    def load(self, path, now):
+        """Restore histograms saved by save(); a missing or unreadable file starts fresh"""
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            saved = {name: np.asarray(counts, dtype=np.float64) for name, counts in data["baselines"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        weight = self._weight(now)
+        # Time spent stopped does not age the baseline
+        self._stored = {name: counts * weight for name, counts in saved.items() if counts.shape == (BINS,)}
+        # Rows already set take the loaded histograms, not the empty ones they had
+        self._fill_rows()
+        return True
+
+    def start(self):
+        """Start the writer thread used by save(background=True)"""
+        self._writer.start()
+
+    def close(self):
+        """Finish any background save still queued"""
+        self._writer.stop()
+
+    def save(self, path, now, background=False):
+        """Write the histograms as JSON (atomically; on the writer thread if background)"""
+        data = {
+            "version": 1,
+            "bins": BINS,
+            "saved": time.time(),
+            "baselines": {name: [round(float(c), 4) for c in counts]
+                          for name, counts in self.snapshot(now).items()},
+        }
+        if background:
+            self._writer.submit(_write_json, path, data)
+        else:
+            _write_json(path, data)
+
+
+def _write_json(path, data):
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"\n⚠️  Failed to save the adaptive baseline: {e}")
+
+
+def describe(levels):
+    """Baseline levels as percentages for display ("learning" while warming up)"""
+    return ", ".join("learning" if math.isnan(level) else f"{level * 100:.0f}%" for level in levels)
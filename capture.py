@@ -0,0 +1,390 @@
+import argparse
+import math
+import sys
+import time
+import wave
+
+import numpy as np
+
+from clock import SystemClock
+from distortion import DistortionAnalyzer
+
+# BS.1770 K-weighting: high shelf followed by a high-pass, given as analog
+# prototypes (libebur128 parameterisation) so any sample rate works
+SHELF_GAIN_DB = 3.999843853973347
+SHELF_Q = 0.7071752369554196
+SHELF_FREQ = 1681.974450955533
+SHELF_VB_EXPONENT = 0.4996667741545416
+HIGHPASS_Q = 0.5003270373238773
+HIGHPASS_FREQ = 38.13547087613982
+LUFS_OFFSET = -0.691
+
+SHORT_TERM_SECONDS = 3.0
+MOMENTARY_SECONDS = 0.4
+# Silence floor so log10 never sees zero
+MIN_ENERGY = 1e-12
+
+
+def k_weighting_coefficients(sample_rate):
+    """(b, a) coefficient pairs of the two K-weighting biquads"""
+    K = math.tan(math.pi * SHELF_FREQ / sample_rate)
+    Vh = 10 ** (SHELF_GAIN_DB / 20)
+    Vb = Vh ** SHELF_VB_EXPONENT
+    a0 = 1 + K / SHELF_Q + K * K
+    shelf_b = [
+        (Vh + Vb * K / SHELF_Q + K * K) / a0,
+        2 * (K * K - Vh) / a0,
+        (Vh - Vb * K / SHELF_Q + K * K) / a0,
+    ]
+    shelf_a = [1.0, 2 * (K * K - 1) / a0, (1 - K / SHELF_Q + K * K) / a0]
+
+    K = math.tan(math.pi * HIGHPASS_FREQ / sample_rate)
+    a0 = 1 + K / HIGHPASS_Q + K * K
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (K * K - 1) / a0, (1 - K / HIGHPASS_Q + K * K) / a0]
+    return [(shelf_b, shelf_a), (highpass_b, highpass_a)]
+
+
+def k_weighting_power(sample_rate, n_fft):
+    """|H(f)|^2 of the K-weighting filter at every rfft bin"""
+    z = np.exp(-1j * 2 * np.pi * np.fft.rfftfreq(n_fft))
+    response = np.ones_like(z)
+    for b, a in k_weighting_coefficients(sample_rate):
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(response) ** 2
+
+
+class LoudnessMeter:
+    """Block RMS and K-weighted loudness computed in the frequency domain
+
+    Each block is transformed with one rfft; by Parseval the mean square of
+    the block is a weighted sum of the bin powers, so applying the K-weighting
+    is just a different set of weights rather than a per-sample IIR filter.
+    Short-term (3 s) and momentary (400 ms) loudness are energy averages over
+    a ring of recent block results.
+    """
+
+    def __init__(self, sample_rate, block_size):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        bins = block_size // 2 + 1
+        # Parseval weights: interior bins appear twice in the full spectrum
+        parseval = np.full(bins, 2.0)
+        parseval[0] = 1.0
+        if block_size % 2 == 0:
+            parseval[-1] = 1.0
+        parseval /= float(block_size) ** 2
+        self._plain_weights = parseval
+        self._k_weights = parseval * k_weighting_power(sample_rate, block_size)
+
+        block_seconds = block_size / float(sample_rate)
+        self._short_blocks = max(1, int(round(SHORT_TERM_SECONDS / block_seconds)))
+        self._momentary_blocks = max(1, int(round(MOMENTARY_SECONDS / block_seconds)))
+        self._history = np.zeros(self._short_blocks)
+        self._blocks = 0
+        self.rms = 0.0
+        self.block_lufs = -math.inf
+
+    def analyze(self, blocks):
+        """Mean square and K-weighted mean square of (n_blocks, block_size, channels)"""
+        power = np.abs(np.fft.rfft(blocks, axis=1)) ** 2
+        plain = np.einsum("nkc,k->nc", power, self._plain_weights)
+        weighted = np.einsum("nkc,k->nc", power, self._k_weights)
+        return plain, weighted
+
+    def update(self, blocks):
+        """Feed (n_blocks, block_size, channels) samples scaled to -1..1"""
+        plain, weighted = self.analyze(blocks)
+        # Channel energies add (BS.1770 gain 1.0 for front channels)
+        energies = weighted.sum(axis=1)
+        n = len(energies)
+        kept = min(n, self._short_blocks)
+        end = self._blocks + n
+        self._history[np.arange(end - kept, end) % self._short_blocks] = energies[-kept:]
+        self._blocks = end
+        self.rms = math.sqrt(float(plain[-1].mean()))
+        self.block_lufs = energy_to_lufs(energies[-1])
+        return energies
+
+    def _recent_energy(self, count):
+        count = min(count, self._blocks, self._short_blocks)
+        if count == 0:
+            return 0.0
+        end = self._blocks % self._short_blocks
+        indices = np.arange(end - count, end) % self._short_blocks
+        return float(self._history[indices].mean())
+
+    @property
+    def short_term_lufs(self):
+        return energy_to_lufs(self._recent_energy(self._short_blocks))
+
+    @property
+    def momentary_lufs(self):
+        return energy_to_lufs(self._recent_energy(self._momentary_blocks))
+
+    def reset(self):
+        self._history[:] = 0.0
+        self._blocks = 0
+        self.rms = 0.0
+        self.block_lufs = -math.inf
+
+
+def energy_to_lufs(energy):
+    return LUFS_OFFSET + 10 * math.log10(max(float(energy), MIN_ENERGY))
+
+
+class PcmRingBuffer:
+    """Preallocated float32 ring of interleaved frames shared by producer and consumer
+
+    The capture callback is the only writer and the monitor tick the only
+    reader; the frame counter is advanced after the data lands, so the
+    reader never sees a half-written block.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.written = 0
+
+    def write(self, frames, scale=1.0):
+        """Copy (n, channels) frames in, converting/scaling straight into the ring"""
+        n = len(frames)
+        if n > self.capacity:
+            frames = frames[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        np.multiply(frames[:first], scale, out=self.data[start:start + first], casting="unsafe")
+        if first < n:
+            np.multiply(frames[first:], scale, out=self.data[:n - first], casting="unsafe")
+        self.written += n
+
+    def read(self, position, count):
+        """count frames starting at absolute frame position (a view when contiguous)"""
+        start = position % self.capacity
+        if start + count <= self.capacity:
+            return self.data[start:start + count]
+        return np.concatenate((self.data[start:], self.data[:start + count - self.capacity]))
+
+
+class WavFileSource:
+    """Plays a 16-bit WAV file into the pipeline in step with a clock
+
+    Instead of a playback thread, pump() hands over every frame that is due
+    by the clock's current time, so on a virtual clock the audio lines up
+    exactly with the simulated session.
+    """
+
+    def __init__(self, path, clock=None, frames_per_buffer=1024, loop=False):
+        self.path = path
+        self.clock = clock if clock is not None else SystemClock()
+        self.frames_per_buffer = frames_per_buffer
+        self.loop = loop
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+            self.sample_rate = wav.getframerate()
+            self.channels = wav.getnchannels()
+            self.frames = wav.getnframes()
+        self._samples = None
+        self._callback = None
+        self._started = 0.0
+        self._delivered = 0
+
+    def read_all(self):
+        """Whole file as an (n, channels) int16 view over the raw bytes"""
+        with wave.open(self.path, "rb") as wav:
+            raw = wav.readframes(wav.getnframes())
+        return np.frombuffer(raw, dtype="<i2").reshape(-1, self.channels)
+
+    def start(self, callback):
+        self._samples = self.read_all()
+        self._callback = callback
+        self._started = self.clock.time()
+        self._delivered = 0
+
+    def pump(self):
+        """Deliver every buffer that should have played by now"""
+        if self._callback is None or not len(self._samples):
+            return
+        due = int((self.clock.time() - self._started) * self.sample_rate)
+        total = len(self._samples)
+        if not self.loop:
+            due = min(due, total)
+        step = self.frames_per_buffer
+        while self._delivered < due:
+            offset = self._delivered % total
+            count = min(step, total - offset, due - self._delivered)
+            self._callback(self._samples[offset:offset + count])
+            self._delivered += count
+
+    def stop(self):
+        self._callback = None
+
+
+class LoopbackSource:
+    """Streams PCM from a capture device through a PyAudio callback
+
+    PyAudioWPatch (a PyAudio fork) exposes WASAPI loopback devices, so it is
+    preferred when installed; plain PyAudio works with any input device such
+    as "Stereo Mix" or a virtual cable.
+    """
+
+    def __init__(self, device_index=None, frames_per_buffer=1024):
+        try:
+            import pyaudiowpatch as pyaudio
+        except ImportError:
+            import pyaudio
+        self._pyaudio = pyaudio
+        self._audio = pyaudio.PyAudio()
+        self.frames_per_buffer = frames_per_buffer
+        info = self._find_device(device_index)
+        self.device_index = int(info["index"])
+        self.sample_rate = int(info["defaultSampleRate"])
+        self.channels = max(1, min(2, int(info["maxInputChannels"])))
+        self._stream = None
+
+    def _find_device(self, device_index):
+        if device_index is not None:
+            return self._audio.get_device_info_by_index(device_index)
+        if hasattr(self._audio, "get_default_wasapi_loopback"):
+            return self._audio.get_default_wasapi_loopback()
+        return self._audio.get_default_input_device_info()
+
+    def start(self, callback):
+        channels = self.channels
+
+        def on_audio(in_data, frame_count, time_info, status):
+            # View over PortAudio's buffer; the ring write is the only copy
+            callback(np.frombuffer(in_data, dtype="<i2").reshape(-1, channels))
+            return (None, self._pyaudio.paContinue)
+
+        self._stream = self._audio.open(
+            format=self._pyaudio.paInt16,
+            channels=channels,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=on_audio,
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+class CapturePipeline:
+    """Source → ring buffer → per-block loudness and distortion, polled from the monitor tick"""
+
+    def __init__(self, source, block_seconds=0.1, ring_seconds=10.0):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.block_size = max(1, int(round(block_seconds * self.sample_rate)))
+        capacity = max(self.block_size * 2, int(ring_seconds * self.sample_rate))
+        self.ring = PcmRingBuffer(capacity, source.channels)
+        self.meter = LoudnessMeter(self.sample_rate, self.block_size)
+        self.distortion = DistortionAnalyzer(self.sample_rate, source.channels)
+        self._position = 0
+        self.dropped_frames = 0
+
+    def on_frames(self, frames):
+        """Capture callback: int16 frames straight into the float ring"""
+        self.ring.write(frames, scale=1.0 / 32768.0)
+
+    def start(self):
+        self.source.start(self.on_frames)
+
+    def stop(self):
+        self.source.stop()
+
+    def poll(self):
+        """Analyse every complete block captured since the last poll"""
+        pump = getattr(self.source, "pump", None)
+        if pump is not None:
+            pump()
+        available = self.ring.written - self._position
+        if available > self.ring.capacity - self.block_size:
+            # Reader fell behind; skip to the freshest data that is intact
+            skip = available - (self.ring.capacity - self.block_size)
+            skip = -(-skip // self.block_size) * self.block_size
+            self.dropped_frames += skip
+            self._position += skip
+            available -= skip
+        blocks = available // self.block_size
+        if blocks <= 0:
+            return 0
+        frames = self.ring.read(self._position, blocks * self.block_size)
+        self._position += blocks * self.block_size
+        self.meter.update(frames.reshape(blocks, self.block_size, self.ring.channels))
+        self.distortion.feed(frames)
+        return blocks
+
+    @property
+    def rms(self):
+        return self.meter.rms
+
+    @property
+    def short_term_lufs(self):
+        return self.meter.short_term_lufs
+
+    @property
+    def distortion_score(self):
+        return self.distortion.score
+
+
+def open_capture(source_spec, clock=None, device_index=None):
+    """Build a pipeline for CAPTURE_SOURCE: "loopback" or a path to a WAV file"""
+    if source_spec == "loopback":
+        return CapturePipeline(LoopbackSource(device_index))
+    return CapturePipeline(WavFileSource(source_spec, clock=clock, loop=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Block RMS and K-weighted loudness of a WAV file")
+    parser.add_argument("wav", help="16-bit PCM WAV file")
+    parser.add_argument("--block", type=float, default=0.1, help="block length in seconds")
+    parser.add_argument("--benchmark", action="store_true", help="report analysis throughput")
+    args = parser.parse_args(argv)
+
+    source = WavFileSource(args.wav)
+    pipeline = CapturePipeline(source, block_seconds=args.block)
+    samples = source.read_all()
+
+    if args.benchmark:
+        block = pipeline.block_size
+        usable = len(samples) // block * block
+        blocks = (samples[:usable].reshape(-1, block, source.channels) / 32768.0).astype(np.float32)
+        repeats = 5
+        started = time.perf_counter()
+        for _ in range(repeats):
+            pipeline.meter.reset()
+            pipeline.meter.update(blocks)
+        elapsed = (time.perf_counter() - started) / repeats
+        audio_seconds = usable / float(source.sample_rate)
+        print(f"📊 {audio_seconds:.1f}s of audio analysed in {elapsed * 1000:.1f} ms"
+              f" ({audio_seconds / elapsed:.0f}x real time)")
+        print(f"   Short-term loudness at end: {pipeline.short_term_lufs:.1f} LUFS")
+        return 0
+
+    step = pipeline.block_size
+    for start in range(0, len(samples), step):
+        pipeline.on_frames(samples[start:start + step])
+        if pipeline.poll():
+            t = (start + step) / float(source.sample_rate)
+            print(f"{t:7.2f}s  RMS {pipeline.rms:5.3f}  short-term {pipeline.short_term_lufs:6.1f} LUFS"
+                  f"  momentary {pipeline.meter.momentary_lufs:6.1f} LUFS"
+                  f"  distortion {pipeline.distortion_score:4.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
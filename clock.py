@@ -0,0 +1,90 @@
+import heapq
+import threading
+import time
+
+
+class SystemClock:
+    """Wall clock used by the live monitor"""
+
+    def time(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """Block until event is set or timeout passes; True if it was set"""
+        return event.wait(timeout)
+
+
+class VirtualClock:
+    """Deterministic clock that only advances when the driving thread sleeps
+
+    The thread that creates the clock owns it: its sleep() calls move virtual
+    time forward instantly. Any other thread that sleeps blocks until the
+    driver has advanced past its deadline, so helper threads still observe
+    the same timeline as the code under test.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._cond = threading.Condition()
+        self._driver = threading.get_ident()
+        self._scheduled = []
+        self._sequence = 0
+        self._closed = False
+
+    def time(self):
+        return self._now
+
+    def schedule(self, when, callback):
+        """Run callback on the driver thread once virtual time reaches when"""
+        with self._cond:
+            heapq.heappush(self._scheduled, (when, self._sequence, callback))
+            self._sequence += 1
+
+    def sleep(self, seconds):
+        seconds = max(float(seconds), 0.0)
+        if threading.get_ident() != self._driver:
+            with self._cond:
+                deadline = self._now + seconds
+                while self._now < deadline and not self._closed:
+                    self._cond.wait()
+            return
+
+        with self._cond:
+            target = self._now + seconds
+        # Fire scheduled callbacks in order, each at its own timestamp
+        while True:
+            with self._cond:
+                if not self._scheduled or self._scheduled[0][0] > target:
+                    break
+                when, _, callback = heapq.heappop(self._scheduled)
+                self._now = max(self._now, when)
+                self._cond.notify_all()
+            callback()
+        with self._cond:
+            self._now = max(self._now, target)
+            self._cond.notify_all()
+        # Give woken helper threads a chance to run before the next step
+        time.sleep(0)
+
+    def wait(self, event, timeout):
+        """Block until event is set or timeout passes in virtual time"""
+        if threading.get_ident() == self._driver:
+            if not event.is_set():
+                self.sleep(timeout)
+            return event.is_set()
+        with self._cond:
+            deadline = self._now + max(float(timeout), 0.0)
+            while not event.is_set() and self._now < deadline and not self._closed:
+                # Events are set outside the clock, so re-check them periodically
+                self._cond.wait(0.01)
+        return event.is_set()
+
+    def close(self):
+        """Release every thread still waiting on virtual time"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
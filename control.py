@@ -0,0 +1,427 @@
+import argparse
+import hmac
+import json
+import os
+import queue
+import secrets
+import selectors
+import socket
+import sys
+import threading
+
+DEFAULT_PORT = 9465
+# A request line longer than this closes the connection
+MAX_REQUEST_BYTES = 64 * 1024
+# A subscriber this far behind is disconnected rather than buffered forever
+MAX_PENDING_BYTES = 1024 * 1024
+MAX_CLIENTS = 64
+EVENT_TYPES = ("incident", "state", "config", "pause")
+# Written next to config.json, readable by its owner only
+TOKEN_FILE = "control.token"
+
+
+class _Client:
+    __slots__ = ("sock", "inbox", "outbox", "events", "closing")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.events = None
+        self.closing = False
+
+
+class ControlServer:
+    """Local JSON Lines control socket for status, settings and events
+
+    Clients send one JSON object per line ({"cmd": "status", "id": 1})
+    and get one JSON line back with the same id. One selector thread,
+    started once by start(), accepts, reads and writes for every client,
+    so any number of them cost no extra threads. Requests are not run on
+    that thread: they are queued for the monitor loop, which calls
+    serve() between ticks and answers them with the limiter state it
+    owns, so nothing is read or changed halfway through a tick. A
+    subscribed client also receives every event passed to publish();
+    each event is encoded once and appended to the subscribers' buffers.
+    Listens on 127.0.0.1 only, or on a Unix socket readable by the owner.
+    Any local user can reach the TCP port, so there requests that change
+    anything (config set, pause, resume) must carry the token start()
+    writes to token_path.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, path=None, host="127.0.0.1", max_clients=MAX_CLIENTS,
+                 token_path=None):
+        self.port = port
+        self.path = path
+        self.host = host
+        self.max_clients = max_clients
+        self.token_path = token_path
+        self.token = None
+        self.served = 0
+        self.published = 0
+        self.disconnected_slow = 0
+        self._requests = queue.SimpleQueue()
+        self._clients = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._selector = None
+        self._listener = None
+        self._wake_read = None
+        self._wake_write = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.path if self.path else f"{self.host}:{self.port}"
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.path:
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("Unix sockets are not available here; use CONTROL_PORT instead")
+            if os.path.exists(self.path):
+                # Left behind by a previous run
+                os.remove(self.path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self.path)
+            os.chmod(self.path, 0o600)
+        else:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, self.port))
+            # Port 0 picks a free port; report the real one
+            self.port = listener.getsockname()[1]
+            self.token = secrets.token_urlsafe(32)
+            if self.token_path:
+                try:
+                    _write_private(self.token_path, self.token)
+                except OSError:
+                    listener.close()
+                    raise
+        listener.listen(16)
+        listener.setblocking(False)
+        self._listener = listener
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self._wake_write.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(listener, selectors.EVENT_READ)
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake()
+        self._thread.join(timeout=5.0)
+        self._thread = None
+        for client in list(self._clients.values()):
+            self._close(client)
+        self._selector.close()
+        self._listener.close()
+        self._wake_read.close()
+        self._wake_write.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        if self.token and self.token_path and os.path.exists(self.token_path):
+            os.remove(self.token_path)
+
+    def serve(self, handler, limit=32):
+        """Answer queued requests with handler(request) -> dict (called from the monitor loop)"""
+        count = 0
+        while count < limit:
+            try:
+                client, request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            if client.closing:
+                continue
+            try:
+                if request.get("cmd") == "subscribe":
+                    response = self._subscribe(client, request)
+                elif not self._authorized(request):
+                    response = {"ok": False, "error": f"{request['cmd']} needs the control token"
+                                + (f" from {self.token_path}" if self.token_path else "")}
+                else:
+                    response = handler(request)
+            except Exception as e:
+                # A bad request must never reach the monitor loop's error back-off
+                response = {"ok": False, "error": str(e) or type(e).__name__}
+            response.setdefault("ok", True)
+            if "id" in request:
+                response["id"] = request["id"]
+            self._send(client, response)
+        self.served += count
+        return count
+
+    def _authorized(self, request):
+        """False for a state-changing request over TCP without the right token"""
+        if self.token is None:
+            # Unix socket: only its owner can connect
+            return True
+        cmd = request["cmd"]
+        if cmd not in ("pause", "resume") and not (cmd == "config" and "set" in request):
+            return True
+        return hmac.compare_digest(str(request.get("token", "")), self.token)
+
+    def publish(self, event, **fields):
+        """Send an event to every subscriber that asked for its type"""
+        if not self._subscribers:
+            return
+        line = (json.dumps({"event": event, **fields}, separators=(",", ":"), default=str) + "\n").encode()
+        with self._lock:
+            for client in self._subscribers:
+                if client.events and event not in client.events:
+                    continue
+                self._queue_bytes(client, line)
+        self.published += 1
+        self._wake()
+
+    def _subscribe(self, client, request):
+        events = request.get("events") or EVENT_TYPES
+        if isinstance(events, str):
+            events = [events]
+        if not isinstance(events, (list, tuple)) or not all(isinstance(event, str) for event in events):
+            return {"ok": False, "error": "events must be an event type or a list of them"}
+        unknown = [event for event in events if event not in EVENT_TYPES]
+        if unknown:
+            return {"ok": False, "error": f"unknown event type {unknown[0]!r} (expected {', '.join(EVENT_TYPES)})"}
+        with self._lock:
+            client.events = set(events)
+            if client not in self._subscribers:
+                self._subscribers = self._subscribers + [client]
+        return {"subscribed": sorted(client.events)}
+
+    def _send(self, client, message):
+        line = (json.dumps(message, separators=(",", ":"), default=str) + "\n").encode()
+        with self._lock:
+            self._queue_bytes(client, line)
+        self._wake()
+
+    def _queue_bytes(self, client, data):
+        # Called with the lock held
+        if client.closing:
+            return
+        if len(client.outbox) + len(data) > MAX_PENDING_BYTES:
+            client.closing = True
+            self.disconnected_slow += 1
+            return
+        client.outbox += data
+
+    def _wake(self):
+        try:
+            self._wake_write.send(b"\0")
+        except (OSError, AttributeError):
+            # Already woken (buffer full) or stopped
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, mask in self._selector.select(timeout=1.0):
+                if key.fileobj is self._listener:
+                    self._accept()
+                elif key.fileobj is self._wake_read:
+                    try:
+                        while self._wake_read.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(client)
+                    if mask & selectors.EVENT_WRITE and not client.closing:
+                        self._flush(client)
+            self._flush_all()
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except OSError:
+            return
+        if len(self._clients) >= self.max_clients:
+            sock.close()
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        self._clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            client.closing = True
+            return
+        client.inbox += data
+        while True:
+            end = client.inbox.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(client.inbox[:end]).strip()
+            del client.inbox[:end + 1]
+            if line:
+                self._parse(client, line)
+        if len(client.inbox) > MAX_REQUEST_BYTES:
+            client.closing = True
+
+    def _parse(self, client, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self._send(client, {"ok": False, "error": f"invalid JSON ({e})"})
+            return
+        if not isinstance(request, dict) or not isinstance(request.get("cmd"), str):
+            self._send(client, {"ok": False, "error": 'requests are objects with a "cmd" string'})
+            return
+        self._requests.put((client, request))
+
+    def _flush_all(self):
+        for client in list(self._clients.values()):
+            if client.outbox and not client.closing:
+                self._flush(client)
+            if client.closing:
+                self._close(client)
+
+    def _flush(self, client):
+        with self._lock:
+            if not client.outbox:
+                return
+            try:
+                sent = client.sock.send(client.outbox)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                client.closing = True
+                return
+            del client.outbox[:sent]
+            pending = bool(client.outbox)
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        self._selector.modify(client.sock, events, client)
+
+    def _close(self, client):
+        with self._lock:
+            client.closing = True
+            if client in self._subscribers:
+                self._subscribers = [other for other in self._subscribers if other is not client]
+        self._clients.pop(client.sock.fileno(), None)
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+
+def _write_private(path, text):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+
+
+def read_token(path):
+    """Token from a control.token file, or None if it cannot be read"""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class ControlClient:
+    """Blocking client for the control socket (one request at a time)"""
+
+    def __init__(self, port=DEFAULT_PORT, path=None, host="127.0.0.1", timeout=5.0, token=None):
+        self.token = token
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def request(self, cmd, **fields):
+        """Send one request and return its response, skipping any events in between"""
+        self._next_id += 1
+        if self.token:
+            fields["token"] = self.token
+        self.sock.sendall((json.dumps({"cmd": cmd, "id": self._next_id, **fields}) + "\n").encode())
+        while True:
+            message = self.receive()
+            if message.get("id") == self._next_id:
+                return message
+
+    def receive(self):
+        """Next message from the server (a response or a subscribed event)"""
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("control socket closed")
+        return json.loads(line)
+
+    def close(self):
+        self._file.close()
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Talk to a running limiter over its control socket")
+    parser.add_argument("cmd", choices=("status", "peaks", "config", "pause", "resume", "subscribe"))
+    parser.add_argument("settings", nargs="*", metavar="KEY=VALUE",
+                        help="settings to change with config (values are JSON)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Unix socket path (CONTROL_SOCKET) instead of the port")
+    parser.add_argument("--seconds", type=float, default=2.0, help="history to fetch with peaks")
+    parser.add_argument("--save", action="store_true", help="also write config changes to config.json")
+    parser.add_argument("--events", help="comma-separated event types to subscribe to (default: all)")
+    parser.add_argument("--token-file", default=TOKEN_FILE,
+                        help="token for config changes and pause/resume over the port (default: %(default)s)")
+    # Settings may follow the options: config --socket ctl.sock THRESHOLD=0.8
+    args = parser.parse_intermixed_args(argv)
+
+    client = ControlClient(args.port, args.socket, token=None if args.socket else read_token(args.token_file))
+    try:
+        if args.cmd == "subscribe":
+            events = args.events.split(",") if args.events else None
+            print(json.dumps(client.request("subscribe", events=events)))
+            client.sock.settimeout(None)
+            while True:
+                print(json.dumps(client.receive()), flush=True)
+        fields = {}
+        if args.cmd == "peaks":
+            fields["seconds"] = args.seconds
+        if args.cmd == "config" and args.settings:
+            changes = {}
+            for item in args.settings:
+                key, _, value = item.partition("=")
+                try:
+                    changes[key] = json.loads(value)
+                except ValueError:
+                    changes[key] = value
+            fields["set"] = changes
+            fields["save"] = args.save
+        response = client.request(args.cmd, **fields)
+        print(json.dumps(response, indent=2))
+        return 0 if response.get("ok") else 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import math
+from collections import deque
+
+# Re-add the running sums from scratch this often to cancel float drift
+RESUM_INTERVAL = 1 << 16
+
+
+class _Window:
+    __slots__ = ("name", "size", "threshold", "total", "maxima", "since_resum")
+
+    def __init__(self, name, size, threshold):
+        self.name = name
+        self.size = size
+        self.threshold = threshold
+        self.total = 0.0
+        self.maxima = deque()
+        self.since_resum = 0
+
+
+class WindowDetector:
+    """Sliding mean/max over several window lengths in O(1) per sample
+
+    All windows share one preallocated ring sized for the longest window.
+    Each window keeps a running sum for its mean and a monotonic deque of
+    sample indices for its max, so update() never scans or reallocates the
+    history. The first window is the primary one used for mean()/max()
+    when no name is given. history keeps extra samples beyond the longest
+    window available to recent().
+    """
+
+    def __init__(self, windows, history=0):
+        self._configure(windows, history)
+        self._count = 0
+
+    def _configure(self, windows, history):
+        # windows: list of (name, size, threshold)
+        if not windows:
+            raise ValueError("WindowDetector needs at least one window")
+        built = [_Window(name, int(size), threshold) for name, size, threshold in windows]
+        for window in built:
+            if window.size < 1:
+                raise ValueError(f"Window '{window.name}' must hold at least one sample")
+        self._windows = built
+        self._by_name = {window.name: window for window in self._windows}
+        self._capacity = max(max(window.size for window in self._windows), int(history))
+        self._ring = [0.0] * self._capacity
+
+    def resize(self, windows, history=0):
+        """Switch to new window sizes/thresholds, keeping the samples already seen
+
+        The newest samples that fit the new ring are replayed into it, so a
+        window that was full stays full and a trip in progress is not lost.
+        """
+        kept = self.recent(self._count)
+        self._configure(windows, history)
+        self._count = 0
+        for value in kept[-self._capacity:]:
+            self._push(value)
+
+    def set_threshold(self, name, threshold):
+        """Move one window's trip level without touching its samples"""
+        self._window(name).threshold = threshold
+
+    def update(self, value, count=1):
+        """Push value into every window, count times in a row"""
+        for _ in range(count):
+            self._push(value)
+
+    def _push(self, value):
+        index = self._count
+        ring = self._ring
+        capacity = self._capacity
+        for window in self._windows:
+            size = window.size
+            maxima = window.maxima
+            oldest = index - size
+            if oldest >= 0:
+                window.total -= ring[oldest % capacity]
+                if maxima and maxima[0] <= oldest:
+                    maxima.popleft()
+            window.total += value
+            while maxima and ring[maxima[-1] % capacity] <= value:
+                maxima.pop()
+            maxima.append(index)
+            window.since_resum += 1
+        ring[index % capacity] = value
+        self._count = index + 1
+        for window in self._windows:
+            if window.since_resum >= RESUM_INTERVAL:
+                self._resum(window)
+
+    def _resum(self, window):
+        filled = min(self._count, window.size)
+        start = self._count - filled
+        window.total = math.fsum(self._ring[i % self._capacity] for i in range(start, self._count))
+        window.since_resum = 0
+
+    def _window(self, name):
+        return self._windows[0] if name is None else self._by_name[name]
+
+    def ready(self, name=None):
+        """True once the window has seen a full window of samples"""
+        return self._count >= self._window(name).size
+
+    def mean(self, name=None):
+        window = self._window(name)
+        filled = min(self._count, window.size)
+        return window.total / filled if filled else 0.0
+
+    def max(self, name=None):
+        window = self._window(name)
+        if not window.maxima:
+            return 0.0
+        return self._ring[window.maxima[0] % self._capacity]
+
+    def recent(self, count):
+        """Up to count most recent samples, oldest first (copied)"""
+        count = min(int(count), self._count, self._capacity)
+        ring = self._ring
+        capacity = self._capacity
+        return [ring[i % capacity] for i in range(self._count - count, self._count)]
+
+    def tripped(self):
+        """Name of the first full window whose mean exceeds its threshold, else None"""
+        count = self._count
+        for window in self._windows:
+            if count >= window.size and window.total / window.size > window.threshold:
+                return window.name
+        return None
+
+    def reset(self):
+        """Forget all history (the ring itself is reused, not cleared)"""
+        self._count = 0
+        for window in self._windows:
+            window.total = 0.0
+            window.maxima.clear()
+            window.since_resum = 0
@@ -0,0 +1,171 @@
+import math
+from collections import deque
+
+from timers import TimerQueue
+
+IDLE = "idle"
+ATTACK = "attack"
+HOLD = "hold"
+RELEASE = "release"
+# Transitions kept on each envelope for inspection
+TRANSITION_HISTORY = 64
+
+
+def _linear(progress):
+    return progress
+
+
+def _smooth(progress):
+    # Cosine ease: gentle at both ends of the ramp
+    return 0.5 - 0.5 * math.cos(math.pi * progress)
+
+
+def _exponential(progress):
+    # Fast at first, settling into the target; normalised to hit 1.0 exactly
+    return (1.0 - math.exp(-5.0 * progress)) / (1.0 - math.exp(-5.0))
+
+
+CURVES = {"linear": _linear, "smooth": _smooth, "exponential": _exponential}
+
+
+class GainEnvelope:
+    """Limiter state machine: idle → attack → hold → release → idle
+
+    idle is plain monitoring; attack ramps the volume down (limiting),
+    hold keeps it at the floor and release ramps it back up. Every state
+    with an end is a cancellable timer on a TimerQueue (shared by all
+    envelopes driven from one monitor loop), so phases change only when
+    the loop runs the queue or advance() is called: nothing sleeps and no
+    thread is involved. trigger() and release() cancel the pending timer
+    and schedule the next. Each change is appended to transitions as
+    (time, old, new, reason) and passed to every listener, which is how
+    the limiter tracks is_limiting and how tests follow the sequence.
+    advance() returns a gain only when it differs from the last written
+    one by more than the tolerance (or reaches a phase endpoint), so the
+    caller issues volume writes just for real changes.
+    """
+
+    def __init__(self, attack_time=0.0, hold_time=5.0, release_time=1.0,
+                 curve="linear", tolerance=0.01, timers=None):
+        self.timers = timers if timers is not None else TimerQueue()
+        self.phase = IDLE
+        self.floor = 0.0
+        self.ceiling = 1.0
+        self.written = None
+        self.transitions = deque(maxlen=TRANSITION_HISTORY)
+        self._listeners = []
+        self._timer = None
+        self._settling = False
+        self._start_gain = 1.0
+        self._phase_start = 0.0
+        self.configure(attack_time, hold_time, release_time, curve, tolerance)
+
+    def configure(self, attack_time, hold_time, release_time, curve, tolerance):
+        """Change timings and curve; a phase in progress continues under the new ones"""
+        if curve not in CURVES:
+            raise ValueError(f"Unknown envelope curve '{curve}' (expected one of {', '.join(CURVES)})")
+        self.attack_time = attack_time
+        self.hold_time = hold_time
+        self.release_time = release_time
+        self.curve = CURVES[curve]
+        self.tolerance = tolerance
+        if self._timer is not None:
+            # Move the end of the current phase to match the new timing
+            self._timer.cancel()
+            self._schedule()
+
+    def add_listener(self, listener):
+        """Call listener(old, new, time, reason) on every state change"""
+        self._listeners.append(listener)
+
+    @property
+    def active(self):
+        return self.phase != IDLE
+
+    def sync(self, gain):
+        """Record the volume currently applied to the session"""
+        self.written = gain
+
+    def trigger(self, now, floor, ceiling):
+        """Start (or restart) attenuation towards floor, cancelling any release"""
+        current = self.gain_at(now) if self.active else (self.written if self.written is not None else ceiling)
+        self.floor = floor
+        self.ceiling = ceiling
+        self._enter(ATTACK, now, current, "trigger")
+
+    def release(self, now):
+        """End the hold early and ramp back up from the current gain"""
+        if self.phase in (ATTACK, HOLD):
+            self._enter(RELEASE, now, self.gain_at(now), "calm")
+
+    def cancel(self, now=None):
+        """Drop back to idle without touching the volume"""
+        if self.active:
+            self._enter(IDLE, self._phase_start if now is None else now, self.ceiling, "cancel")
+        self._settling = False
+
+    def gain_at(self, now):
+        """Gain for time now within the current phase (no state change)"""
+        elapsed = now - self._phase_start
+        if self.phase == ATTACK:
+            return self._ramp(self._start_gain, self.floor, elapsed / self.attack_time if self.attack_time else 1.0)
+        if self.phase == HOLD:
+            return self.floor
+        if self.phase == RELEASE:
+            return self._ramp(self._start_gain, self.ceiling,
+                              elapsed / self.release_time if self.release_time else 1.0)
+        return self.written if self.written is not None else self.ceiling
+
+    def advance(self, now):
+        """Gain to write for time now, or None if no write is needed"""
+        self.timers.run_due(now)
+        if not self.active:
+            if not self._settling:
+                return None
+            # The release just ended: land exactly on the ceiling
+            self._settling = False
+            if self.written == self.ceiling:
+                return None
+            self.written = self.ceiling
+            return self.ceiling
+        gain = self.gain_at(now)
+        at_endpoint = gain in (self.floor, self.ceiling)
+        if self.written is None or abs(gain - self.written) > self.tolerance or (
+            at_endpoint and gain != self.written
+        ):
+            self.written = gain
+            return gain
+        return None
+
+    def _expire(self, deadline):
+        # The current phase ran its full length
+        self._timer = None
+        if self.phase == ATTACK:
+            self._enter(HOLD, deadline, self.floor, "attack done")
+        elif self.phase == HOLD:
+            self._enter(RELEASE, deadline, self.floor, "hold done")
+        elif self.phase == RELEASE:
+            self._enter(IDLE, deadline, self.ceiling, "release done")
+            self._settling = True
+
+    def _enter(self, phase, start, gain, reason):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        old = self.phase
+        self.phase = phase
+        self._phase_start = start
+        self._start_gain = gain
+        self._settling = False
+        self._schedule()
+        self.transitions.append((start, old, phase, reason))
+        for listener in self._listeners:
+            listener(old, phase, start, reason)
+
+    def _schedule(self):
+        length = {ATTACK: self.attack_time, HOLD: self.hold_time, RELEASE: self.release_time}.get(self.phase)
+        if length is not None:
+            self._timer = self.timers.schedule(self._phase_start + length, self._expire)
+
+    def _ramp(self, start, end, progress):
+        return start + (end - start) * self.curve(min(max(progress, 0.0), 1.0))
@@ -0,0 +1,307 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+
+from envelope import ATTACK, HOLD, IDLE, RELEASE
+from worker import BackgroundWorker
+
+# The recorder opens at startup on the protection path, so it writes with
+# struct and only the snapshot thread and the reader import NumPy
+
+MAGIC = b"EARFR\x00\x00\x01"
+VERSION = 1
+# 9 bytes per sample: ms since the file epoch, peak and volume as 16-bit
+# fractions of full scale, and the envelope phase
+RECORD = struct.Struct("<IHHB")
+# magic, version, record size, capacity, write index, epoch (UNIX time)
+HEADER = struct.Struct("<8sIIQQd")
+INDEX = struct.Struct("<Q")
+INDEX_OFFSET = 24
+HEADER_SIZE = 64
+LEVEL_SCALE = 65535
+# u4 milliseconds run out after ~49 days; move the epoch up well before
+MAX_OFFSET_MS = 40 * 86400 * 1000
+
+STATE_CODES = {IDLE: 0, ATTACK: 1, HOLD: 2, RELEASE: 3}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+
+def record_dtype():
+    """NumPy dtype matching RECORD"""
+    import numpy as np
+
+    return np.dtype([("t", "<u4"), ("peak", "<u2"), ("volume", "<u2"), ("state", "u1")])
+
+
+class FlightRecorder:
+    """Continuous peak/volume/state recording in a memory-mapped ring file
+
+    The file is a small header followed by capacity fixed-size records;
+    record() packs one sample straight into the mapping, so memory use
+    and file size stay constant however long the limiter runs. The write
+    index lives in the header, which lets a reader open the file while
+    the limiter is still recording. snapshot() copies the last few
+    seconds out for an incident and hands them to the snapshot thread,
+    which open() starts once and close() drains. A sample that cannot be
+    written is counted in errors rather than raised, so the recorder never
+    costs the monitor loop a tick.
+    """
+
+    def __init__(self, path, capacity, snapshot_dir=None, snapshot_seconds=30.0, max_rate=50.0):
+        self.path = path
+        self.capacity = int(capacity)
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_seconds = snapshot_seconds
+        self.max_rate = max_rate
+        self._file = None
+        self._map = None
+        self._index = 0
+        self._epoch = 0.0
+        self._shift = 0.0
+        self.errors = 0
+        self._worker = BackgroundWorker("flight-snapshot", queue_size=8)
+
+    def open(self, now):
+        """Map the ring file (creating or resizing it) and line its epoch up with now"""
+        size = HEADER_SIZE + self.capacity * RECORD.size
+        fresh = not os.path.exists(self.path) or os.path.getsize(self.path) != size
+        self._file = open(self.path, "r+b" if not fresh else "w+b")
+        if fresh:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._worker.start()
+
+        magic, _, record_size, _, index, epoch = HEADER.unpack_from(self._map, 0)
+        if fresh or magic != MAGIC or record_size != RECORD.size:
+            self._reset(now)
+            return
+        self._index = index
+        self._epoch = epoch
+        # Map this session's clock onto the epoch already in the file
+        self._shift = time.time() - epoch - now
+        if (now + self._shift) * 1000 > MAX_OFFSET_MS:
+            self._rebase(now)
+
+    def _reset(self, now):
+        self._index = 0
+        # Offsets count from now rather than from the clock's zero (boot time
+        # for a monotonic clock), so they stay small whatever the uptime
+        self._epoch = time.time()
+        self._shift = -now
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.capacity, 0, self._epoch)
+
+    def _rebase(self, now):
+        """Move the epoch up to the oldest stored sample, keeping the history
+
+        Every stored offset is shifted down by the same amount in one
+        vectorized pass over the mapping. This happens about once every 40
+        days, so NumPy is only imported here. A ring whose history itself
+        spans more than MAX_OFFSET_MS cannot be rebased and starts over.
+        """
+        count = min(self._index, self.capacity)
+        offset = (now + self._shift) * 1000.0
+        try:
+            import numpy as np
+        except ImportError:
+            self._reset(now)
+            return
+        records = np.frombuffer(self._map, dtype=record_dtype(), count=count, offset=HEADER_SIZE)
+        delta = int(records["t"].min()) if count else int(offset)
+        if offset - delta > MAX_OFFSET_MS:
+            del records
+            self._reset(now)
+            return
+        records["t"] -= np.uint32(delta)
+        # The mapping cannot be closed while an array still views it
+        del records
+        self._epoch += delta / 1000.0
+        self._shift -= delta / 1000.0
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.capacity, self._index, self._epoch)
+
+    @property
+    def count(self):
+        return self._index
+
+    def record(self, now, peak, volume, state=IDLE):
+        """Append one sample (called every monitor tick)"""
+        try:
+            offset = (now + self._shift) * 1000.0
+            if offset > MAX_OFFSET_MS:
+                self._rebase(now)
+                offset = (now + self._shift) * 1000.0
+            RECORD.pack_into(
+                self._map,
+                HEADER_SIZE + (self._index % self.capacity) * RECORD.size,
+                int(offset),
+                int(min(max(peak, 0.0), 1.0) * LEVEL_SCALE),
+                int(min(max(volume, 0.0), 1.0) * LEVEL_SCALE),
+                STATE_CODES.get(state, 0),
+            )
+            self._index += 1
+            INDEX.pack_into(self._map, INDEX_OFFSET, self._index)
+        except (struct.error, ValueError, TypeError):
+            # Out-of-range values, or a mapping already closed
+            self.errors += 1
+
+    def _tail(self, count):
+        """Raw bytes of the last count records, oldest first"""
+        end = self._index % self.capacity
+        start = end - count
+        if start >= 0:
+            return self._map[HEADER_SIZE + start * RECORD.size:HEADER_SIZE + end * RECORD.size]
+        wrapped = self._map[HEADER_SIZE + (self.capacity + start) * RECORD.size:]
+        return wrapped + self._map[HEADER_SIZE:HEADER_SIZE + end * RECORD.size]
+
+    def snapshot(self, now, label=None):
+        """Save the last snapshot_seconds to an incident file; returns its path"""
+        if self._map is None or not self.snapshot_dir:
+            return None
+        count = min(self._index, self.capacity, int(self.snapshot_seconds * self.max_rate) + 1)
+        raw = self._tail(count)
+        cutoff = (now + self._shift - self.snapshot_seconds) * 1000.0
+        stamp = datetime.fromtimestamp(self._epoch + now + self._shift).strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        name = f"incident-{stamp}" + (f"-{label}" if label else "") + ".npz"
+        path = os.path.join(self.snapshot_dir, name)
+        # The byte copy above is all the monitor thread pays for
+        if not self._worker.submit(self._save, path, raw, cutoff, self._epoch):
+            return None
+        return path
+
+    def _save(self, path, raw, cutoff, epoch):
+        import numpy as np
+
+        samples = np.frombuffer(raw, dtype=record_dtype())
+        samples = samples[samples["t"] >= max(cutoff, 0.0)]
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            np.savez(path, samples=samples, epoch=epoch)
+        except OSError as e:
+            print(f"\n⚠️  Failed to save incident snapshot: {e}")
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        self._worker.stop()
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._map = None
+        self._file = None
+
+
+class FlightRecording:
+    """Read-only view of a flight recorder file or incident snapshot
+
+    Ring files are mapped with numpy.memmap, so opening even days of
+    history reads nothing until samples are touched; segments() returns
+    the recorded samples as views in chronological order.
+    """
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        self.dtype = record_dtype()
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                self.records = data["samples"]
+                self.epoch = float(data["epoch"])
+            self.capacity = len(self.records)
+            self.count = len(self.records)
+            self.index = len(self.records)
+            return
+        with open(path, "rb") as f:
+            magic, _, record_size, capacity, index, epoch = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a flight recorder file")
+        self.epoch = epoch
+        self.capacity = capacity
+        self.index = index
+        self.count = min(index, capacity)
+        self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(capacity,))
+
+    def segments(self):
+        """One or two zero-copy views that together hold every sample, oldest first"""
+        if self.index <= self.capacity:
+            return [self.records[:self.count]]
+        split = self.index % self.capacity
+        return [self.records[split:], self.records[:split]]
+
+    def array(self):
+        """All samples in order as one array (copies when the ring has wrapped)"""
+        import numpy as np
+
+        segments = self.segments()
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+    def times(self, samples):
+        """Absolute UNIX times of samples"""
+        return self.epoch + samples["t"] / 1000.0
+
+    def between(self, start, end):
+        """Samples recorded between two UNIX times"""
+        import numpy as np
+
+        # Half a millisecond of slack absorbs float rounding of the bounds
+        low = (start - self.epoch) * 1000.0 - 0.5
+        high = (end - self.epoch) * 1000.0 + 0.5
+        parts = [segment[(segment["t"] >= low) & (segment["t"] <= high)] for segment in self.segments()]
+        return np.concatenate(parts)
+
+    def limiting_spans(self, samples):
+        """(start, end) UNIX times of each stretch spent limiting"""
+        import numpy as np
+
+        active = samples["state"] != STATE_CODES[IDLE]
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], active, [False])).astype(np.int8)))
+        times = self.times(samples)
+        return [(times[start], times[end - 1]) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a flight recorder file or incident snapshot")
+    parser.add_argument("path", help="flight_recorder.bin or an incident-*.npz snapshot")
+    parser.add_argument("--last", type=float, help="only the last N seconds")
+    parser.add_argument("--csv", help="write the samples to this CSV file")
+    args = parser.parse_args(argv)
+
+    recording = FlightRecording(args.path)
+    samples = recording.array()
+    if args.last and len(samples):
+        end = recording.times(samples[-1:])[0]
+        samples = recording.between(end - args.last, end)
+
+    print(f"📼 {args.path}: {recording.count} of {recording.capacity} samples")
+    if len(samples):
+        times = recording.times(samples)
+        start = datetime.fromtimestamp(times[0]).strftime("%Y-%m-%d %H:%M:%S")
+        end = datetime.fromtimestamp(times[-1]).strftime("%Y-%m-%d %H:%M:%S")
+        peaks = samples["peak"] / LEVEL_SCALE
+        print(f"   {start} → {end} ({times[-1] - times[0]:.1f}s)")
+        print(f"   Peak mean {peaks.mean() * 100:.0f}% | max {peaks.max() * 100:.0f}%")
+        spans = recording.limiting_spans(samples)
+        print(f"   Limiting {len(spans)} time(s)")
+        for span_start, span_end in spans[-10:]:
+            stamp = datetime.fromtimestamp(span_start).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"   🔇 {stamp} for {span_end - span_start:.1f}s")
+
+    if args.csv:
+        with open(args.csv, "w") as f:
+            f.write("time,peak,volume,state\n")
+            for t, record in zip(recording.times(samples), samples):
+                f.write(f"{t:.3f},{record['peak'] / LEVEL_SCALE:.4f},{record['volume'] / LEVEL_SCALE:.4f},"
+                        f"{STATE_NAMES.get(int(record['state']), '?')}\n")
+        print(f"   Wrote {len(samples)} samples to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
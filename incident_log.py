@@ -0,0 +1,204 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+TEXT_HEADER = "=" * 80 + "\nDiscord Ear-Rape Detection Log\n" + "=" * 80 + "\n\n"
+
+
+def format_text(record):
+    """Human-readable block in the original earrape_incidents.log layout"""
+    timestamp = datetime.fromtimestamp(record["time"]).strftime("%Y-%m-%d %H:%M:%S")
+    lines = [
+        f"[{timestamp}] EAR-RAPE DETECTED!",
+        f"  - Peak Level: {int(record['peak'] * 100)}%",
+        f"  - Average Peak: {int(record['average'] * 100)}%",
+    ]
+    if record.get("app"):
+        lines.append(f"  - Application: {record['app']} ({record.get('process')})")
+    if record.get("loudness") is not None:
+        lines.append(f"  - Short-term Loudness: {record['loudness']:.1f} LUFS")
+    if record.get("distortion") is not None:
+        lines.append(f"  - Distortion Score: {record['distortion']:.2f}")
+    lines.append(f"  - Action: Reduced Discord volume to {int(record['reduction'] * 100)}%")
+    if record.get("snapshot"):
+        lines.append(f"  - Flight recorder snapshot: {record['snapshot']}")
+    lines.append("  ⚠️  CHECK DISCORD NOW to see who is speaking!")
+    lines.append("-" * 80)
+    return "\n".join(lines) + "\n\n"
+
+
+def _created_time(stat):
+    """Best available creation time of an existing file
+
+    st_ctime is only the creation time on Windows; on Linux it is the inode
+    change time, so without st_birthtime the last write time stands in and
+    the file's age counts from when it was last appended to.
+    """
+    birth = getattr(stat, "st_birthtime", None)
+    if birth:
+        return birth
+    return stat.st_ctime if os.name == "nt" else stat.st_mtime
+
+
+class _RotatingFile:
+    """Append-only file that rolls over to .1, .2, ... by size or age"""
+
+    def __init__(self, path, max_bytes, max_age, backups, header=""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.header = header
+        self._file = None
+        self._size = 0
+        self._created = 0.0
+
+    def _open(self):
+        exists = os.path.exists(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        if exists:
+            stat = os.stat(self.path)
+            self._size = stat.st_size
+            self._created = _created_time(stat)
+        else:
+            self._size = 0
+            self._created = time.time()
+        if self._size == 0 and self.header:
+            self._file.write(self.header)
+            self._size = len(self.header.encode("utf-8"))
+
+    def _should_rotate(self, incoming):
+        if self._size == 0 or self._size <= len(self.header.encode("utf-8")):
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._created > self.max_age
+
+    def _rotate(self):
+        self.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, data):
+        if self._file is None:
+            self._open()
+        encoded = len(data.encode("utf-8"))
+        if self._should_rotate(encoded):
+            self._rotate()
+            self._open()
+        self._file.write(data)
+        self._file.flush()
+        self._size += encoded
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class IncidentLogWriter:
+    """Background writer for incident records
+
+    The monitor hands records over with submit(), which never blocks: the
+    queue is bounded and a full queue drops the record (counted in
+    dropped). The writer thread drains the queue in batches and appends
+    each batch with one write per output file.
+    """
+
+    def __init__(self, text_path=None, jsonl_path=None, max_bytes=5_000_000, max_age=None,
+                 backups=5, queue_size=256, batch_size=64, flush_interval=0.5):
+        self._outputs = []
+        if text_path:
+            self._outputs.append((format_text, _RotatingFile(text_path, max_bytes, max_age, backups, TEXT_HEADER)))
+        if jsonl_path:
+            self._outputs.append((self._format_json, _RotatingFile(jsonl_path, max_bytes, max_age, backups)))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _format_json(record):
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="incident-log", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Queue a record for writing; returns False if it had to be dropped"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=5.0):
+        """Write everything still queued, then close the files"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still writing: the (daemon) thread closes the files when it finishes
+                return
+            self._thread = None
+        else:
+            self._drain()
+        self._close_outputs()
+
+    def _close_outputs(self):
+        for _, output in self._outputs:
+            output.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write_batch(self._collect(first))
+        self._drain()
+        self._close_outputs()
+
+    def _collect(self, first):
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        while True:
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._write_batch(self._collect(first))
+
+    def _write_batch(self, batch):
+        for formatter, output in self._outputs:
+            try:
+                output.write("".join(formatter(record) for record in batch))
+            except Exception as e:
+                self.errors += 1
+                print(f"\n⚠️  Failed to write incident log: {e}")
+        self.written += len(batch)
@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from audio_backend import PeakTrace, SimulatedBackend
+from clock import VirtualClock
+from settings import ConfigError, validate
+from volume_limiter import CONFIG_DEFAULTS, DiscordOutputLimiter
+
+# A reduction must land this long after an event ends to still count for it
+MATCH_GRACE = 1.0
+# Harness runs leave no files behind but the incident log they are scored from
+HARNESS_SETTINGS = {"FLIGHT_RECORDER_FILE": "", "METRICS_FILE": "", "BASELINE_FILE": "", "LOG_FORMAT": "jsonl"}
+
+
+def synthetic_trace(duration=60.0, sample_rate=100.0, events=((15.0, 19.0), (40.0, 41.5)),
+                    blast_level=0.98, speech_level=0.45, seed=0):
+    """Speech-like background with loud blasts at the given (onset, end) times"""
+    rng = np.random.RandomState(seed)
+    n = int(duration * sample_rate)
+    t = np.arange(n) / sample_rate
+    # Syllable-rate modulation with random pauses between phrases
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, np.pi))
+    talking = (rng.uniform(size=n // int(sample_rate) + 1) > 0.3).repeat(int(sample_rate))[:n]
+    peaks = speech_level * envelope * talking + rng.uniform(0, 0.05, size=n)
+    for onset, end in events:
+        mask = (t >= onset) & (t < end)
+        peaks[mask] = blast_level - rng.uniform(0, 0.04, size=mask.sum())
+    return PeakTrace(np.clip(peaks, 0.0, 1.0), sample_rate=sample_rate, events=list(events))
+
+
+def scaled_trace(trace, gain):
+    """Copy of trace as metered with the session volume at gain"""
+    return PeakTrace([min(peak * gain, 1.0) for peak in trace.peaks], sample_rate=trace.sample_rate,
+                     events=trace.events, name=trace.name, start=trace.start, end=trace.end)
+
+
+def volume_reductions(volume_writes):
+    """Times at which a volume write started lowering the session volume"""
+    # Recovery ramps only ever raise the volume, so every run of drops is
+    # one trigger (an attack ramp writes several)
+    reductions = []
+    previous = 1.0
+    falling = False
+    for t, _, level in volume_writes:
+        if level < previous - 1e-6:
+            if not falling:
+                reductions.append(t)
+            falling = True
+        elif level > previous + 1e-6:
+            falling = False
+        previous = level
+    return reductions
+
+
+def score_reductions(events, reductions, grace=MATCH_GRACE):
+    """Match reductions to scripted events: latency per event plus false triggers"""
+    latencies = []
+    matched = set()
+    for onset, end in events:
+        latency = None
+        for index, t in enumerate(reductions):
+            if onset <= t <= end + grace:
+                latency = t - onset
+                matched.add(index)
+                break
+        latencies.append(latency)
+    # Any other reduction inside an event window is a re-trigger, not a false one
+    false_triggers = 0
+    for index, t in enumerate(reductions):
+        if index in matched:
+            continue
+        if not any(onset <= t <= end + grace for onset, end in events):
+            false_triggers += 1
+    return latencies, false_triggers
+
+
+def run_trace(trace, settings=None, meter_follows_volume=True):
+    """Run the real monitor loop against trace on a virtual clock
+
+    settings are validated and written to the run's config.json before the
+    limiter is built, so it starts exactly as it would with that file.
+    """
+    values, problems = validate({**CONFIG_DEFAULTS, **HARNESS_SETTINGS, **(settings or {})}, CONFIG_DEFAULTS)
+    if problems:
+        raise ConfigError(problems)
+    clock = VirtualClock()
+    backend = SimulatedBackend(clock, [trace], meter_follows_volume=meter_follows_volume)
+    with tempfile.TemporaryDirectory() as workdir:
+        config_file = os.path.join(workdir, "config.json")
+        with open(config_file, "w") as f:
+            json.dump(values, f)
+        log_file = os.path.join(workdir, "incidents.log")
+        with contextlib.redirect_stdout(io.StringIO()):
+            limiter = DiscordOutputLimiter(
+                backend=backend,
+                clock=clock,
+                config_file=config_file,
+                log_file=log_file,
+                headless=True,
+            )
+
+        clock.schedule(trace.start + trace.duration, lambda: setattr(limiter, "is_running", False))
+        with contextlib.redirect_stdout(io.StringIO()):
+            limiter.start()
+        clock.close()
+        actions = incident_actions(os.path.splitext(log_file)[0] + ".jsonl")
+
+    reductions = volume_reductions(backend.volume_writes)
+    latencies, false_triggers = score_reductions(trace.events, reductions)
+    detected = [lat for lat in latencies if lat is not None]
+    return {
+        "events": len(trace.events),
+        "detected": len(detected),
+        "missed": len(latencies) - len(detected),
+        "latencies": latencies,
+        "mean_latency": float(np.mean(detected)) if detected else None,
+        "max_latency": float(np.max(detected)) if detected else None,
+        "false_triggers": false_triggers,
+        "incidents": len(reductions),
+        "time_to_action": actions,
+        "volume_writes": len(backend.volume_writes),
+    }
+
+
+def incident_actions(jsonl_path):
+    """time_to_action of every incident the limiter logged to jsonl_path"""
+    if not os.path.exists(jsonl_path):
+        return []
+    with open(jsonl_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record["time_to_action"] for record in records if record.get("time_to_action") is not None]
+
+
+def print_report(name, report):
+    print(f"📈 {name}")
+    for index, latency in enumerate(report["latencies"]):
+        if latency is None:
+            print(f"   Event {index + 1}: ❌ missed")
+        else:
+            print(f"   Event {index + 1}: onset → SetMasterVolume in {latency * 1000:.0f} ms")
+    if report["mean_latency"] is not None:
+        print(f"   Mean latency: {report['mean_latency'] * 1000:.0f} ms"
+              f" | Max: {report['max_latency'] * 1000:.0f} ms")
+    print(f"   Detected: {report['detected']}/{report['events']}"
+          f" | False triggers: {report['false_triggers']}"
+          f" | Volume writes: {report['volume_writes']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure limiter detection latency against recorded or synthetic peak traces"
+    )
+    parser.add_argument("traces", nargs="*", help="JSON peak traces (synthetic demo if omitted)")
+    parser.add_argument("--threshold", type=float, help="override THRESHOLD")
+    parser.add_argument("--reduction", type=float, help="override REDUCTION")
+    parser.add_argument("--peak-window", type=int, help="override PEAK_WINDOW")
+    parser.add_argument("--recovery-time", type=float, help="override RECOVERY_TIME")
+    parser.add_argument("--meter-pre-volume", action="store_true",
+                        help="simulated meter ignores the session volume")
+    parser.add_argument("--gain", type=float,
+                        help="scale every trace, e.g. 0.3 for Discord at 30%% volume")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="also run with ADAPTIVE_THRESHOLD and report both")
+    parser.add_argument("--json", action="store_true", help="print reports as JSON")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    for key, value in (("THRESHOLD", args.threshold), ("REDUCTION", args.reduction),
+                       ("PEAK_WINDOW", args.peak_window), ("RECOVERY_TIME", args.recovery_time)):
+        if value is not None:
+            settings[key] = value
+
+    traces = [(path, PeakTrace.load(path)) for path in args.traces]
+    if not traces:
+        if args.adaptive:
+            # Long enough for the baseline to warm up before the first event
+            traces = [("synthetic", synthetic_trace(duration=240.0, events=((150.0, 154.0), (210.0, 211.5))))]
+        else:
+            traces = [("synthetic", synthetic_trace())]
+    if args.gain:
+        traces = [(f"{name} x{args.gain:g}", scaled_trace(trace, args.gain)) for name, trace in traces]
+
+    variants = [("fixed", settings)]
+    if args.adaptive:
+        variants.append(("adaptive", dict(settings, ADAPTIVE_THRESHOLD=True)))
+    reports = {}
+    for name, trace in traces:
+        for label, variant in variants:
+            key = name if len(variants) == 1 else f"{name} ({label})"
+            reports[key] = run_trace(trace, variant, meter_follows_volume=not args.meter_pre_volume)
+
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        for name, report in reports.items():
+            print_report(name, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
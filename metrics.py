@@ -0,0 +1,426 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+# Seconds; covers a fast COM call (~20 µs) up to a stalled one
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Seconds from the first loud sample to the volume reduction
+DETECTION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+class Counter:
+    __slots__ = ("name", "labels", "value")
+    kind = "counter"
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def sample(self):
+        return self.value
+
+
+class Gauge:
+    __slots__ = ("name", "labels", "value", "function")
+    kind = "gauge"
+
+    def __init__(self, name, labels, function=None):
+        self.name = name
+        self.labels = labels
+        self.value = 0.0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def sample(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception:
+            return float("nan")
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and three additions"""
+
+    __slots__ = ("name", "labels", "buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name, labels, buckets):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float("inf")
+
+    def sample(self):
+        return {
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms for the limiter
+
+    Metrics are created once up front and then updated in place from the
+    monitor thread, which is their only writer; readers (the HTTP endpoint
+    and the snapshot writer) take a consistent-enough copy when they
+    collect. Gauges may be backed by a function evaluated at collect time,
+    which keeps values the monitor already tracks off the hot path.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._help = {}
+        self.started = time.time()
+
+    def _get(self, cls, name, help, labels, *args):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(name, key[1], *args)
+                    self._metrics[key] = metric
+                    if help:
+                        self._help.setdefault(name, help)
+        return metric
+
+    def counter(self, name, help="", **labels):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", function=None, **labels):
+        gauge = self._get(Gauge, name, help, labels)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def collect(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: (metric.name, metric.labels))
+
+    def snapshot(self):
+        """Plain dict of every metric, for the JSON snapshot"""
+        metrics = {}
+        for metric in self.collect():
+            label_text = ",".join(f"{key}={value}" for key, value in metric.labels)
+            name = f"{metric.name}{{{label_text}}}" if label_text else metric.name
+            metrics[name] = metric.sample()
+        return {"time": time.time(), "uptime": time.time() - self.started, "metrics": metrics}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        seen = set()
+        for metric in self.collect():
+            if metric.name not in seen:
+                seen.add(metric.name)
+                if metric.name in self._help:
+                    lines.append(f"# HELP {metric.name} {self._help[metric.name]}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "histogram":
+                running = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), metric.counts):
+                    running += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labels, le=le)} {running}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labels)} {metric.sum!r}")
+                lines.append(f"{metric.name}_count{_labels(metric.labels)} {metric.count}")
+            else:
+                lines.append(f"{metric.name}{_labels(metric.labels)} {_number(metric.sample())}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value != value:
+        return "NaN"
+    return repr(value)
+
+
+class InstrumentedControls:
+    """Wraps SessionControls and times every meter/volume call"""
+
+    def __init__(self, controls, registry):
+        self.controls = controls
+        self.session = getattr(controls, "session", None)
+        help = "Duration of audio session COM calls"
+        self._peak = registry.histogram("com_call_seconds", help, call="get_peak")
+        self._get_volume = registry.histogram("com_call_seconds", help, call="get_volume")
+        self._set_volume = registry.histogram("com_call_seconds", help, call="set_volume")
+        self._errors = registry.counter("com_call_errors_total", "Audio session calls that raised")
+
+    def get_peak(self):
+        start = time.perf_counter()
+        try:
+            return self.controls.get_peak()
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            self._peak.observe(time.perf_counter() - start)
+
+    def get_volume(self):
+        start = time.perf_counter()
+        try:
+            return self.controls.get_volume()
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            self._get_volume.observe(time.perf_counter() - start)
+
+    def set_volume(self, level):
+        start = time.perf_counter()
+        try:
+            return self.controls.set_volume(level)
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            self._set_volume.observe(time.perf_counter() - start)
+
+
+class SamplingProfiler:
+    """Statistical profiler for one thread, switchable at runtime
+
+    A daemon thread looks at the target thread's current frame every
+    interval seconds and tallies the call stack, so the profiled code runs
+    unmodified and pays nothing while the profiler is off. Results come
+    out in collapsed-stack form (one "outer;inner count" line per stack),
+    which flame graph tools read directly.
+    """
+
+    def __init__(self, interval=0.005, max_depth=32):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = _Tally()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id=None, interval=None):
+        """Start sampling thread_id (default: the main thread), clearing old samples"""
+        if self.running:
+            return
+        if interval:
+            self.interval = interval
+        self._target = thread_id if thread_id is not None else threading.main_thread().ident
+        self._stacks = _Tally()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        return self.collapsed()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def top(self, count=10):
+        """Functions most often on top of the stack, as (frame, share) pairs"""
+        leaves = _Tally()
+        for stack, hits in self._stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += hits
+        total = max(self.samples, 1)
+        return [(frame, hits / total) for frame, hits in leaves.most_common(count)]
+
+
+class SnapshotWriter:
+    """Writes the registry snapshot to a JSON file every interval seconds"""
+
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        # Write a sibling file and swap it in so readers never see half a snapshot
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"\n⚠️  Failed to write metrics snapshot: {e}")
+
+
+class MetricsServer:
+    """Local HTTP endpoint for the registry and the sampling profiler
+
+    GET /metrics         Prometheus text format
+    GET /metrics.json    the JSON snapshot
+    GET /profile/start   start sampling the monitor thread (?interval=seconds)
+    GET /profile/stop    stop and return collapsed stacks
+    GET /profile         collapsed stacks gathered so far
+    """
+
+    def __init__(self, registry, port, host="127.0.0.1", profiler=None, profile_thread=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.profiler = profiler if profiler is not None else SamplingProfiler()
+        self.profile_thread = profile_thread
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        if self.profiler.running:
+            self.profiler.stop()
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+        from urllib.parse import parse_qs, urlparse
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/metrics":
+                    self._reply(server.registry.render_prometheus(), "text/plain; version=0.0.4")
+                elif url.path == "/metrics.json":
+                    self._reply(json.dumps(server.registry.snapshot(), indent=2), "application/json")
+                elif url.path == "/profile/start":
+                    interval = None
+                    if "interval" in query:
+                        try:
+                            interval = float(query["interval"][0])
+                        except ValueError:
+                            interval = math.nan
+                        if not 0 < interval <= 1:
+                            self.send_error(400, "interval must be a number of seconds above 0 and at most 1")
+                            return
+                    server.profiler.start(server.profile_thread, interval)
+                    self._reply(f"profiling every {server.profiler.interval * 1000:.1f} ms\n")
+                elif url.path == "/profile/stop":
+                    self._reply(server.profiler.stop())
+                elif url.path == "/profile":
+                    self._reply(server.profiler.collapsed())
+                else:
+                    self.send_error(404)
+
+            def _reply(self, body, content_type="text/plain"):
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8"
+                                 if "charset" not in content_type else content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would flood the console
+                pass
+
+        return Handler
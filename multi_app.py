@@ -0,0 +1,502 @@
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+
+from envelope import IDLE, RELEASE, GainEnvelope
+from session_watcher import SessionSetWatcher
+from settings import APP_SETTING_KEYS
+
+RESUM_INTERVAL = 1 << 16
+WINDOW_UNIT = 0.1  # PEAK_WINDOW counts 100 ms samples, as in volume_limiter
+
+
+class AppPolicy:
+    """Process-name patterns and limiter settings for one protected application"""
+
+    def __init__(self, name, patterns, settings):
+        self.name = name
+        self.patterns = [pattern.lower() for pattern in patterns]
+        for key in APP_SETTING_KEYS:
+            setattr(self, key, settings[key])
+
+    def matches(self, process_name):
+        name_lower = process_name.lower()
+        return any(pattern in name_lower for pattern in self.patterns)
+
+
+class SessionPolicy:
+    """Maps audio sessions to the first AppPolicy whose patterns match"""
+
+    def __init__(self, apps):
+        self.apps = list(apps)
+
+    @classmethod
+    def from_config(cls, apps_config, defaults):
+        """Build from the "APPS" config section; defaults supplies missing keys"""
+        apps = []
+        for name, entry in apps_config.items():
+            patterns = entry.get("patterns") or [name]
+            settings = {key: entry.get(key, getattr(defaults, key)) for key in APP_SETTING_KEYS}
+            apps.append(AppPolicy(name, patterns, settings))
+        return cls(apps)
+
+    def match(self, session):
+        if not session.name:
+            return None
+        for app in self.apps:
+            if app.matches(session.name):
+                return app
+        return None
+
+
+class MultiSessionDetector:
+    """Sliding-window mean for N sessions at once, one NumPy pass per sample
+
+    Rows are sessions and columns a shared ring of samples, so every update
+    is a handful of whole-array operations no matter how many sessions are
+    monitored. Each row has its own window length and threshold; running
+    sums give the means, and the (rarely needed) window max is computed on
+    demand for a single row.
+    """
+
+    def __init__(self, capacity=1):
+        self.capacity = max(1, int(capacity))
+        self.keys = []
+        self._ring = np.zeros((0, self.capacity))
+        self._sizes = np.zeros(0, dtype=np.int64)
+        self._thresholds = np.zeros(0)
+        self._sums = np.zeros(0)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._index = 0
+        self._since_resum = 0
+
+    def set_rows(self, keys, sizes, thresholds, history=0):
+        """Switch to a new set of sessions, keeping the state of those that stay"""
+        sizes = np.asarray(sizes, dtype=np.int64).reshape(-1)
+        capacity = max(int(sizes.max()) if len(sizes) else 1, int(history), 1)
+        ring = np.zeros((len(keys), capacity))
+        sums = np.zeros(len(keys))
+        counts = np.zeros(len(keys), dtype=np.int64)
+
+        old_rows = {key: row for row, key in enumerate(self.keys)}
+        # Absolute sample indices that survive into the new ring
+        kept = min(self.capacity, capacity, self._index)
+        absolute = np.arange(self._index - kept, self._index)
+        for row, key in enumerate(keys):
+            old = old_rows.get(key)
+            if old is None:
+                continue
+            ring[row, absolute % capacity] = self._ring[old, absolute % self.capacity]
+            counts[row] = min(self._counts[old], kept)
+            filled = min(counts[row], sizes[row])
+            if filled:
+                sums[row] = ring[row, absolute[-filled:] % capacity].sum()
+
+        self.keys = list(keys)
+        self.capacity = capacity
+        self._ring = ring
+        self._sizes = sizes
+        self._thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+        self._sums = sums
+        self._counts = counts
+        self._rows = np.arange(len(keys))
+
+    def update(self, values, count=1):
+        """Push one sample per session (values in row order), count times"""
+        capacity = self.capacity
+        for _ in range(count):
+            index = self._index
+            leaving = self._ring[self._rows, (index - self._sizes) % capacity]
+            self._sums -= np.where(self._counts >= self._sizes, leaving, 0.0)
+            self._sums += values
+            self._ring[:, index % capacity] = values
+            self._counts += 1
+            self._index = index + 1
+        self._since_resum += count
+        if self._since_resum >= RESUM_INTERVAL:
+            self._resum()
+
+    def _resum(self):
+        ages = (self._index - 1 - np.arange(self.capacity)) % self.capacity
+        filled = np.minimum(self._counts, self._sizes)
+        self._sums = (self._ring * (ages[None, :] < filled[:, None])).sum(axis=1)
+        self._since_resum = 0
+
+    def ready(self):
+        return self._counts >= self._sizes
+
+    def means(self):
+        return self._sums / np.maximum(np.minimum(self._counts, self._sizes), 1)
+
+    def tripped(self):
+        """Boolean mask of sessions whose full window mean exceeds its threshold"""
+        return (self._counts >= self._sizes) & (self._sums / self._sizes > self._thresholds)
+
+    def recent(self, row, count):
+        """Up to count most recent samples of one session, oldest first"""
+        count = int(min(count, self._counts[row], self.capacity))
+        positions = np.arange(self._index - count, self._index) % self.capacity
+        return self._ring[row, positions]
+
+    def latest(self):
+        """Most recent sample of every session (0 for sessions with none yet)"""
+        return np.where(self._counts > 0, self._ring[:, (self._index - 1) % self.capacity], 0.0)
+
+    def max(self, row):
+        window = self.recent(row, self._sizes[row])
+        return float(window.max()) if len(window) else 0.0
+
+    def reset(self, row):
+        self._counts[row] = 0
+        self._sums[row] = 0.0
+
+    def set_thresholds(self, thresholds):
+        """Move the trip levels (one per row) without touching the samples"""
+        self._thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+
+
+class MultiAppMonitor:
+    """Protects every session matched by the APPS policy from one loop
+
+    Peaks of all sessions are gathered into one array per tick and the
+    window statistics for all of them come out of a single vectorized
+    update. Python-level work per session only happens for sessions that
+    trip, are limiting, or join/leave the set. The flight recorder gets
+    the loudest session's peak, volume and state each tick.
+    """
+
+    def __init__(self, limiter, policy):
+        self.limiter = limiter
+        self.policy = policy
+        self.watcher = SessionSetWatcher(limiter.sessions, policy, limiter.clock)
+        self.detector = MultiSessionDetector()
+        self._sessions = []
+        self._apps = []
+        self._controls = []
+        self._meters = []
+        self._envelopes = {}
+        self._limiting = np.zeros(0, dtype=bool)
+        self._releasing = np.zeros(0, dtype=bool)
+        self._release_levels = np.zeros(0)
+        self._fixed_thresholds = np.zeros(0)
+        self._thresholds = np.zeros(0)
+        self._volumes = np.zeros(0)
+        self._loud_since = np.zeros(0)
+
+    def print_header(self):
+        limiter = self.limiter
+        print("\n" + "=" * 70)
+        print("🎮 Multi-App Output Monitor & Limiter")
+        print("=" * 70)
+        for app in self.policy.apps:
+            print(f"\n🛡️  {app.name}: {', '.join(app.patterns)}")
+            print(f"   Trigger {int(app.THRESHOLD * 100)}% over {app.PEAK_WINDOW * WINDOW_UNIT:.1f}s"
+                  f" → reduce to {int(app.REDUCTION * 100)}% for {app.RECOVERY_TIME:.1f}s")
+        print(f"\n📝 Logging incidents to: {limiter.log_file}")
+        print("=" * 70 + "\n")
+
+    def run(self):
+        limiter = self.limiter
+        self.print_header()
+        self.watcher.start()
+        limiter.renderer.start()
+        limiter.scheduler.start()
+        seen_version = None
+
+        while limiter.is_running:
+            try:
+                tick_start = time.perf_counter()
+                limiter.check_config(limiter.clock.time())
+                limiter.check_control()
+                if self.watcher.version != seen_version:
+                    seen_version = self.watcher.version
+                    self._rebuild(self.watcher.current())
+                    if limiter.startup and self._sessions:
+                        limiter.startup.mark("session found")
+
+                if not self._sessions:
+                    limiter.scheduler.observe(0.0)
+                    limiter.scheduler.wait()
+                    continue
+
+                peaks = self._read_peaks()
+                self.detector.update(peaks, limiter.scheduler.samples_per_tick)
+                now = limiter.clock.time()
+                limiter.timers.run_due(now)
+                if limiter.baseline:
+                    self._track_baseline(peaks, now)
+                if not limiter.paused:
+                    self._evaluate(peaks, now)
+                self._advance(now)
+                if limiter.startup:
+                    limiter.finish_startup_profile()
+
+                loudest = int(peaks.argmax())
+                any_limiting = bool(self._limiting.any())
+                if limiter.recorder:
+                    # One ring, so it follows whichever session is loudest
+                    envelope = self._envelopes.get(self._sessions[loudest].key)
+                    limiter.recorder.record(now, peaks[loudest], self._volumes[loudest],
+                                            envelope.phase if envelope else IDLE)
+                limiter.submit_incidents()
+                limiter.is_limiting = any_limiting
+                limiter.renderer.update(any_limiting, peaks[loudest], self._volumes[loudest])
+                limiter.scheduler.observe(peaks[loudest], any_limiting)
+                limiter.tick_seconds.observe(time.perf_counter() - tick_start)
+                limiter.ticks_total.inc()
+
+            except Exception as e:
+                # Re-resolve every session on the next tick
+                limiter.record_error(e)
+                seen_version = None
+                limiter.clock.sleep(1)
+
+            limiter.scheduler.wait()
+
+        self.watcher.stop()
+        limiter.renderer.stop()
+        limiter.incident_log.stop()
+        limiter.stop_metrics()
+        limiter.stop_control()
+        limiter.close_flight_recorder()
+        limiter.close_baseline()
+
+    def stop(self):
+        """Put every limited session back to its default volume"""
+        self.watcher.stop()
+        for row in np.flatnonzero(self._limiting):
+            try:
+                self._controls[row].set_volume(self._apps[row].DEFAULT_VOLUME)
+            except Exception:
+                pass
+
+    def pause(self):
+        """Hand every limited session its volume back and stop their envelopes"""
+        now = self.limiter.clock.time()
+        for row in np.flatnonzero(self._limiting):
+            session = self._sessions[row]
+            self._envelopes[session.key].cancel(now)
+            try:
+                self._controls[row].set_volume(self._apps[row].DEFAULT_VOLUME)
+                self._volumes[row] = self._apps[row].DEFAULT_VOLUME
+            except Exception:
+                self.limiter.sessions.invalidate(session)
+            self.detector.reset(row)
+        self._limiting[:] = False
+        self._releasing[:] = False
+
+    def status(self):
+        """Protected sessions and their state, for the control socket"""
+        peaks = self.detector.latest()
+        result = []
+        for row, session in enumerate(self._sessions):
+            envelope = self._envelopes.get(session.key)
+            result.append({
+                "app": self._apps[row].name,
+                "process": session.name,
+                "pid": session.pid,
+                "state": envelope.phase if envelope else IDLE,
+                "peak": round(float(peaks[row]), 4),
+                "volume": round(float(self._volumes[row]), 4),
+                "threshold": round(float(self._thresholds[row]), 4),
+            })
+        return result
+
+    def recent_peaks(self, count):
+        return [{"app": self._apps[row].name, "process": session.name, "pid": session.pid,
+                 "peaks": self.detector.recent(row, count).round(4).tolist()}
+                for row, session in enumerate(self._sessions)]
+
+    def apply_settings(self):
+        """Re-match sessions after a config reload, keeping their window state"""
+        limiter = self.limiter
+        self.policy = SessionPolicy.from_config(limiter.APPS, limiter)
+        self.watcher.policy = self.policy
+        matched = []
+        for row, session in enumerate(self._sessions):
+            app = self.policy.match(session)
+            if app is not None:
+                matched.append((session, app))
+            elif self._limiting[row]:
+                # No longer protected: hand the volume back before dropping it
+                try:
+                    self._controls[row].set_volume(self._apps[row].DEFAULT_VOLUME)
+                except Exception:
+                    pass
+        self._rebuild(matched, dropped="no longer matches APPS")
+        for row, session in enumerate(self._sessions):
+            envelope = self._envelopes.get(session.key)
+            if envelope is not None:
+                envelope.configure(limiter.ATTACK_TIME, self._apps[row].RECOVERY_TIME, limiter.RELEASE_TIME,
+                                   limiter.RELEASE_CURVE, limiter.VOLUME_TOLERANCE)
+        # Sessions the new patterns match are picked up by the next scan
+        self.watcher.rescan()
+
+    def _rebuild(self, matched, dropped="audio session ended"):
+        limiter = self.limiter
+        old_keys = {session.key: row for row, session in enumerate(self._sessions)}
+        sessions, apps, controls = [], [], []
+        for session, app in matched:
+            try:
+                resolved = limiter.sessions.controls(session)
+            except Exception:
+                continue
+            sessions.append(session)
+            apps.append(app)
+            controls.append(resolved)
+            if session.key not in old_keys:
+                try:
+                    resolved.set_volume(app.DEFAULT_VOLUME)
+                except Exception:
+                    pass
+                limiter.renderer.message(f"✅ Protecting {app.name} ({session.name}, pid {session.pid})")
+
+        new_keys = {session.key for session in sessions}
+        for session in self._sessions:
+            if session.key not in new_keys:
+                envelope = self._envelopes.pop(session.key, None)
+                if envelope is not None:
+                    # Its phase timers must not fire for a session that is gone
+                    envelope.cancel()
+                limiter.renderer.message(f"⚠️  {session.name} (pid {session.pid}) {dropped}")
+
+        def carry(values, fill):
+            result = np.full(len(sessions), fill, dtype=np.asarray(values).dtype)
+            for row, session in enumerate(sessions):
+                old = old_keys.get(session.key)
+                if old is not None:
+                    result[row] = values[old]
+            return result
+
+        self._limiting = carry(self._limiting, False)
+        self._releasing = carry(self._releasing, False)
+        self._volumes = carry(self._volumes, 0.0)
+        self._loud_since = carry(self._loud_since, math.nan)
+        for row, session in enumerate(sessions):
+            if session.key not in old_keys:
+                self._volumes[row] = apps[row].DEFAULT_VOLUME
+
+        self._sessions = sessions
+        self._apps = apps
+        self._controls = controls
+        self._meters = [resolved.get_peak for resolved in controls]
+        self._fixed_thresholds = np.array([app.THRESHOLD for app in apps], dtype=np.float64)
+        self._thresholds = self._fixed_thresholds.copy()
+        self._release_levels = self._thresholds * 0.7
+        if limiter.baseline:
+            limiter.baseline.set_rows([session.name for session in sessions])
+            # Learned trip points replace the fixed ones on the next tick
+            limiter._baseline_due = 0.0
+        history = limiter.window_samples(limiter.PRE_INCIDENT_SECONDS / WINDOW_UNIT)
+        self.detector.set_rows(
+            [session.key for session in sessions],
+            [limiter.window_samples(app.PEAK_WINDOW) for app in apps],
+            self._thresholds,
+            history=history,
+        )
+
+    def _track_baseline(self, peaks, now):
+        limiter = self.limiter
+        limiter.baseline.add(self.detector.means(), limiter.scheduler.samples_per_tick, now,
+                             mask=~self._limiting & self.detector.ready())
+        if not limiter.baseline_due(now):
+            return
+        self._thresholds = limiter.baseline.trip_levels(self._fixed_thresholds, now)
+        self._release_levels = self._thresholds * 0.7
+        self.detector.set_thresholds(self._thresholds)
+
+    def _read_peaks(self):
+        count = len(self._meters)
+        try:
+            return np.fromiter((read() for read in self._meters), dtype=np.float64, count=count)
+        except Exception:
+            pass
+        # One session failed: read them individually and drop the broken ones
+        peaks = np.zeros(count)
+        for row, read in enumerate(self._meters):
+            try:
+                peaks[row] = read()
+            except Exception:
+                self.limiter.sessions.invalidate(self._sessions[row])
+        return peaks
+
+    def _evaluate(self, peaks, now):
+        above = peaks > self._thresholds
+        self._loud_since = np.where(above, np.where(np.isnan(self._loud_since), now, self._loud_since), math.nan)
+
+        tripped = self.detector.tripped()
+        # A blast during a release ramp re-attenuates at once
+        for row in np.flatnonzero(tripped & (~self._limiting | self._releasing)):
+            self._trigger(int(row), now)
+
+        calm = self._limiting & ~self._releasing & self.detector.ready() & (
+            self.detector.means() <= self._release_levels
+        )
+        for row in np.flatnonzero(calm):
+            self._envelopes[self._sessions[row].key].release(now)
+
+    def _trigger(self, row, now):
+        limiter = self.limiter
+        session = self._sessions[row]
+        app = self._apps[row]
+        envelope = self._envelopes.get(session.key)
+        if envelope is None:
+            envelope = GainEnvelope(
+                attack_time=limiter.ATTACK_TIME,
+                hold_time=app.RECOVERY_TIME,
+                release_time=limiter.RELEASE_TIME,
+                curve=limiter.RELEASE_CURVE,
+                tolerance=limiter.VOLUME_TOLERANCE,
+                timers=limiter.timers,
+            )
+            envelope.add_listener(
+                lambda *change, session=session, app=app.name: limiter.count_transition(*change, session, app)
+            )
+            self._envelopes[session.key] = envelope
+        if not self._limiting[row]:
+            envelope.sync(float(self._volumes[row]))
+        envelope.trigger(now, app.REDUCTION, app.DEFAULT_VOLUME)
+        self._limiting[row] = True
+        self._releasing[row] = False
+
+        loud_since = self._loud_since[row]
+        limiter.log_incident(
+            self.detector.max(row),
+            float(self.detector.means()[row]),
+            window="sustained",
+            time_to_action=None if math.isnan(loud_since) else now - loud_since,
+            session=session,
+            app=app.name,
+            reduction=app.REDUCTION,
+            window_seconds=app.PEAK_WINDOW * WINDOW_UNIT,
+            pre_incident=self.detector.recent(row, self.detector.capacity).tolist(),
+        )
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        limiter.renderer.message(
+            f"🔇 [{timestamp}] EAR-RAPE DETECTED in {app.name} ({session.name})!"
+            f" Reduced to {int(app.REDUCTION * 100)}%"
+        )
+
+    def _advance(self, now):
+        for row in np.flatnonzero(self._limiting):
+            session = self._sessions[row]
+            envelope = self._envelopes[session.key]
+            gain = envelope.advance(now)
+            if gain is not None:
+                try:
+                    self._controls[row].set_volume(min(gain, 1.0))
+                    self._volumes[row] = gain
+                except Exception:
+                    self.limiter.sessions.invalidate(session)
+            self._releasing[row] = envelope.phase == RELEASE
+            if not envelope.active:
+                self._limiting[row] = False
+                self._releasing[row] = False
+                self.detector.reset(row)
+                self.limiter.renderer.message(
+                    f"🔊 RESTORED: {self._apps[row].name} ({session.name}) back to"
+                    f" {int(self._apps[row].DEFAULT_VOLUME * 100)}%"
+                )
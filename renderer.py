@@ -0,0 +1,100 @@
+import threading
+from collections import deque
+
+
+class ConsoleRenderer:
+    """Draws the status line from its own thread at a capped frame rate
+
+    The monitor only calls update() with the latest values (a single tuple
+    assignment) and message() for one-off events; all string building and
+    terminal I/O happen here. A frame is redrawn only when what it would
+    show has changed. With show_status=False (headless) the status line is
+    never drawn and only event messages are printed.
+    """
+
+    def __init__(self, fps=10.0, show_status=True):
+        self.interval = 1.0 / fps if fps > 0 else 0.1
+        self.show_status = show_status
+        self.frames = 0
+        self._snapshot = None
+        self._rendered = None
+        self._messages = deque()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="console-renderer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._flush_messages()
+
+    def update(self, limiting, peak, volume, loudness=None):
+        """Publish the latest monitor state (called every tick)"""
+        self._snapshot = (limiting, peak, volume, loudness)
+
+    def message(self, text):
+        """Print an event line ahead of the next frame"""
+        self._messages.append(text)
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_messages()
+            if self.show_status:
+                self._draw()
+
+    def _flush_messages(self):
+        while self._messages:
+            print(f"\n{self._messages.popleft()}")
+            # The status line was overwritten; draw it again next frame
+            self._rendered = None
+
+    def _draw(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        limiting, peak, volume, loudness = snapshot
+        key = (
+            limiting,
+            int(peak * 100),
+            int(volume * 100),
+            None if loudness is None else round(loudness, 1),
+        )
+        if key == self._rendered:
+            return
+        self._rendered = key
+        self.frames += 1
+        print(format_status(limiting, peak, volume, loudness), end="\r", flush=True)
+
+
+def format_status(limiting, peak_level, current_volume, loudness=None):
+    status = "🔴 LIMITING" if limiting else "🟢 MONITORING"
+    peak_bar = "█" * int(peak_level * 30)
+    peak_pct = int(peak_level * 100)
+    vol_bar = "█" * int(current_volume * 20)
+    vol_pct = int(current_volume * 100)
+    if peak_level > 0.85:
+        indicator = "🔴 VERY LOUD"
+    elif peak_level > 0.6:
+        indicator = "🟡 LOUD"
+    elif peak_level > 0.2:
+        indicator = "🟢 ACTIVE"
+    else:
+        indicator = "🔵 QUIET"
+    loudness_text = f" | {loudness:6.1f} LUFS" if loudness is not None else ""
+    return (
+        f"{status} | Peak:[{peak_bar:<30}]{peak_pct:3d}% | Vol:[{vol_bar:<20}]{vol_pct:3d}%"
+        f"{loudness_text} | {indicator}    "
+    )
@@ -0,0 +1,105 @@
+import math
+
+
+class TickScheduler:
+    """Runs the monitor tick on absolute deadlines at an adaptive rate
+
+    Deadlines advance by whole periods from the previous deadline rather
+    than sleeping a fixed time after the work, so the tick rate does not
+    drift with COM latency or console output. While the channel is quiet
+    the period stretches to the idle rate; any level above active_level
+    (or active limiting) switches back to the fast rate on the next tick.
+    """
+
+    def __init__(self, clock, fast_rate=50.0, idle_rate=4.0, active_level=0.2, quiet_after=2.0):
+        self.clock = clock
+        self.quiet_after = quiet_after
+        self.period = None
+        self.configure(fast_rate, idle_rate, active_level)
+        self._deadline = None
+        self._last_active = None
+        self._last_start = None
+        self.reset_stats()
+
+    def configure(self, fast_rate, idle_rate, active_level):
+        """Change the rates; the next deadline is one new period after the last"""
+        idle = self.period is not None and self.period == self.idle_period
+        self.fast_period = 1.0 / fast_rate
+        self.idle_period = 1.0 / idle_rate
+        self.active_level = active_level
+        self.period = self.idle_period if idle else self.fast_period
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.missed = 0
+        self.overruns = 0
+        self.max_lateness = 0.0
+        self._lateness_total = 0.0
+        # Welford accumulators over (actual interval - nominal period)
+        self._intervals = 0
+        self._drift_mean = 0.0
+        self._drift_m2 = 0.0
+
+    @property
+    def samples_per_tick(self):
+        """How many fast-rate samples one tick stands for"""
+        return max(1, int(round(self.period / self.fast_period)))
+
+    def start(self):
+        self._deadline = self.clock.time()
+        self._last_start = None
+        self._last_active = self._deadline
+
+    def observe(self, level, limiting=False):
+        """Pick the next period from the latest level and limiter state"""
+        now = self.clock.time()
+        if limiting or level > self.active_level:
+            self._last_active = now
+            self.period = self.fast_period
+        elif self._last_active is None or now - self._last_active >= self.quiet_after:
+            self.period = self.idle_period
+
+    def wait(self):
+        """Sleep until the next deadline, skipping any that already passed"""
+        if self._deadline is None:
+            self.start()
+        period = self.period
+        deadline = self._deadline + period
+        now = self.clock.time()
+        if now >= deadline:
+            self.overruns += 1
+            skipped = int((now - deadline) / period)
+            self.missed += skipped
+            deadline += skipped * period
+        else:
+            self.clock.sleep(deadline - now)
+        self._deadline = deadline
+        self._record_tick(deadline, period)
+
+    def _record_tick(self, deadline, nominal):
+        start = self.clock.time()
+        lateness = max(start - deadline, 0.0)
+        self.ticks += 1
+        self._lateness_total += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if self._last_start is not None:
+            drift = (start - self._last_start) - nominal
+            self._intervals += 1
+            delta = drift - self._drift_mean
+            self._drift_mean += delta / self._intervals
+            self._drift_m2 += delta * (drift - self._drift_mean)
+        self._last_start = start
+
+    def stats(self):
+        jitter = math.sqrt(self._drift_m2 / self._intervals) if self._intervals > 1 else 0.0
+        return {
+            "rate_hz": 1.0 / self.period,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "overruns": self.overruns,
+            "mean_drift_ms": self._drift_mean * 1000,
+            "jitter_ms": jitter * 1000,
+            "mean_lateness_ms": (self._lateness_total / self.ticks * 1000) if self.ticks else 0.0,
+            "max_lateness_ms": self.max_lateness * 1000,
+        }
@@ -0,0 +1,95 @@
+import threading
+
+from metrics import InstrumentedControls
+
+
+class SessionRegistry:
+    """Caches matched sessions and their resolved controls
+
+    Sessions are keyed by (pid, session identifier). A cached entry stays
+    valid until the backend reports the session expired or its process
+    gone, so the full enumeration and the per-call interface queries only
+    happen when something actually changed. With a metrics registry the
+    returned controls time every meter and volume call.
+    """
+
+    def __init__(self, backend, metrics=None):
+        self.backend = backend
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._controls = {}
+        self._matches = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.enumerations = 0
+
+    def find(self, name_variants):
+        """Return the cached session for name_variants, enumerating only on a miss"""
+        lookup = tuple(name_variants)
+        with self._lock:
+            session = self._matches.get(lookup)
+        if session is not None:
+            if self.backend.is_alive(session):
+                self.hits += 1
+                return session
+            self.invalidate(session)
+
+        self.misses += 1
+        self.enumerations += 1
+        session = self.backend.find_session(name_variants)
+        if session is not None:
+            with self._lock:
+                self._matches[lookup] = session
+        return session
+
+    def controls(self, session):
+        """Resolved meter/volume controls for session"""
+        key = session.key
+        with self._lock:
+            entry = self._controls.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        controls = self.backend.open_controls(session)
+        if self.metrics is not None:
+            controls = InstrumentedControls(controls, self.metrics)
+        with self._lock:
+            self._controls[key] = (session, controls)
+        return controls
+
+    def invalidate(self, session):
+        """Drop every cached entry that refers to session"""
+        key = session.key
+        with self._lock:
+            removed = self._controls.pop(key, None) is not None
+            for lookup, cached in list(self._matches.items()):
+                if cached.key == key:
+                    del self._matches[lookup]
+                    removed = True
+        if removed:
+            self.invalidations += 1
+
+    def prune(self):
+        """Invalidate cached sessions the backend no longer reports alive"""
+        with self._lock:
+            sessions = {s.key: s for s in self._matches.values()}
+            sessions.update((key, entry[0]) for key, entry in self._controls.items())
+        for session in sessions.values():
+            if not self.backend.is_alive(session):
+                self.invalidate(session)
+
+    def clear(self):
+        with self._lock:
+            self._controls.clear()
+            self._matches.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "enumerations": self.enumerations,
+            "cached_sessions": len(self._controls),
+        }
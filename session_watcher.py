@@ -0,0 +1,191 @@
+import threading
+
+
+class SessionWatcher:
+    """Keeps the matched session up to date from a background thread
+
+    Backends that support session notifications push created/expired events
+    which trigger an immediate rescan; everything else (and a slow safety
+    net on top of notifications) is handled by polling. The monitor only
+    ever reads current(), so discovery never stalls the sampling loop.
+    """
+
+    def __init__(self, registry, name_variants, clock, poll_interval=2.0, check_interval=5.0):
+        self.registry = registry
+        self.backend = registry.backend
+        self.name_variants = list(name_variants)
+        self.clock = clock
+        # How often to look for a session while none is attached
+        self.poll_interval = poll_interval
+        # How often to re-verify an attached session without notifications
+        self.check_interval = check_interval
+        self.notifications = False
+        self.version = 0
+        self._session = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def current(self):
+        """Latest matched session, or None while there isn't one"""
+        return self._session
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        # First lookup happens inline so an already-running Discord is
+        # protected from the very first tick
+        self._scan()
+        self._thread = threading.Thread(target=self._run, name="session-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if getattr(self.backend, "supports_notifications", False) and self.notifications:
+            try:
+                self.backend.unsubscribe()
+            except Exception:
+                pass
+
+    def rescan(self):
+        """Look for sessions now instead of at the next poll"""
+        self._wake.set()
+
+    def on_session_created(self, session):
+        """Notification hook: a new audio session appeared"""
+        if session is None or self._matches(session):
+            self._wake.set()
+
+    def on_session_expired(self, session):
+        """Notification hook: an audio session expired or its process exited"""
+        if session is not None:
+            self.registry.invalidate(session)
+            current = self._session
+            if current is not None and current.key == session.key:
+                self._publish(None)
+        self._wake.set()
+
+    def _matches(self, session):
+        if not session.name:
+            return False
+        name_lower = session.name.lower()
+        return any(variant in name_lower for variant in self.name_variants)
+
+    def _publish(self, session):
+        with self._lock:
+            previous = self._session
+            changed = (previous is None) != (session is None) or (
+                previous is not None and previous.key != session.key
+            )
+            self._session = session
+            if changed:
+                self.version += 1
+
+    def _scan(self):
+        try:
+            session = self.registry.find(self.name_variants)
+        except Exception:
+            session = None
+        self._publish(session)
+        self._watch_current()
+
+    def _watch_current(self):
+        if not self.notifications or self._session is None:
+            return
+        try:
+            self.backend.watch_session(self._session)
+        except Exception:
+            pass
+
+    def _run(self):
+        try:
+            self.backend.thread_init()
+        except Exception:
+            pass
+        if getattr(self.backend, "supports_notifications", False):
+            try:
+                self.notifications = bool(
+                    self.backend.subscribe(self.on_session_created, self.on_session_expired)
+                )
+            except Exception:
+                self.notifications = False
+        self._watch_current()
+
+        while self._running:
+            if not self._session:
+                interval = self.poll_interval
+            elif self.notifications:
+                # Notifications do the real work; this is only a safety net
+                interval = self.check_interval * 6
+            else:
+                interval = self.check_interval
+            self.clock.wait(self._wake, interval)
+            self._wake.clear()
+            if not self._running:
+                break
+            self._scan()
+
+
+class SessionSetWatcher(SessionWatcher):
+    """Tracks every session a SessionPolicy matches, for multi-app mode
+
+    current() returns a tuple of (session, app) pairs; version changes
+    whenever a session joins or leaves the set.
+    """
+
+    def __init__(self, registry, policy, clock, poll_interval=2.0, check_interval=5.0):
+        super().__init__(registry, [], clock, poll_interval, check_interval)
+        self.policy = policy
+        self._session = ()
+
+    def current(self):
+        return self._session
+
+    def on_session_expired(self, session):
+        if session is not None:
+            self.registry.invalidate(session)
+            remaining = tuple(pair for pair in self._session if pair[0].key != session.key)
+            if len(remaining) != len(self._session):
+                self._publish(remaining)
+        self._wake.set()
+
+    def _matches(self, session):
+        return self.policy.match(session) is not None
+
+    def _publish(self, matched):
+        with self._lock:
+            previous = {session.key for session, _ in self._session}
+            self._session = matched
+            if previous != {session.key for session, _ in matched}:
+                self.version += 1
+
+    def _scan(self):
+        try:
+            sessions = self.backend.get_sessions()
+        except Exception:
+            # Keep the last known set rather than dropping protection
+            return
+        matched = []
+        for session in sessions:
+            app = self.policy.match(session)
+            if app is not None:
+                matched.append((session, app))
+        # Cached controls for sessions that left the set are stale now
+        keys = {session.key for session, _ in matched}
+        for session, _ in self._session:
+            if session.key not in keys:
+                self.registry.invalidate(session)
+        self._publish(tuple(matched))
+        self._watch_current()
+
+    def _watch_current(self):
+        if not self.notifications:
+            return
+        for session, _ in self._session:
+            try:
+                self.backend.watch_session(session)
+            except Exception:
+                pass
@@ -0,0 +1,253 @@
+import json
+import math
+import os
+from types import MappingProxyType
+
+from envelope import CURVES
+
+# Inclusive (minimum, maximum) for numeric settings; None leaves a side open
+RANGES = {
+    "THRESHOLD": (0.0, 1.0),
+    "REDUCTION": (0.0, 1.0),
+    "RECOVERY_TIME": (0.0, None),
+    "DEFAULT_VOLUME": (0.0, 1.0),
+    "PEAK_WINDOW": (0.0, None),
+    "FAST_WINDOW": (0.0, None),
+    "FAST_THRESHOLD": (0.0, 1.0),
+    "FAST_SAMPLE_RATE": (0.0, 1000.0),
+    "IDLE_SAMPLE_RATE": (0.0, 1000.0),
+    "ACTIVE_LEVEL": (0.0, 1.0),
+    "ATTACK_TIME": (0.0, None),
+    "RELEASE_TIME": (0.0, None),
+    "VOLUME_TOLERANCE": (0.0, 1.0),
+    "CAPTURE_DEVICE": (0, None),
+    "LOUDNESS_THRESHOLD": (-70.0, 0.0),
+    "DISTORTION_THRESHOLD": (0.0, 1.0),
+    "LOG_MAX_BYTES": (0, None),
+    "LOG_MAX_AGE_DAYS": (0.0, None),
+    "LOG_BACKUPS": (0, None),
+    "PRE_INCIDENT_SECONDS": (0.0, 600.0),
+    "DISPLAY_FPS": (0.0, 100.0),
+    "METRICS_PORT": (0, 65535),
+    "CONTROL_PORT": (0, 65535),
+    "METRICS_INTERVAL": (0.0, None),
+    "FLIGHT_RECORDER_HOURS": (0.0, None),
+    "SNAPSHOT_SECONDS": (0.0, None),
+    "CONFIG_RELOAD_INTERVAL": (0.0, None),
+    "BASELINE_QUANTILE": (0.5, 0.999),
+    "BASELINE_MARGIN_DB": (0.0, 40.0),
+    "BASELINE_HALF_LIFE": (0.0, None),
+}
+# Must be above their minimum, not just equal to it
+POSITIVE = ("PEAK_WINDOW", "FAST_SAMPLE_RATE", "IDLE_SAMPLE_RATE", "DISPLAY_FPS",
+            "METRICS_INTERVAL", "FLIGHT_RECORDER_HOURS", "BASELINE_HALF_LIFE")
+INTEGERS = ("CAPTURE_DEVICE", "LOG_MAX_BYTES", "LOG_BACKUPS", "METRICS_PORT", "CONTROL_PORT")
+CHOICES = {
+    "RELEASE_CURVE": tuple(CURVES),
+    "LOG_FORMAT": ("text", "jsonl", "both"),
+}
+# Per-app keys in config.json "APPS"; anything missing falls back to the
+# top-level setting of the same name
+APP_SETTING_KEYS = ("THRESHOLD", "REDUCTION", "RECOVERY_TIME", "DEFAULT_VOLUME", "PEAK_WINDOW")
+
+
+class ConfigError(ValueError):
+    """config.json failed validation; problems lists every rejected value"""
+
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = list(problems)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class Settings:
+    """Immutable snapshot of every config.json setting
+
+    Values read as attributes (settings.THRESHOLD) and nested sections
+    come back as read-only mappings and tuples, so a Settings handed to
+    the monitor can never change underneath it. A reload builds a new
+    object and the monitor swaps the reference between ticks.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values):
+        object.__setattr__(self, "_values", MappingProxyType({key: _freeze(value) for key, value in values.items()}))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are immutable; load a new Settings instead")
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __eq__(self, other):
+        return isinstance(other, Settings) and self._values == other._values
+
+    __hash__ = None
+
+    def as_dict(self):
+        """Plain, mutable copy (for json.dump)"""
+        return {key: _thaw(value) for key, value in self._values.items()}
+
+    def changed(self, other):
+        """Keys whose values differ from other (a Settings or any object with the same attributes)"""
+        return [key for key in self._values if _freeze(getattr(other, key, None)) != self._values[key]]
+
+
+def _check_value(key, value, default):
+    """Problem description for one value, or None if it is acceptable"""
+    if key in CHOICES:
+        if value not in CHOICES[key]:
+            return f"{key} must be one of {', '.join(CHOICES[key])} (got {value!r})"
+        return None
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            return f"{key} must be true or false (got {value!r})"
+        return None
+    if key in RANGES:
+        if value is None and default is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"{key} must be a number (got {value!r})"
+        if key in INTEGERS and value != int(value):
+            return f"{key} must be a whole number (got {value!r})"
+        low, high = RANGES[key]
+        if (low is not None and value < low) or (high is not None and value > high) or (
+            key in POSITIVE and value <= low
+        ):
+            bounds = f"above {low:g}" if key in POSITIVE else f"at least {low:g}"
+            if high is not None:
+                bounds += f" and at most {high:g}"
+            return f"{key} must be {bounds} (got {value!r})"
+        return None
+    if isinstance(default, str) and not isinstance(value, str):
+        return f"{key} must be a string (got {value!r})"
+    return None
+
+
+def _check_apps(apps, defaults):
+    if not isinstance(apps, dict) or not apps:
+        return [f"APPS must map application names to settings (got {apps!r})"]
+    problems = []
+    for name, entry in apps.items():
+        if not isinstance(entry, dict):
+            problems.append(f"APPS.{name} must be an object (got {entry!r})")
+            continue
+        patterns = entry.get("patterns", [name])
+        if not isinstance(patterns, list) or not all(isinstance(pattern, str) for pattern in patterns):
+            problems.append(f"APPS.{name}.patterns must be a list of process names")
+        for key in APP_SETTING_KEYS:
+            if key in entry:
+                problem = _check_value(key, entry[key], defaults[key])
+                if problem:
+                    problems.append(f"APPS.{name}.{problem}")
+    return problems
+
+
+def validate(cfg, defaults):
+    """Check a parsed config.json against defaults
+
+    Returns (values, problems): values holds every default key, with the
+    config's value where it passed and the default where it did not, and
+    problems describes each rejected or unknown entry.
+    """
+    if not isinstance(cfg, dict):
+        return dict(defaults), ["config.json must hold a JSON object"]
+    values = dict(defaults)
+    problems = []
+    for key, value in cfg.items():
+        if key not in defaults:
+            problems.append(f"unknown setting {key}")
+            continue
+        if key == "APPS":
+            found = _check_apps(value, defaults)
+        else:
+            problem = _check_value(key, value, defaults[key])
+            found = [problem] if problem else []
+        if found:
+            problems.extend(found)
+        else:
+            values[key] = value
+    if values["IDLE_SAMPLE_RATE"] > values["FAST_SAMPLE_RATE"]:
+        problems.append("IDLE_SAMPLE_RATE must not exceed FAST_SAMPLE_RATE")
+        values["IDLE_SAMPLE_RATE"] = min(defaults["IDLE_SAMPLE_RATE"], values["FAST_SAMPLE_RATE"])
+    return values, problems
+
+
+def load_settings(path, defaults):
+    """Read and validate a config file; returns (Settings, problems)
+
+    Raises OSError or ValueError if the file cannot be read or parsed.
+    """
+    with open(path, "r") as f:
+        cfg = json.load(f)
+    values, problems = validate(cfg, defaults)
+    return Settings(values), problems
+
+
+class ConfigWatcher:
+    """Notices edits to config.json without re-reading it every tick
+
+    poll() is called from the monitor loop. It stats the file at most once
+    per interval and only parses it when the modification time or size
+    changed, so an unchanged config costs one stat call a second. An edit
+    that fails to parse or validate raises ConfigError and is not retried
+    until the file changes again.
+    """
+
+    def __init__(self, path, defaults, interval=1.0):
+        self.path = path
+        self.defaults = defaults
+        self.interval = interval
+        self._signature = self._stat()
+        self._next_check = None
+
+    def acknowledge(self):
+        """Treat the file as it is now as already loaded (after the limiter wrote it)"""
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, now):
+        """New Settings if the file changed and is valid, else None"""
+        if self._next_check is not None and now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            # A deleted config keeps the running settings
+            return None
+        self._signature = signature
+        try:
+            settings, problems = load_settings(self.path, self.defaults)
+        except (OSError, ValueError) as e:
+            raise ConfigError([f"could not read {os.path.basename(self.path)} ({e})"]) from e
+        if problems:
+            raise ConfigError(problems)
+        return settings
@@ -0,0 +1,35 @@
+import sys
+import time
+
+# Modules that make a cold start slow; the profile reports which got loaded
+HEAVY_MODULES = ("numpy", "pyaudio", "pyaudiowpatch", "comtypes", "pycaw", "http.server", "urllib.request", "ssl")
+
+
+class StartupProfile:
+    """Timeline of named startup phases for --startup-profile
+
+    Phases are measured from when the profile is created (the start of
+    the __main__ block). Imports run before that, so the process CPU
+    time at creation is reported alongside as an estimate of their cost.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.import_cpu = time.process_time()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        lines = [
+            "⏱️  Startup profile",
+            f"   {'imports (process CPU time)':<30} {self.import_cpu * 1000:8.1f} ms",
+        ]
+        previous = self.started
+        for name, at in self.marks:
+            lines.append(f"   {name:<30} {(at - previous) * 1000:8.1f} ms  (at {(at - self.started) * 1000:.1f} ms)")
+            previous = at
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append(f"   Heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+        return "\n".join(lines)
@@ -0,0 +1,462 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_backend import PeakTrace
+from envelope import CURVES
+from latency_harness import run_trace, score_reductions, synthetic_trace
+from settings import validate
+from timers import DEADLINE_SLACK
+from volume_limiter import CONFIG_DEFAULTS, WINDOW_UNIT
+
+# Keys a grid may vary; everything else comes from the base config
+SWEEP_KEYS = (
+    "THRESHOLD", "REDUCTION", "PEAK_WINDOW", "RECOVERY_TIME", "DEFAULT_VOLUME",
+    "FAST_WINDOW", "FAST_THRESHOLD", "ATTACK_TIME", "RELEASE_TIME", "FAST_SAMPLE_RATE",
+)
+# Other settings the live loop needs from the base config in --exact mode
+LIVE_KEYS = ("RELEASE_CURVE", "VOLUME_TOLERANCE", "IDLE_SAMPLE_RATE", "ACTIVE_LEVEL", "ADAPTIVE_THRESHOLD",
+             "BASELINE_QUANTILE", "BASELINE_MARGIN_DB", "BASELINE_HALF_LIFE")
+# Base settings TraceEvaluator does not replay, with the value it assumes
+FAST_ASSUMES = {"ADAPTIVE_THRESHOLD": False}
+# Capture reads real audio, which a peak trace does not have
+TRACE_ASSUMES = {"CAPTURE_SOURCE": ""}
+# Peak meter rate used when turning WAV files into traces
+WAV_PEAK_RATE = 100.0
+# How far back the start of a loud run is searched for time_to_action
+LOUD_RUN_LOOKBACK = 60.0
+
+
+def wav_peak_trace(path, sample_rate=WAV_PEAK_RATE):
+    """Peak meter trace of a 16-bit WAV file: max |sample| per meter period"""
+    from capture import WavFileSource
+
+    source = WavFileSource(path)
+    samples = np.abs(source.read_all().astype(np.int32)).max(axis=1)
+    block = max(1, int(round(source.sample_rate / sample_rate)))
+    usable = len(samples) // block * block
+    peaks = samples[:usable].reshape(-1, block).max(axis=1) / 32768.0
+    return PeakTrace(peaks, sample_rate=source.sample_rate / block, name=os.path.basename(path))
+
+
+def load_trace(path):
+    if path.lower().endswith(".wav"):
+        return wav_peak_trace(path)
+    return PeakTrace.load(path)
+
+
+def _window_means(y, first, last, size):
+    """Mean of y[k - size + 1 .. k] for k = first .. last (NaN before a full window)"""
+    lo = max(0, first - size + 1)
+    sums = np.concatenate(([0.0], np.cumsum(y[lo:last + 1])))
+    k = np.arange(first, last + 1)
+    means = np.full(len(k), np.nan)
+    valid = k - size + 1 >= lo
+    end = k[valid] - lo + 1
+    means[valid] = (sums[end] - sums[end - size]) / size
+    return means
+
+
+def _first(mask, offset=0):
+    hits = np.flatnonzero(mask)
+    return int(hits[0]) + offset if len(hits) else None
+
+
+def _applied(gains, written, tolerance, floor, ceiling):
+    """Volume in force after each tick of an envelope producing gains
+
+    Like GainEnvelope.advance(), a new gain is only written once it has
+    moved more than tolerance from the last write or lands on an endpoint.
+    Ramps are a few hundred ticks at most, so a plain loop is cheap.
+    """
+    applied = np.empty(len(gains))
+    for index, gain in enumerate(gains.tolist()):
+        if abs(gain - written) > tolerance or (gain in (floor, ceiling) and gain != written):
+            written = gain
+        applied[index] = written
+    return applied
+
+
+class TraceEvaluator:
+    """The monitor's detection and limiting decisions, replayed with NumPy
+
+    The trace is read at FAST_SAMPLE_RATE exactly as the monitor's ticks
+    would read it. Between incidents nothing depends on earlier decisions,
+    so the next trip is found with a cumulative-sum window mean over the
+    whole stretch at once. Each incident is then played forward in
+    vectorized segments: attack/hold until the window calms down or the
+    hold ends, then the release ramp, where a new trip re-attenuates just
+    like the live loop does. With meter_follows_volume the meter reads
+    are scaled by the volume in force, as Windows' session meter is; as in
+    the live loop, that is the last volume written, which only changes by
+    more than VOLUME_TOLERANCE at a time.
+
+    Ticks are always at the fast rate; the idle rate the live scheduler
+    drops to in silence is not modelled, so latencies can come out up to
+    one idle period shorter than the live monitor's.
+    """
+
+    def __init__(self, trace, meter_follows_volume=True):
+        self.trace = trace
+        self.meter_follows_volume = meter_follows_volume
+        self._peaks = np.asarray(trace.peaks, dtype=np.float64)
+        self._resampled = {}
+
+    def samples(self, rate):
+        """Trace values at each tick of a monitor running at rate Hz"""
+        if rate not in self._resampled:
+            ticks = int(self.trace.duration * rate)
+            # Rounded like PeakTrace.peak_at, so tick k reads the same sample
+            index = (np.arange(ticks) / rate * self.trace.sample_rate + 1e-6).astype(np.int64)
+            self._resampled[rate] = self._peaks[np.minimum(index, len(self._peaks) - 1)]
+        return self._resampled[rate]
+
+    def run(self, settings):
+        """Incidents as a list of (time, window, time_to_action, reduced)
+
+        reduced is when the first lowered volume is written: the trigger
+        tick itself without an attack ramp, later when the ramp's first
+        steps stay within VOLUME_TOLERANCE.
+        """
+        rate = settings["FAST_SAMPLE_RATE"]
+        dt = 1.0 / rate
+        x = self.samples(rate)
+        n = len(x)
+        if not n:
+            return []
+
+        def samples_for(window):
+            return max(1, int(round(window * WINDOW_UNIT * rate)))
+
+        size = samples_for(settings["PEAK_WINDOW"])
+        threshold = settings["THRESHOLD"]
+        fast_size = samples_for(settings["FAST_WINDOW"]) if settings["FAST_WINDOW"] > 0 else None
+        fast_threshold = settings["FAST_THRESHOLD"]
+        release_level = threshold * 0.7
+        floor = settings["REDUCTION"]
+        ceiling = settings["DEFAULT_VOLUME"]
+        attack = settings["ATTACK_TIME"]
+        hold = settings["RECOVERY_TIME"]
+        release = settings["RELEASE_TIME"]
+        tolerance = settings["VOLUME_TOLERANCE"]
+        curve = np.vectorize(CURVES[settings.get("RELEASE_CURVE", "linear")], otypes=[float])
+        idle_gain = ceiling if self.meter_follows_volume else 1.0
+
+        def ramp(start, end, progress):
+            return start + (end - start) * curve(np.clip(progress, 0.0, 1.0))
+
+        def meter(volumes):
+            return volumes if self.meter_follows_volume else 1.0
+
+        # What the meter reads while nothing is being limited
+        idle = x * idle_gain
+        idle_trips = [np.flatnonzero(_window_means(idle, 0, n - 1, size) > threshold)]
+        if fast_size:
+            idle_trips.append(np.flatnonzero(_window_means(idle, 0, n - 1, fast_size) > fast_threshold))
+        y = idle.copy()
+
+        def tripped(first, last, since):
+            """Ticks in first..last whose windows (filled since `since`) trip"""
+            hits = _window_means(y, first, last, size) > threshold
+            hits &= np.arange(first, last + 1) >= since + size - 1
+            if fast_size:
+                fast = _window_means(y, first, last, fast_size) > fast_threshold
+                hits |= fast & (np.arange(first, last + 1) >= since + fast_size - 1)
+            return hits
+
+        def window_of(tick, since):
+            sustained = tick >= since + size - 1 and _window_means(y, tick, tick, size)[0] > threshold
+            return "sustained" if sustained or not fast_size else "fast"
+
+        def loud_since(tick):
+            lo = max(0, tick - int(LOUD_RUN_LOOKBACK * rate))
+            quiet = np.flatnonzero(y[lo:tick + 1] <= threshold)
+            start = lo + int(quiet[-1]) + 1 if len(quiet) else lo
+            return (tick - start) * dt if start <= tick else None
+
+        incidents = []
+        since = 0       # first sample the detector windows count (after a reset)
+        position = 0    # next tick to search from
+        written = 0     # y is idle again from here on
+        while position < n:
+            candidates = [trips[np.searchsorted(trips, max(position, since + width - 1))]
+                          for trips, width in zip(idle_trips, (size, fast_size))
+                          if len(trips) and trips[-1] >= max(position, since + width - 1)]
+            if not candidates:
+                break
+            tick = int(min(candidates))
+            gain = ceiling
+            # Volume last written to the session
+            current = ceiling
+
+            while True:
+                trip_window = window_of(tick, since)
+                # Attack/hold, with the release ramp that follows a full hold
+                length = int(np.ceil((attack + hold + release) / dt)) + 1
+                last = min(n - 1, tick + length)
+                # Phase ends fire on the tick they fall on, as the live timers do
+                elapsed = np.arange(last - tick + 1) * dt + DEADLINE_SLACK
+                volumes = np.where(
+                    elapsed < attack,
+                    ramp(gain, floor, elapsed / attack) if attack > 0 else floor,
+                    np.where(elapsed < attack + hold, floor, ramp(floor, ceiling, (elapsed - attack - hold) / release)
+                             if release > 0 else ceiling),
+                )
+                applied = _applied(volumes, current, tolerance, floor, ceiling)
+                y[tick + 1:last + 1] = x[tick + 1:last + 1] * meter(applied[:-1])
+                written = max(written, last + 1)
+                # The first write lowers the volume
+                moved = _first(applied != current)
+                reduced = (tick + (moved if moved is not None else 0)) * dt
+                incidents.append((tick * dt, trip_window, loud_since(tick), reduced))
+
+                # The window calming down ends the hold early
+                hold_ticks = np.flatnonzero(elapsed >= attack + hold)
+                hold_end = tick + int(hold_ticks[0]) if len(hold_ticks) else last
+                calm = None
+                if hold_end > tick + 1:
+                    means = _window_means(y, tick + 1, hold_end, size)
+                    ready = np.arange(tick + 1, hold_end + 1) >= since + size - 1
+                    trips = tripped(tick + 1, hold_end, since)
+                    # Only ticks whose previous tick was still attack/hold can release
+                    can_release = np.arange(tick + 1, hold_end + 1) - 1 - tick < (attack + hold) / dt
+                    calm = _first(ready & can_release & ~trips & (means <= release_level), tick + 1)
+
+                if calm is not None:
+                    start_gain = volumes[calm - tick]
+                    tail = np.arange(last - calm + 1) * dt + DEADLINE_SLACK
+                    volumes = volumes.copy()
+                    volumes[calm - tick:] = ramp(start_gain, ceiling, tail / release) if release > 0 else ceiling
+                    applied = _applied(volumes, current, tolerance, floor, ceiling)
+                    done = np.flatnonzero(tail >= release)
+                    end = calm + int(done[0]) if len(done) else last
+                    y[calm + 1:last + 1] = x[calm + 1:last + 1] * meter(applied[calm - tick:-1])
+                    release_start = calm
+                else:
+                    done = np.flatnonzero(elapsed >= attack + hold + release)
+                    end = tick + int(done[0]) if len(done) else last
+                    release_start = hold_end
+
+                # A new trip during the release ramp re-attenuates at once; the
+                # tick the ramp ends on resets the detector before it can trip
+                ramp_end = end - 1 if len(done) else end
+                again = None
+                if ramp_end > release_start:
+                    again = _first(tripped(release_start + 1, ramp_end, since), release_start + 1)
+                if again is None:
+                    break
+                # The trigger starts from wherever the release ramp had got to
+                gain = float(volumes[again - tick])
+                current = float(applied[again - tick])
+                tick = again
+
+            # Envelope finished: volume back to default and the detector reset
+            # before the sample of the tick the release ends on
+            y[end + 1:written] = idle[end + 1:written]
+            since = end
+            position = end + 1
+        return incidents
+
+
+def evaluate(trace, settings, meter_follows_volume=True, evaluator=None):
+    """Score one trace: incidents, missed events, false triggers and latencies"""
+    evaluator = evaluator or TraceEvaluator(trace, meter_follows_volume)
+    incidents = evaluator.run(settings)
+    times = [reduced for _, _, _, reduced in incidents]
+    latencies, false_triggers = score_reductions(trace.events, times)
+    detected = [latency for latency in latencies if latency is not None]
+    actions = [action for _, _, action, _ in incidents if action is not None]
+    return {
+        "incidents": len(incidents),
+        "events": len(trace.events),
+        "detected": len(detected),
+        "missed": len(latencies) - len(detected),
+        "false_triggers": false_triggers,
+        "latencies": latencies,
+        "time_to_action": actions,
+    }
+
+
+def summarize(reports, duration):
+    """Combine per-trace reports into one row of the sweep table"""
+    latencies = [lat for report in reports for lat in report["latencies"] if lat is not None]
+    actions = [action for report in reports for action in report["time_to_action"]]
+    return {
+        "incidents": sum(report["incidents"] for report in reports),
+        "events": sum(report["events"] for report in reports),
+        "detected": sum(report["detected"] for report in reports),
+        "missed": sum(report["missed"] for report in reports),
+        "false_triggers": sum(report["false_triggers"] for report in reports),
+        "false_per_hour": sum(report["false_triggers"] for report in reports) * 3600.0 / max(duration, 1e-9),
+        "mean_latency": float(np.mean(latencies)) if latencies else None,
+        "max_latency": float(np.max(latencies)) if latencies else None,
+        "mean_time_to_action": float(np.mean(actions)) if actions else None,
+    }
+
+
+# Per-worker state, filled once by the pool initializer
+_WORKER = {}
+
+
+def _init_worker(traces, base, meter_follows_volume, exact):
+    _WORKER["traces"] = traces
+    _WORKER["base"] = base
+    _WORKER["meter_follows_volume"] = meter_follows_volume
+    _WORKER["exact"] = exact
+    _WORKER["evaluators"] = [TraceEvaluator(trace, meter_follows_volume) for trace in traces]
+
+
+def _run_combo(combo):
+    settings = dict(_WORKER["base"], **combo)
+    reports = []
+    for trace, evaluator in zip(_WORKER["traces"], _WORKER["evaluators"]):
+        if _WORKER["exact"]:
+            overrides = {key: settings[key] for key in SWEEP_KEYS + LIVE_KEYS}
+            reports.append(run_trace(trace, overrides, meter_follows_volume=_WORKER["meter_follows_volume"]))
+        else:
+            reports.append(evaluate(trace, settings, evaluator=evaluator))
+    duration = sum(trace.duration for trace in _WORKER["traces"])
+    return combo, summarize(reports, duration)
+
+
+def parse_grid(specs):
+    """KEY=a,b,c or KEY=start:stop:step (stop inclusive) into {key: [values]}"""
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        key = key.strip().upper()
+        if key not in SWEEP_KEYS:
+            raise ValueError(f"Cannot sweep {key} (choose from {', '.join(SWEEP_KEYS)})")
+        if ":" in values:
+            start, stop, step = (float(part) for part in values.split(":"))
+            count = int(round((stop - start) / step)) + 1
+            parsed = [round(start + i * step, 10) for i in range(count)]
+        else:
+            parsed = [float(value) for value in values.split(",") if value.strip()]
+        if isinstance(CONFIG_DEFAULTS[key], int):
+            parsed = [int(round(value)) for value in parsed]
+        grid[key] = parsed
+    return grid
+
+
+def rank_key(row):
+    # Fewest missed events, then fewest false triggers, then fastest
+    summary = row[1]
+    latency = summary["mean_latency"] if summary["mean_latency"] is not None else float("inf")
+    return summary["missed"], summary["false_triggers"], latency
+
+
+def check_base(base, exact=False):
+    """Raise ValueError if base relies on something the chosen mode cannot replay"""
+    assumed = dict(TRACE_ASSUMES) if exact else dict(TRACE_ASSUMES, **FAST_ASSUMES)
+    for key, value in assumed.items():
+        if base.get(key, value) != value:
+            hint = "" if exact or key in TRACE_ASSUMES else " (use --exact)"
+            raise ValueError(f"Cannot sweep with {key}={base[key]!r}{hint}")
+
+
+def sweep(traces, grid, base, workers=None, meter_follows_volume=True, exact=False):
+    """Evaluate every grid combination over traces on a process pool"""
+    check_base(base, exact)
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    for combo in combos:
+        _, problems = validate(dict(base, **combo), CONFIG_DEFAULTS)
+        if problems:
+            raise ValueError(f"{combo}: {'; '.join(problems)}")
+    if workers == 1 or len(combos) == 1:
+        _init_worker(traces, base, meter_follows_volume, exact)
+        results = [_run_combo(combo) for combo in combos]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunk = max(1, len(combos) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(traces, base, meter_follows_volume, exact)) as pool:
+            results = list(pool.map(_run_combo, combos, chunksize=chunk))
+    return sorted(results, key=rank_key)
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_table(results, top, traces):
+    hours = sum(trace.duration for trace in traces) / 3600.0
+    print(f"📈 {len(results)} settings over {len(traces)} trace(s), {hours:.2f} h of audio")
+    keys = list(results[0][0]) if results else []
+    header = "  ".join(f"{key:>14}" for key in keys)
+    print(f"{header}  {'incidents':>9}  {'detected':>9}  {'false':>5}  {'false/h':>7}  {'mean ms':>7}  {'max ms':>7}  {'act ms':>7}")
+    for combo, summary in results[:top]:
+        values = "  ".join(f"{combo[key]:>14}" for key in keys)
+        print(
+            f"{values}  {summary['incidents']:>9}  {summary['detected']:>4}/{summary['events']:<4}  {summary['false_triggers']:>5}"
+            f"  {summary['false_per_hour']:>7.1f}  {_ms(summary['mean_latency']):>7}"
+            f"  {_ms(summary['max_latency']):>7}  {_ms(summary['mean_time_to_action']):>7}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay peak traces or WAV recordings and sweep limiter settings"
+    )
+    parser.add_argument("traces", nargs="*", help="JSON peak traces or 16-bit WAV files (synthetic demo if omitted)")
+    parser.add_argument("--grid", action="append", default=[], metavar="KEY=VALUES",
+                        help="values to sweep, e.g. THRESHOLD=0.75:0.95:0.05 or PEAK_WINDOW=5,10,20")
+    parser.add_argument("--config", help="base settings from this config.json")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--top", type=int, default=10, help="rows to show")
+    parser.add_argument("--exact", action="store_true",
+                        help="run the live monitor loop on a virtual clock for every setting (slow)")
+    parser.add_argument("--meter-pre-volume", action="store_true",
+                        help="the meter ignores the session volume")
+    parser.add_argument("--json", action="store_true", help="print every result as JSON")
+    args = parser.parse_args(argv)
+
+    base = dict(CONFIG_DEFAULTS)
+    if args.config:
+        try:
+            with open(args.config, "r") as f:
+                base, problems = validate(json.load(f), CONFIG_DEFAULTS)
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot read {args.config}: {e}")
+        # Same checks and fallbacks as the live loader
+        for problem in problems:
+            print(f"⚠️ {args.config}: {problem} (using the default)", file=sys.stderr)
+
+    try:
+        grid = parse_grid(args.grid) or {"THRESHOLD": [base["THRESHOLD"]]}
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.exact and base["IDLE_SAMPLE_RATE"] < min(grid.get("FAST_SAMPLE_RATE", [base["FAST_SAMPLE_RATE"]])):
+        print(f"ℹ️ Ticks stay at FAST_SAMPLE_RATE; the live monitor drops to {base['IDLE_SAMPLE_RATE']} Hz "
+              "in silence, so its latencies can be up to one idle period longer (use --exact)", file=sys.stderr)
+
+    traces = [load_trace(path) for path in args.traces]
+    if not traces:
+        traces = [synthetic_trace(seed=seed) for seed in range(4)]
+
+    started = time.perf_counter()
+    try:
+        results = sweep(traces, grid, base, workers=args.workers,
+                        meter_follows_volume=not args.meter_pre_volume, exact=args.exact)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        json.dump([dict(settings=combo, **summary) for combo, summary in results], sys.stdout, indent=2)
+        print()
+    else:
+        print_table(results, args.top, traces)
+        print(f"⏱️  {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import contextlib
+import io
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_backend import PeakTrace, SimulatedBackend  # noqa: E402
+from clock import VirtualClock  # noqa: E402
+from volume_limiter import CONFIG_DEFAULTS, DiscordOutputLimiter  # noqa: E402
+
+# Nothing the tests do needs the ring file
+TEST_SETTINGS = {"FLIGHT_RECORDER_FILE": ""}
+
+
+def steady_trace(level, seconds, sample_rate=100.0, **kwargs):
+    """Trace holding one peak level for the given number of seconds"""
+    return PeakTrace([level] * int(seconds * sample_rate), sample_rate=sample_rate, **kwargs)
+
+
+@pytest.fixture
+def make_limiter(tmp_path):
+    """Build a headless limiter on a virtual clock replaying traces
+
+    Settings go through config.json before construction, exactly as a
+    user's would. Returns (limiter, clock, backend).
+    """
+
+    def make(traces, settings=None, notifications=False, **kwargs):
+        config_file = str(tmp_path / "config.json")
+        with open(config_file, "w") as f:
+            json.dump({**CONFIG_DEFAULTS, **TEST_SETTINGS, **(settings or {})}, f)
+        clock = VirtualClock()
+        backend = SimulatedBackend(clock, traces, notifications=notifications)
+        with contextlib.redirect_stdout(io.StringIO()):
+            limiter = DiscordOutputLimiter(backend=backend, clock=clock, config_file=config_file,
+                                           log_file=str(tmp_path / "incidents.log"), headless=True, **kwargs)
+        return limiter, clock, backend
+
+    return make
+
+
+def run_until(limiter, clock, end):
+    """Run the monitor loop until virtual time end"""
+    clock.schedule(end, lambda: setattr(limiter, "is_running", False))
+    with contextlib.redirect_stdout(io.StringIO()):
+        limiter.start()
+    clock.close()
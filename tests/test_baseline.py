@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from baseline import BINS, MAX_TRIP, BaselineTable
+
+
+def _table(**kwargs):
+    settings = dict(quantile=0.5, margin_db=0.0, half_life=10.0, sample_rate=1.0)
+    settings.update(kwargs)
+    table = BaselineTable(**settings)
+    table.set_rows(["discord.exe"])
+    return table
+
+
+def test_rows_warm_up_before_they_are_trusted():
+    table = _table()
+    table.add([0.305], 59, 0.0)
+    assert math.isnan(table.baselines(0.0)[0])
+    assert table.trip_levels(0.85, 0.0)[0] == 0.85
+    # Silence teaches nothing
+    table.add([0.0], 100, 0.0)
+    assert math.isnan(table.baselines(0.0)[0])
+    table.add([0.305], 1, 0.0)
+    assert table.baselines(0.0)[0] == pytest.approx(0.305, abs=1.0 / BINS)
+
+
+def test_old_samples_decay_by_the_half_life():
+    table = _table()
+    table.add([0.305], 100, 0.0)
+    # One half-life later the old samples count for half
+    assert table.snapshot(10.0)["discord.exe"].sum() == pytest.approx(50.0)
+
+    # Ten half-lives on, the new level has taken over
+    table.add([0.605], 100, 100.0)
+    assert table.baselines(100.0)[0] == pytest.approx(0.605, abs=1.0 / BINS)
+    snapshot = table.snapshot(100.0)["discord.exe"]
+    assert snapshot[30] == pytest.approx(100.0 / 1024)
+    assert snapshot[60] == pytest.approx(100.0)
+
+
+def test_weights_are_renormalised_without_changing_the_histogram():
+    table = _table(half_life=1.0)
+    table.add([0.305], 100, 0.0)
+    # 2 ** 50 passes MAX_WEIGHT and forces a rescale
+    table.add([0.605], 100, 50.0)
+    assert table._origin == 50.0
+    snapshot = table.snapshot(50.0)["discord.exe"]
+    assert snapshot[60] == pytest.approx(100.0)
+    assert snapshot[30] == pytest.approx(100.0 * 2.0 ** -50)
+
+
+def test_save_and_load_do_not_age_the_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    table = _table()
+    table.add([0.305], 100, 0.0)
+    table.save(path, 10.0)
+
+    restored = _table()
+    assert restored.load(path, 500.0)
+    assert restored.snapshot(500.0)["discord.exe"].sum() == pytest.approx(50.0)
+    assert not _table().load(str(tmp_path / "missing.json"), 0.0)
+
+
+def test_rows_keep_their_histograms_and_trip_levels_are_clipped():
+    table = _table(margin_db=20.0)
+    table.add([0.505], 100, 0.0)
+    table.set_rows(["slack.exe", "discord.exe"])
+    table.add([0.0, 0.205], 100, 0.0)
+    assert math.isnan(table.baselines(0.0)[0])
+    # Ten times (20 dB) the learned level is capped
+    assert table.trip_levels(0.85, 0.0).tolist() == [0.85, MAX_TRIP]
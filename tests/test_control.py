@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+
+from conftest import run_until, steady_trace
+from control import ControlClient, ControlServer, _Client, read_token
+from settings import ConfigError
+
+
+def _wait_queued(server, count):
+    # The selector thread reads in real time while the loop runs on virtual time
+    deadline = time.monotonic() + 5.0
+    while server._requests.qsize() < count:
+        assert time.monotonic() < deadline, "requests never reached the queue"
+        time.sleep(0.01)
+
+
+def test_malformed_subscribe_is_answered_and_loop_keeps_ticking(make_limiter, tmp_path):
+    limiter, clock, _ = make_limiter([steady_trace(0.1, 10.0)], {"CONTROL_SOCKET": "control.sock"})
+    errors = []
+    limiter.record_error = errors.append
+    state = {}
+
+    def send():
+        client = ControlClient(path=str(tmp_path / "control.sock"))
+        state["client"] = client
+        for index, events in enumerate((5, True, [1, 2])):
+            client.sock.sendall(b'{"cmd": "subscribe", "events": %s, "id": %d}\n'
+                                % (str(events).lower().encode(), index))
+        _wait_queued(limiter.control, 3)
+        state["ticks"] = limiter.ticks_total.value
+
+    def receive():
+        client = state["client"]
+        state["replies"] = [client.receive() for _ in range(3)]
+        client.close()
+
+    clock.schedule(1.0, send)
+    clock.schedule(2.0, receive)
+    run_until(limiter, clock, 4.0)
+
+    assert errors == []
+    assert [reply["id"] for reply in state["replies"]] == [0, 1, 2]
+    assert all(reply["ok"] is False for reply in state["replies"])
+    assert limiter.ticks_total.value > state["ticks"] + 10
+
+
+def _serve(server, request):
+    """Queue one request as if a client sent it and return the response"""
+    replies = []
+    client = _Client(None)
+    server._send = lambda _, response: replies.append(response)
+    server._requests.put((client, request))
+    server.serve(lambda _: {"handled": True})
+    return replies[0]
+
+
+def test_tcp_state_changes_need_the_token(tmp_path):
+    server = ControlServer(port=0, token_path=str(tmp_path / "control.token"))
+    server.start()
+    try:
+        token = read_token(str(tmp_path / "control.token"))
+        assert token == server.token
+        assert _serve(server, {"cmd": "status"})["ok"] is True
+        assert _serve(server, {"cmd": "config"})["ok"] is True
+        for request in ({"cmd": "pause"}, {"cmd": "config", "set": {}}, {"cmd": "resume", "token": "guess"}):
+            assert _serve(server, request)["ok"] is False
+        assert _serve(server, {"cmd": "pause", "token": token}) == {"handled": True, "ok": True}
+    finally:
+        server.stop()
+    assert not (tmp_path / "control.token").exists()
+
+
+def test_config_set_refuses_startup_settings_and_non_boolean_save(make_limiter, tmp_path):
+    limiter, _, _ = make_limiter([steady_trace(0.1, 1.0)])
+    for key, value in (("METRICS_FILE", "/tmp/elsewhere.json"), ("FLIGHT_RECORDER_FILE", "/tmp/x.bin"),
+                       ("BASELINE_FILE", "/tmp/b.json"), ("CONTROL_SOCKET", "/tmp/c.sock")):
+        with pytest.raises(ConfigError):
+            limiter.handle_request({"cmd": "config", "set": {key: value}, "save": True})
+    with pytest.raises(ValueError):
+        limiter.handle_request({"cmd": "config", "set": {"THRESHOLD": 0.8}, "save": "no"})
+    assert limiter.THRESHOLD == 0.85
+    with open(tmp_path / "config.json") as f:
+        assert json.load(f)["METRICS_FILE"] == ""
+
+
+def test_status_reports_the_volume_read_from_the_session(make_limiter):
+    limiter, clock, _ = make_limiter([steady_trace(0.1, 5.0)])
+    seen = {}
+    clock.schedule(2.0, lambda: seen.update(limiter.handle_request({"cmd": "status"})))
+    run_until(limiter, clock, 3.0)
+    assert seen["session"]["volume"] == 1.0
@@ -0,0 +1,83 @@
+import math
+import random
+
+import pytest
+
+import detector
+from detector import WindowDetector
+
+
+def _brute(samples, size):
+    window = samples[-size:]
+    return sum(window) / len(window), max(window)
+
+
+def test_windows_match_a_brute_force_scan():
+    rng = random.Random(7)
+    det = WindowDetector([("sustained", 10, 0.8), ("fast", 3, 0.9)], history=25)
+    samples = []
+    for _ in range(500):
+        value = rng.random()
+        samples.append(value)
+        det.update(value)
+        for name, size in (("sustained", 10), ("fast", 3)):
+            mean, peak = _brute(samples, size)
+            assert det.mean(name) == pytest.approx(mean)
+            assert det.max(name) == peak
+    assert det.recent(25) == samples[-25:]
+    # The primary window answers when no name is given
+    assert det.mean() == det.mean("sustained")
+
+
+def test_max_deque_drops_expired_and_dominated_samples():
+    det = WindowDetector([("w", 3, 1.0)])
+    for value in (0.9, 0.1, 0.2, 0.3):
+        det.update(value)
+    # 0.9 slid out of the window; 0.1 and 0.2 were dominated by later samples
+    assert det.max("w") == 0.3
+    assert len(det._by_name["w"].maxima) == 1
+
+
+def test_ready_tripped_and_reset():
+    det = WindowDetector([("sustained", 4, 0.5), ("fast", 2, 0.9)])
+    det.update(1.0)
+    assert not det.ready("fast") and det.tripped() is None
+    det.update(1.0)
+    assert det.tripped() == "fast"
+    det.update(0.6, count=2)
+    assert det.ready() and det.tripped() == "sustained"
+
+    det.reset()
+    assert not det.ready("fast") and det.tripped() is None
+    assert det.mean() == 0.0 and det.max() == 0.0
+    det.update(0.2)
+    assert det.mean() == 0.2 and det.max() == 0.2
+
+
+def test_resize_keeps_the_newest_samples():
+    det = WindowDetector([("w", 4, 0.5)])
+    for value in (0.1, 0.2, 0.3, 0.4, 0.5):
+        det.update(value)
+    det.resize([("w", 2, 0.5), ("x", 3, 0.5)])
+    assert det.ready("x")
+    assert det.mean("w") == pytest.approx(0.45)
+    assert det.max("x") == 0.5
+    det.set_threshold("w", 0.4)
+    assert det.tripped() == "w"
+
+
+def test_running_sum_is_resummed(monkeypatch):
+    monkeypatch.setattr(detector, "RESUM_INTERVAL", 8)
+    det = WindowDetector([("w", 5, 1.0)])
+    values = [0.1 * (i % 7) + 1e-9 * i for i in range(40)]
+    for value in values:
+        det.update(value)
+    assert det._by_name["w"].since_resum < 8
+    assert det._by_name["w"].total == math.fsum(values[-5:])
+
+
+def test_rejects_empty_windows():
+    with pytest.raises(ValueError):
+        WindowDetector([])
+    with pytest.raises(ValueError):
+        WindowDetector([("w", 0, 0.5)])
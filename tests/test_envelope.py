@@ -0,0 +1,90 @@
+import pytest
+
+from envelope import ATTACK, CURVES, HOLD, IDLE, RELEASE, GainEnvelope
+from timers import TimerQueue
+
+
+def _envelope(**kwargs):
+    settings = dict(attack_time=0.0, hold_time=5.0, release_time=1.0, curve="linear", tolerance=0.01)
+    settings.update(kwargs)
+    return GainEnvelope(timers=TimerQueue(), **settings)
+
+
+def test_trigger_holds_then_releases_back_to_idle():
+    envelope = _envelope()
+    changes = []
+    envelope.add_listener(lambda old, new, time, reason: changes.append((old, new, reason)))
+    envelope.trigger(0.0, 0.2, 1.0)
+    assert envelope.advance(0.0) == 0.2
+    assert envelope.phase == HOLD
+    assert envelope.advance(4.0) is None
+
+    assert envelope.advance(5.5) == pytest.approx(0.6)
+    assert envelope.phase == RELEASE
+    # Moves within the tolerance are not written
+    assert envelope.advance(5.505) is None
+    # The release ends exactly on the ceiling, once
+    assert envelope.advance(6.2) == 1.0
+    assert envelope.phase == IDLE and not envelope.active
+    assert envelope.advance(6.3) is None
+
+    assert changes == [
+        (IDLE, ATTACK, "trigger"), (ATTACK, HOLD, "attack done"),
+        (HOLD, RELEASE, "hold done"), (RELEASE, IDLE, "release done"),
+    ]
+    # Phase ends are timed by their deadlines, not by the tick that noticed them
+    assert [time for time, *_ in envelope.transitions] == [0.0, 0.0, 5.0, 6.0]
+
+
+def test_attack_ramps_down_and_calm_ends_the_hold_early():
+    envelope = _envelope(attack_time=1.0)
+    envelope.sync(1.0)
+    envelope.trigger(0.0, 0.2, 1.0)
+    assert envelope.advance(0.0) is None
+    assert envelope.advance(0.5) == pytest.approx(0.6)
+    assert envelope.advance(1.0) == 0.2
+    assert envelope.phase == HOLD
+
+    envelope.release(2.0)
+    assert envelope.phase == RELEASE
+    assert envelope.advance(2.5) == pytest.approx(0.6)
+    # release() outside attack/hold does nothing
+    envelope.release(2.6)
+    assert envelope.transitions[-1][3] == "calm"
+
+
+def test_retrigger_during_release_starts_from_the_current_gain():
+    envelope = _envelope(attack_time=1.0, hold_time=1.0)
+    envelope.trigger(0.0, 0.2, 1.0)
+    assert envelope.advance(2.5) == pytest.approx(0.6)
+    assert envelope.phase == RELEASE
+
+    envelope.trigger(2.5, 0.2, 1.0)
+    assert envelope.phase == ATTACK
+    assert envelope.gain_at(2.5) == pytest.approx(0.6)
+    assert envelope.gain_at(3.0) == pytest.approx(0.4)
+    # The old release timer was cancelled with the phase it belonged to
+    assert len(envelope.timers) == 1
+
+
+def test_configure_moves_the_running_phase_end_and_cancel_goes_idle():
+    envelope = _envelope()
+    envelope.trigger(0.0, 0.2, 1.0)
+    envelope.advance(0.0)
+    envelope.configure(0.0, 2.0, 1.0, "smooth", 0.01)
+    assert envelope.timers.next_deadline() == 2.0
+    envelope.advance(2.0)
+    assert envelope.phase == RELEASE
+
+    envelope.cancel(2.1)
+    assert envelope.phase == IDLE
+    assert len(envelope.timers) == 0
+    assert envelope.advance(2.2) is None
+
+
+def test_curves_span_zero_to_one_and_unknown_curves_are_refused():
+    for curve in CURVES.values():
+        assert curve(0.0) == pytest.approx(0.0)
+        assert curve(1.0) == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        _envelope(curve="cubic")
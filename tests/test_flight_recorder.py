@@ -0,0 +1,98 @@
+import glob
+import os
+
+import pytest
+
+from audio_backend import PeakTrace
+from conftest import run_until
+from envelope import IDLE
+from flight_recorder import LEVEL_SCALE, MAX_OFFSET_MS, RECORD, STATE_CODES, FlightRecorder, FlightRecording
+
+DAY = 86400.0
+
+
+def test_ring_fills_after_long_uptime(tmp_path):
+    # A monotonic clock 60 days past boot, well beyond MAX_OFFSET_MS
+    start = 60 * DAY
+    recorder = FlightRecorder(str(tmp_path / "flight_recorder.bin"), capacity=100)
+    recorder.open(start)
+    try:
+        for tick in range(150):
+            recorder.record(start + tick * 0.02, 0.5, 1.0)
+        assert recorder.count == 150
+
+        raw = recorder._tail(100)
+        samples = [RECORD.unpack_from(raw, i * RECORD.size) for i in range(100)]
+        offsets = [t for t, _, _, _ in samples]
+        assert offsets == sorted(offsets)
+        # The oldest surviving sample is tick 50, 1 s after opening
+        assert offsets[0] == 1000
+        assert all(peak == int(0.5 * LEVEL_SCALE) for _, peak, _, _ in samples)
+    finally:
+        recorder.close()
+
+
+def test_reopen_keeps_samples(tmp_path):
+    path = str(tmp_path / "flight_recorder.bin")
+    recorder = FlightRecorder(path, capacity=10)
+    recorder.open(45 * DAY)
+    for tick in range(4):
+        recorder.record(45 * DAY + tick, 0.25, 1.0)
+    recorder.close()
+
+    recorder = FlightRecorder(path, capacity=10)
+    recorder.open(50 * DAY)
+    try:
+        assert recorder.count == 4
+        recorder.record(50 * DAY, 0.25, 1.0)
+        assert recorder.count == 5
+    finally:
+        recorder.close()
+
+
+def test_unwritable_sample_is_counted(tmp_path):
+    recorder = FlightRecorder(str(tmp_path / "flight_recorder.bin"), capacity=10)
+    recorder.open(0.0)
+    try:
+        # Before the open() time: a negative offset does not fit the record
+        recorder.record(-5.0, 0.5, 1.0)
+        assert recorder.errors == 1
+        assert recorder.count == 0
+        recorder.record(1.0, 0.5, 1.0)
+        assert recorder.count == 1
+    finally:
+        recorder.close()
+
+
+def test_epoch_rebase_keeps_history(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "flight_recorder.bin")
+    recorder = FlightRecorder(path, capacity=50)
+    recorder.open(0.0)
+    epoch = recorder._epoch
+    # Fill the ring just short of MAX_OFFSET_MS, then cross it
+    times = [MAX_OFFSET_MS / 1000.0 - 1.0 + tick * 0.02 for tick in range(50)] + [MAX_OFFSET_MS / 1000.0 + 0.5]
+    for now in times:
+        recorder.record(now, 0.5, 1.0)
+    recorder.close()
+    assert recorder.errors == 0
+
+    recording = FlightRecording(path)
+    samples = recording.array()
+    assert recording.count == 50
+    assert np.allclose(recording.times(samples) - epoch, times[1:], atol=0.002)
+
+
+def test_incident_snapshot_ends_with_the_tripping_sample(make_limiter):
+    np = pytest.importorskip("numpy")
+    trace = PeakTrace([0.1] * 200 + [0.99] * 300, sample_rate=100.0)
+    limiter, clock, _ = make_limiter([trace], {"FLIGHT_RECORDER_FILE": "flight_recorder.bin",
+                                               "FLIGHT_RECORDER_HOURS": 0.01, "SNAPSHOT_SECONDS": 5.0})
+    run_until(limiter, clock, 4.0)
+
+    snapshots = glob.glob(os.path.join(os.path.dirname(limiter.log_file), "incident_snapshots", "*.npz"))
+    assert len(snapshots) == 1
+    samples = FlightRecording(snapshots[0]).records
+    assert samples["peak"][-1] / LEVEL_SCALE > limiter.THRESHOLD
+    assert samples["state"][-1] != STATE_CODES[IDLE]
+    assert np.all(samples["state"][:-1] == STATE_CODES[IDLE])
@@ -0,0 +1,35 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import MetricsRegistry, MetricsServer
+
+
+@pytest.fixture
+def server():
+    server = MetricsServer(MetricsRegistry(), port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def _get(server, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}", timeout=5) as response:
+        return response.status, response.read().decode()
+
+
+@pytest.mark.parametrize("interval", ["abc", "0", "-1", "2", "nan", "inf"])
+def test_profile_start_rejects_bad_intervals(server, interval):
+    with pytest.raises(urllib.error.HTTPError) as raised:
+        _get(server, f"/profile/start?interval={interval}")
+    assert raised.value.code == 400
+    assert not server.profiler.running
+
+
+def test_profile_start_accepts_an_interval(server):
+    status, body = _get(server, "/profile/start?interval=0.01")
+    assert status == 200 and "10.0 ms" in body
+    assert server.profiler.running
+    _get(server, "/profile/stop")
+    assert not server.profiler.running
@@ -0,0 +1,65 @@
+import pytest
+
+from clock import VirtualClock
+from scheduler import TickScheduler
+
+
+def _scheduler(**kwargs):
+    clock = VirtualClock()
+    scheduler = TickScheduler(clock, fast_rate=50.0, idle_rate=4.0, active_level=0.2, **kwargs)
+    scheduler.start()
+    return scheduler, clock
+
+
+def test_quiet_channel_drops_to_the_idle_rate_and_wakes_at_once():
+    scheduler, clock = _scheduler()
+    while clock.time() < 1.9:
+        scheduler.observe(0.1)
+        scheduler.wait()
+    assert scheduler.period == scheduler.fast_period
+
+    # Quiet for quiet_after seconds: one idle tick stands for many fast samples
+    while clock.time() < 2.0 - 1e-9:
+        scheduler.observe(0.1)
+        scheduler.wait()
+    scheduler.observe(0.1)
+    assert scheduler.period == scheduler.idle_period
+    assert scheduler.samples_per_tick == 12
+    before = clock.time()
+    scheduler.wait()
+    assert clock.time() - before == pytest.approx(0.25)
+
+    # A loud sample (or active limiting) is back at the fast rate on the next tick
+    scheduler.observe(0.5)
+    assert scheduler.period == scheduler.fast_period and scheduler.samples_per_tick == 1
+    scheduler.observe(0.0, limiting=True)
+    assert scheduler.period == scheduler.fast_period
+
+
+def test_overrun_skips_missed_deadlines_and_stays_on_the_grid():
+    scheduler, clock = _scheduler()
+    scheduler.observe(1.0)
+    scheduler.wait()
+    assert clock.time() == pytest.approx(0.02)
+
+    # The tick's work ran 50 ms: the 40 ms deadline is skipped
+    clock.sleep(0.05)
+    scheduler.wait()
+    assert scheduler.overruns == 1 and scheduler.missed == 1
+    assert scheduler.max_lateness == pytest.approx(0.01)
+    assert clock.time() == pytest.approx(0.07)
+
+    scheduler.wait()
+    assert clock.time() == pytest.approx(0.08)
+    stats = scheduler.stats()
+    assert stats["ticks"] == 3 and stats["overruns"] == 1
+    assert stats["rate_hz"] == pytest.approx(50.0)
+
+
+def test_configure_keeps_an_idle_scheduler_idle():
+    scheduler, clock = _scheduler(quiet_after=0.0)
+    scheduler.observe(0.0)
+    assert scheduler.period == scheduler.idle_period
+    scheduler.configure(100.0, 2.0, 0.2)
+    assert scheduler.period == pytest.approx(0.5)
+    assert scheduler.samples_per_tick == 50
@@ -0,0 +1,70 @@
+import time
+
+from audio_backend import SimulatedBackend
+from clock import VirtualClock
+from conftest import steady_trace
+from session_registry import SessionRegistry
+from session_watcher import SessionWatcher
+
+
+def _wait_for(condition, message):
+    # The watcher thread runs in real time while virtual time is driven here
+    deadline = time.monotonic() + 5.0
+    while not condition():
+        assert time.monotonic() < deadline, message
+        time.sleep(0.01)
+
+
+def _watcher(trace, notifications):
+    clock = VirtualClock()
+    backend = SimulatedBackend(clock, [trace], notifications=notifications)
+    watcher = SessionWatcher(SessionRegistry(backend), ["discord"], clock, poll_interval=2.0, check_interval=5.0)
+    return watcher, clock
+
+
+def test_notifications_attach_and_drop_the_session_at_once():
+    watcher, clock = _watcher(steady_trace(0.1, 20.0, start=1.0, end=3.0), notifications=True)
+    # Polling alone would not look again for a minute
+    watcher.poll_interval = 60.0
+    watcher.start()
+    try:
+        assert watcher.current() is None
+        _wait_for(lambda: watcher.notifications, "never subscribed to notifications")
+
+        clock.sleep(1.5)
+        _wait_for(lambda: watcher.current() is not None, "created notification did not trigger a scan")
+        assert watcher.version == 1
+
+        # Expiry is published from the notification itself, not a later scan
+        clock.sleep(2.0)
+        assert watcher.current() is None
+        assert watcher.version == 2
+    finally:
+        watcher.stop()
+        clock.close()
+
+
+def test_polling_finds_and_loses_the_session_without_notifications():
+    watcher, clock = _watcher(steady_trace(0.1, 20.0, start=1.0, end=6.0), notifications=False)
+    watcher.start()
+    try:
+        assert watcher.current() is None
+        # Let the thread reach its first wait before time moves
+        time.sleep(0.05)
+
+        clock.sleep(1.5)
+        time.sleep(0.05)
+        assert watcher.current() is None, "found before the next poll"
+        assert not watcher.notifications
+
+        clock.sleep(3.0)
+        _wait_for(lambda: watcher.current() is not None, "poll did not find the session")
+
+        # The attached session is re-checked every check_interval
+        time.sleep(0.05)
+        clock.sleep(12.0)
+        _wait_for(lambda: watcher.current() is None, "check did not notice the session ended")
+        assert watcher.version == 2
+    finally:
+        watcher.stop()
+        clock.close()
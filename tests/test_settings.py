@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+from conftest import steady_trace
+from settings import ConfigError, ConfigWatcher, Settings, validate
+from volume_limiter import CONFIG_DEFAULTS
+
+
+@pytest.mark.parametrize("key, value, problem", [
+    ("THRESHOLD", "loud", "must be a number"),
+    ("THRESHOLD", True, "must be a number"),
+    ("THRESHOLD", float("nan"), "must be a number"),
+    ("THRESHOLD", 1.5, "at most 1"),
+    ("PEAK_WINDOW", 0, "above 0"),
+    ("LOG_BACKUPS", 2.5, "whole number"),
+    ("RELEASE_CURVE", "cubic", "must be one of"),
+    ("MULTI_APP", 1, "true or false"),
+    ("CONTROL_SOCKET", 5, "must be a string"),
+    ("APPS", {"discord": {"patterns": "discord.exe"}}, "list of process names"),
+    ("APPS", {"discord": {"THRESHOLD": 2}}, "APPS.discord.THRESHOLD"),
+    ("LOUDNESS", -10, "unknown setting"),
+])
+def test_validate_rejects_bad_values_and_keeps_the_default(key, value, problem):
+    values, problems = validate({key: value, "REDUCTION": 0.3}, CONFIG_DEFAULTS)
+    assert len(problems) == 1 and problem in problems[0]
+    assert values.get(key) == CONFIG_DEFAULTS.get(key)
+    # Valid entries beside a bad one still apply
+    assert values["REDUCTION"] == 0.3
+
+
+def test_validate_keeps_the_idle_rate_at_or_below_the_fast_rate():
+    values, problems = validate({"FAST_SAMPLE_RATE": 2, "IDLE_SAMPLE_RATE": 3}, CONFIG_DEFAULTS)
+    assert problems == ["IDLE_SAMPLE_RATE must not exceed FAST_SAMPLE_RATE"]
+    assert values["IDLE_SAMPLE_RATE"] == 2
+    assert validate(["THRESHOLD"], CONFIG_DEFAULTS)[1] == ["config.json must hold a JSON object"]
+
+
+def test_settings_are_immutable_snapshots():
+    settings = Settings(CONFIG_DEFAULTS)
+    with pytest.raises(AttributeError):
+        settings.THRESHOLD = 0.5
+    with pytest.raises(TypeError):
+        settings.APPS["slack"] = {}
+    other = Settings(dict(CONFIG_DEFAULTS, THRESHOLD=0.5))
+    assert other.changed(settings) == ["THRESHOLD"]
+    assert settings.as_dict() == CONFIG_DEFAULTS
+
+
+def _write(path, values, stamp):
+    with open(path, "w") as f:
+        json.dump(values, f)
+    # Edits in one test land within the same mtime tick on some filesystems
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_watcher_checks_once_per_interval_and_rejects_an_edit_once(tmp_path):
+    path = str(tmp_path / "config.json")
+    _write(path, CONFIG_DEFAULTS, 1_000_000_000)
+    watcher = ConfigWatcher(path, CONFIG_DEFAULTS, interval=1.0)
+    assert watcher.poll(0.0) is None
+
+    _write(path, dict(CONFIG_DEFAULTS, THRESHOLD=0.6), 2_000_000_000)
+    assert watcher.poll(0.5) is None
+    assert watcher.poll(1.0).THRESHOLD == 0.6
+
+    _write(path, dict(CONFIG_DEFAULTS, THRESHOLD="loud"), 3_000_000_000)
+    with pytest.raises(ConfigError) as raised:
+        watcher.poll(2.0)
+    assert "THRESHOLD" in raised.value.problems[0]
+    # Not retried until the file changes again
+    assert watcher.poll(3.0) is None
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, ns=(4_000_000_000, 4_000_000_000))
+    with pytest.raises(ConfigError):
+        watcher.poll(4.0)
+
+
+def test_limiter_applies_valid_reloads_and_keeps_settings_on_a_bad_one(make_limiter):
+    limiter, _, _ = make_limiter([steady_trace(0.1, 1.0)])
+    messages = []
+    limiter.renderer.message = messages.append
+    with open(limiter.config_file) as f:
+        values = json.load(f)
+
+    _write(limiter.config_file, dict(values, THRESHOLD=0.6, PEAK_WINDOW=5, MULTI_APP=True), 2_000_000_000)
+    limiter.check_config(10.0)
+    assert limiter.THRESHOLD == 0.6 and limiter.threshold == 0.6
+    # Five 100 ms units at 50 Hz
+    assert limiter.detector._window(None).size == 25
+    # Startup-only keys wait for a restart
+    assert limiter.MULTI_APP is False and limiter.pending_restart == ["MULTI_APP"]
+    assert any("Restart to apply: MULTI_APP" in message for message in messages)
+
+    _write(limiter.config_file, dict(values, THRESHOLD=0.7, REDUCTION=-1), 3_000_000_000)
+    limiter.check_config(20.0)
+    assert limiter.settings.THRESHOLD == 0.6 and limiter.REDUCTION == CONFIG_DEFAULTS["REDUCTION"]
+    assert "rejected" in messages[-1] and "REDUCTION" in messages[-1]
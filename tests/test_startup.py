@@ -0,0 +1,19 @@
+import pytest
+
+from conftest import run_until, steady_trace
+from startup import StartupProfile
+
+
+@pytest.mark.parametrize("multi_app", [False, True])
+def test_startup_profile_reports_first_protected_tick(make_limiter, multi_app):
+    if multi_app:
+        pytest.importorskip("numpy")
+    profile = StartupProfile()
+    limiter, clock, _ = make_limiter([steady_trace(0.1, 3.0)], {"MULTI_APP": multi_app}, startup=profile)
+    messages = []
+    limiter.renderer.message = messages.append
+    run_until(limiter, clock, 2.0)
+
+    assert [name for name, _ in profile.marks] == ["session found", "first protected tick"]
+    assert limiter.startup is None
+    assert sum("Startup profile" in message for message in messages) == 1
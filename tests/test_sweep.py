@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from latency_harness import run_trace, synthetic_trace
+from sweep import evaluate, sweep
+from volume_limiter import CONFIG_DEFAULTS
+
+
+@pytest.mark.parametrize("settings", [
+    {},
+    {"THRESHOLD": 0.75, "PEAK_WINDOW": 5},
+    {"FAST_WINDOW": 2, "FAST_THRESHOLD": 0.9},
+    {"ATTACK_TIME": 0.2, "RELEASE_TIME": 2.0, "RELEASE_CURVE": "smooth"},
+    {"FAST_SAMPLE_RATE": 20, "RECOVERY_TIME": 1.0, "RELEASE_TIME": 0.5},
+])
+def test_evaluator_agrees_with_the_live_loop(settings):
+    # The evaluator always ticks at the fast rate, so the live loop must too
+    settings = dict(settings, IDLE_SAMPLE_RATE=settings.get("FAST_SAMPLE_RATE", CONFIG_DEFAULTS["FAST_SAMPLE_RATE"]))
+    for seed in range(2):
+        trace = synthetic_trace(seed=seed)
+        fast = evaluate(trace, dict(CONFIG_DEFAULTS, **settings))
+        live = run_trace(trace, settings)
+
+        assert fast["incidents"] == live["incidents"]
+        assert fast["false_triggers"] == live["false_triggers"]
+        assert fast["latencies"] == pytest.approx(live["latencies"])
+        assert fast["time_to_action"] == pytest.approx(live["time_to_action"])
+
+
+def test_sweep_refuses_what_it_cannot_replay():
+    traces = [synthetic_trace(duration=5.0, events=())]
+    grid = {"THRESHOLD": [0.8]}
+    with pytest.raises(ValueError, match="--exact"):
+        sweep(traces, grid, dict(CONFIG_DEFAULTS, ADAPTIVE_THRESHOLD=True), workers=1)
+    with pytest.raises(ValueError, match="CAPTURE_SOURCE"):
+        sweep(traces, grid, dict(CONFIG_DEFAULTS, CAPTURE_SOURCE="loopback"), workers=1, exact=True)
+    with pytest.raises(ValueError, match="THRESHOLD"):
+        sweep(traces, {"THRESHOLD": [5.0]}, dict(CONFIG_DEFAULTS), workers=1)
@@ -0,0 +1,68 @@
+from timers import TimerQueue
+
+
+def test_timers_fire_in_deadline_order_with_their_deadline():
+    queue = TimerQueue()
+    fired = []
+    queue.schedule(2.0, lambda deadline: fired.append(("b", deadline)))
+    queue.schedule(1.0, lambda deadline: fired.append(("a", deadline)))
+    queue.schedule(2.0, lambda deadline: fired.append(("c", deadline)))
+    assert queue.run_due(0.5) == 0
+    assert queue.run_due(2.5) == 3
+    # Ties fire in the order they were scheduled
+    assert fired == [("a", 1.0), ("b", 2.0), ("c", 2.0)]
+    assert len(queue) == 0 and queue.fired == 3
+
+
+def test_cancelled_timers_never_fire_and_are_not_counted():
+    queue = TimerQueue()
+    fired = []
+    keep = queue.schedule(1.0, fired.append)
+    drop = queue.schedule(0.5, fired.append)
+    drop.cancel()
+    drop.cancel()
+    assert len(queue) == 1
+    assert queue.next_deadline() == 1.0
+    assert queue.run_due(2.0) == 1
+    assert fired == [1.0]
+    # Cancelling after firing is harmless
+    keep.cancel()
+    assert len(queue) == 0
+
+
+def test_callbacks_can_schedule_and_cancel():
+    queue = TimerQueue()
+    fired = []
+    later = queue.schedule(1.5, fired.append)
+
+    def chain(deadline):
+        fired.append(deadline)
+        later.cancel()
+        queue.schedule(deadline + 0.5, fired.append)
+
+    queue.schedule(1.0, chain)
+    # A timer scheduled by a callback fires in the same run if it is already due
+    assert queue.run_due(2.0) == 2
+    assert fired == [1.0, 1.5]
+
+
+def test_deadline_a_hair_past_the_tick_is_due():
+    queue = TimerQueue()
+    fired = []
+    tick = sum([0.1] * 10)
+    queue.schedule(1.0, fired.append)
+    assert tick < 1.0
+    assert queue.run_due(tick) == 1
+
+
+def test_mass_cancellation_compacts_the_heap():
+    queue = TimerQueue()
+    timers = [queue.schedule(float(i), lambda deadline: None) for i in range(100)]
+    for timer in timers[:90]:
+        timer.cancel()
+    assert len(queue) == 10
+    assert len(queue._heap) < 100
+    assert queue.next_deadline() == 90.0
+    queue.clear()
+    assert len(queue) == 0 and queue.next_deadline() is None
+    assert all(timer.cancelled for timer in timers)
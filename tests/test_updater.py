@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from updater import download, fetch_manifest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Stand-in update server: /update.bin honours Range/If-Range, /version.json ETags"""
+
+    def do_GET(self):
+        site = self.server.site
+        site["requests"].append((self.path, dict(self.headers)))
+        if self.path == "/version.json":
+            body = json.dumps(site["manifest"]).encode()
+            if self.headers.get("If-None-Match") == site["manifest_etag"]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._reply(200, body, site["manifest_etag"])
+            return
+        body = site["body"]
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") == site["etag"]:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self._reply(206, body[start:], site["etag"],
+                        {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+            return
+        self._reply(200, body, site["etag"])
+
+    def _reply(self, status, body, etag, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.site = {
+        "body": bytes(range(256)) * 400,
+        "etag": '"v1"',
+        "manifest": {"version": "2.0"},
+        "manifest_etag": '"m1"',
+        "requests": [],
+    }
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _leave_partial(dest, data, etag):
+    with open(dest + ".part", "wb") as f:
+        f.write(data)
+    with open(dest + ".part.json", "w") as f:
+        json.dump({"url": "", "etag": etag, "last_modified": None}, f)
+
+
+def test_partial_download_resumes(server, tmp_path):
+    httpd, base = server
+    body = httpd.site["body"]
+    dest = str(tmp_path / "update.bin")
+    _leave_partial(dest, body[:40000], '"v1"')
+
+    result = download(base + "/update.bin", dest)
+
+    assert result.resumed_from == 40000
+    assert httpd.site["requests"][-1][1].get("Range") == "bytes=40000-"
+    assert result.sha256 == hashlib.sha256(body).hexdigest()
+    with open(dest, "rb") as f:
+        assert f.read() == body
+    assert not (tmp_path / "update.bin.part").exists()
+
+
+def test_changed_etag_restarts_download(server, tmp_path):
+    httpd, base = server
+    httpd.site["body"] = b"new build " * 5000
+    httpd.site["etag"] = '"v2"'
+    dest = str(tmp_path / "update.bin")
+    _leave_partial(dest, b"old build " * 1000, '"v1"')
+
+    result = download(base + "/update.bin", dest)
+
+    assert result.resumed_from == 0
+    assert result.size == len(httpd.site["body"])
+    assert result.md5 == hashlib.md5(httpd.site["body"]).hexdigest()
+    with open(dest, "rb") as f:
+        assert f.read() == httpd.site["body"]
+
+
+def test_not_modified_serves_cached_manifest(server, tmp_path):
+    httpd, base = server
+    cache_path = str(tmp_path / "manifest_cache.json")
+
+    manifest, cached = fetch_manifest(base + "/version.json", cache_path=cache_path)
+    assert manifest == {"version": "2.0"} and not cached
+
+    manifest, cached = fetch_manifest(base + "/version.json", cache_path=cache_path)
+    assert manifest == {"version": "2.0"} and cached
+    assert httpd.site["requests"][-1][1].get("If-None-Match") == '"m1"'
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+
+# Tick times built up from repeated additions can land a hair short of a
+# deadline meant for that very tick; anything this close counts as due
+DEADLINE_SLACK = 1e-9
+
+
+class Timer:
+    """Handle for one scheduled callback; cancel() stops it from firing"""
+
+    __slots__ = ("deadline", "callback", "cancelled", "_queue")
+
+    def __init__(self, deadline, callback, queue):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+        self._queue = queue
+
+    def cancel(self):
+        if self._queue is not None:
+            self._queue._cancel(self)
+        self.cancelled = True
+
+
+class TimerQueue:
+    """Deadline heap of one-shot timers, fired from the monitor thread
+
+    Nothing here has a thread of its own: the monitor loop calls
+    run_due() every tick and every timer whose deadline has passed fires
+    in deadline order (ties in the order they were scheduled). Each
+    callback receives its deadline rather than the tick time, so a state
+    that ends between two ticks is timed as if it ended on schedule.
+    Cancelling only marks the timer; it is dropped when it reaches the
+    top of the heap, and the heap is compacted if cancelled entries pile
+    up, so schedule and cancel stay O(log n) and O(1).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cancelled = 0
+        self.fired = 0
+
+    def schedule(self, deadline, callback):
+        """Call callback(deadline) from the first run_due() at or after deadline"""
+        timer = Timer(deadline, callback, self)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), timer))
+        return timer
+
+    def _cancel(self, timer):
+        timer._queue = None
+        timer.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > 32 and self._cancelled > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def next_deadline(self):
+        """Deadline of the earliest live timer, or None"""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now):
+        """Fire every timer due by now, including ones scheduled by callbacks; returns the count"""
+        count = 0
+        # Callbacks may compact the heap, so it is looked up on every pass
+        while self._heap and self._heap[0][0] <= now + DEADLINE_SLACK:
+            _, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                self._cancelled -= 1
+                continue
+            # A fired timer is spent; cancelling it afterwards does nothing
+            timer._queue = None
+            timer.cancelled = True
+            timer.callback(timer.deadline)
+            count += 1
+        self.fired += count
+        return count
+
+    def clear(self):
+        for _, _, timer in self._heap:
+            timer._queue = None
+            timer.cancelled = True
+        self._heap = []
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import time
+
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 1024 * 1024
+# Aim for reads that each take about this long, whatever the link speed
+TARGET_CHUNK_SECONDS = 0.2
+
+
+class UpdateError(Exception):
+    """The manifest or the update file could not be fetched"""
+
+
+class StreamingHasher:
+    """SHA-256 and MD5 of a byte stream, fed chunk by chunk"""
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def update(self, chunk):
+        self.sha256.update(chunk)
+        self.md5.update(chunk)
+        self.size += len(chunk)
+
+    def update_from_file(self, path, chunk_size=MAX_CHUNK):
+        """Hash what is already on disk (the part of a resumed download)"""
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                self.update(chunk)
+
+
+class AdaptiveChunker:
+    """Read sizes that track throughput: small on slow links, large on fast ones"""
+
+    def __init__(self, minimum=MIN_CHUNK, maximum=MAX_CHUNK, target_seconds=TARGET_CHUNK_SECONDS):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = minimum
+
+    def observe(self, nbytes, seconds):
+        if seconds <= 0:
+            self.size = min(self.size * 2, self.maximum)
+            return
+        wanted = nbytes / seconds * self.target_seconds
+        # Grow at most 2x per read so one fast burst does not overshoot
+        self.size = int(min(max(wanted, self.minimum), self.size * 2, self.maximum))
+
+
+class DownloadResult:
+    def __init__(self, path, size, sha256, md5, resumed_from):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.md5 = md5
+        self.resumed_from = resumed_from
+
+    def matches(self, expected_sha256=None, expected_md5=None):
+        """False if any expected digest differs; True when none is given"""
+        if expected_sha256 and expected_sha256.lower() != self.sha256:
+            return False
+        if expected_md5 and expected_md5.lower() != self.md5:
+            return False
+        return True
+
+
+def _open(url, headers, timeout):
+    import urllib.request
+
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout)
+
+
+def _load_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_json(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def fetch_manifest(url, cache_path=None, timeout=5, user_agent=None):
+    """Fetch the version manifest, revalidating a cached copy
+
+    Returns (manifest, cached). With a cache file the request carries
+    If-None-Match / If-Modified-Since, so an unchanged manifest costs a
+    304 with no body.
+    """
+    from urllib.error import HTTPError
+
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    cache = _load_json(cache_path) if cache_path else None
+    if cache and "manifest" in cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        with _open(url, headers, timeout) as response:
+            manifest = json.loads(response.read().decode())
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except HTTPError as e:
+        if e.code == 304 and cache:
+            return cache["manifest"], True
+        raise
+    if cache_path and (etag or last_modified):
+        try:
+            _save_json(cache_path, {"etag": etag, "last_modified": last_modified, "manifest": manifest})
+        except OSError:
+            pass
+    return manifest, False
+
+
+def download(url, dest, timeout=30, user_agent=None, progress=None, chunker=None):
+    """Stream url to dest, hashing on the fly and resuming a previous attempt
+
+    Bytes go to dest + ".part" until the transfer completes. An
+    interrupted download leaves that file (plus the validator it was
+    fetched under) behind, and the next call asks only for the missing
+    range with If-Range, so a file changed on the server is fetched again
+    from the start instead of being spliced. progress(done, total) is
+    called after every chunk; total is None if the server does not say.
+    """
+    from urllib.error import HTTPError
+
+    partial = dest + ".part"
+    meta_path = partial + ".json"
+    meta = _load_json(meta_path) or {}
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    validator = meta.get("etag") or meta.get("last_modified")
+    if offset and not validator:
+        # Nothing to prove the server still has the same file
+        offset = 0
+
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    try:
+        response = _open(url, headers, timeout)
+    except HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        # Range past the end: the previous attempt already has every byte
+        response = None
+
+    hasher = StreamingHasher()
+    chunker = chunker or AdaptiveChunker()
+    if response is None:
+        hasher.update_from_file(partial)
+    else:
+        with response:
+            resumed = response.status == 206
+            if resumed:
+                hasher.update_from_file(partial)
+            else:
+                offset = 0
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            _save_json(meta_path, {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            })
+            with open(partial, "ab" if resumed else "wb") as f:
+                while True:
+                    started = time.perf_counter()
+                    chunk = response.read(chunker.size)
+                    if not chunk:
+                        break
+                    chunker.observe(len(chunk), time.perf_counter() - started)
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    if progress:
+                        progress(hasher.size, total)
+            if total is not None and hasher.size < total:
+                raise UpdateError(f"connection closed after {hasher.size} of {total} bytes")
+
+    os.replace(partial, dest)
+    try:
+        os.remove(meta_path)
+    except OSError:
+        pass
+    return DownloadResult(dest, hasher.size, hasher.sha256.hexdigest(), hasher.md5.hexdigest(), offset)
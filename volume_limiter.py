@@ -1,20 +1,31 @@
+import argparse
 import json
+import math
 import os
 import shutil
 import subprocess
 import sys
 import threading
 import time
-import urllib.request
 import warnings
-import hashlib
-from ctypes import POINTER, cast
 from datetime import datetime
 
-import numpy as np
-import pyaudio
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioMeterInformation, ISimpleAudioVolume
+from audio_backend import PycawBackend
+from clock import SystemClock
+from control import DEFAULT_PORT as CONTROL_DEFAULT_PORT, TOKEN_FILE as CONTROL_TOKEN_FILE, ControlServer
+from detector import WindowDetector
+from envelope import ATTACK, IDLE, RELEASE, GainEnvelope
+from flight_recorder import FlightRecorder
+from incident_log import IncidentLogWriter
+from metrics import DETECTION_BUCKETS, MetricsRegistry, MetricsServer, SnapshotWriter
+from renderer import ConsoleRenderer
+from scheduler import TickScheduler
+from session_registry import SessionRegistry
+from session_watcher import SessionWatcher
+from settings import ConfigError, ConfigWatcher, Settings, load_settings, validate
+from startup import StartupProfile
+from timers import TimerQueue
+import updater
 
 warnings.filterwarnings("ignore")
 
@@ -22,81 +33,128 @@ warnings.filterwarnings("ignore")
 VERSION = "1.0.4"
 UPDATE_CHECK_URL = "https://afterpacket.pro/Software/EarProtect/version.json"
 UPDATE_CHECK_TIMEOUT = 5  # seconds
+UPDATE_CACHE_FILE = "version_cache.json"
 CONFIG_FILE = "config.json"
+LOG_FILE = "earrape_incidents.log"
+WINDOW_UNIT = 0.1  # PEAK_WINDOW and FAST_WINDOW count 100 ms samples
+LOUDNESS_TRIP = "loudness"
+DISCORD_VARIANTS = ["discord.exe", "discordptb.exe", "discordcanary.exe",
+                    "discord", "discordptb", "discordcanary"]
 
-
-def calculate_md5(file_path):
-    """Calculate MD5 checksum of a file"""
-    md5_hash = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
-    except Exception as e:
-        print(f"⚠️  Error calculating MD5: {e}")
-        return None
+# Settings written to a fresh config.json and used for missing keys
+CONFIG_DEFAULTS = {
+    "THRESHOLD": 0.85,
+    "REDUCTION": 0.2,
+    "RECOVERY_TIME": 5.0,
+    "DEFAULT_VOLUME": 1.0,
+    "PEAK_WINDOW": 10,
+    "FAST_WINDOW": 0,
+    "FAST_THRESHOLD": 0.95,
+    "FAST_SAMPLE_RATE": 50,
+    "IDLE_SAMPLE_RATE": 4,
+    "ACTIVE_LEVEL": 0.2,
+    "ATTACK_TIME": 0.0,
+    "RELEASE_TIME": 1.0,
+    "RELEASE_CURVE": "linear",
+    "VOLUME_TOLERANCE": 0.02,
+    "CAPTURE_SOURCE": "",
+    "CAPTURE_DEVICE": None,
+    "LOUDNESS_THRESHOLD": -10.0,
+    "DISTORTION_THRESHOLD": 0.0,
+    "LOG_FORMAT": "both",
+    "LOG_MAX_BYTES": 5000000,
+    "LOG_MAX_AGE_DAYS": 0,
+    "LOG_BACKUPS": 5,
+    "PRE_INCIDENT_SECONDS": 2.0,
+    "DISPLAY_FPS": 10,
+    "MULTI_APP": False,
+    "APPS": {"discord": {"patterns": DISCORD_VARIANTS}},
+    "METRICS_PORT": 0,
+    "METRICS_FILE": "",
+    "METRICS_INTERVAL": 10.0,
+    "CONTROL_PORT": 0,
+    "CONTROL_SOCKET": "",
+    "FLIGHT_RECORDER_FILE": "flight_recorder.bin",
+    "FLIGHT_RECORDER_HOURS": 24.0,
+    "SNAPSHOT_SECONDS": 30.0,
+    "CONFIG_RELOAD_INTERVAL": 1.0,
+    "ADAPTIVE_THRESHOLD": False,
+    "BASELINE_QUANTILE": 0.95,
+    "BASELINE_MARGIN_DB": 5.0,
+    "BASELINE_HALF_LIFE": 1800.0,
+    "BASELINE_FILE": "baseline.json"
+}
+# What a config.json edit made while running has to rebuild
+DETECTOR_KEYS = ("THRESHOLD", "PEAK_WINDOW", "FAST_WINDOW", "FAST_THRESHOLD", "FAST_SAMPLE_RATE",
+                 "PRE_INCIDENT_SECONDS")
+SCHEDULER_KEYS = ("FAST_SAMPLE_RATE", "IDLE_SAMPLE_RATE", "ACTIVE_LEVEL")
+ENVELOPE_KEYS = ("ATTACK_TIME", "RECOVERY_TIME", "RELEASE_TIME", "RELEASE_CURVE", "VOLUME_TOLERANCE")
+BASELINE_KEYS = ("BASELINE_QUANTILE", "BASELINE_MARGIN_DB", "BASELINE_HALF_LIFE", "FAST_SAMPLE_RATE")
+# Only read at startup; edits to these wait for the next start
+RESTART_KEYS = ("CAPTURE_SOURCE", "CAPTURE_DEVICE", "LOG_FORMAT", "LOG_MAX_BYTES", "LOG_MAX_AGE_DAYS",
+                "LOG_BACKUPS", "DISPLAY_FPS", "MULTI_APP", "METRICS_PORT", "METRICS_FILE", "METRICS_INTERVAL",
+                "CONTROL_PORT", "CONTROL_SOCKET",
+                "FLIGHT_RECORDER_FILE", "FLIGHT_RECORDER_HOURS", "CONFIG_RELOAD_INTERVAL",
+                "ADAPTIVE_THRESHOLD", "BASELINE_FILE")
+# Seconds between adaptive trip point updates and between baseline saves
+BASELINE_REFRESH = 1.0
+BASELINE_SAVE_INTERVAL = 60.0
 
 
-def verify_checksum(file_path, expected_md5):
-    """Verify file against expected MD5 checksum"""
-    if not expected_md5:
+def verify_checksum(result, expected_md5=None, expected_sha256=None):
+    """Check the digests computed while downloading against the manifest"""
+    if not expected_md5 and not expected_sha256:
         print("⚠️  No checksum provided, skipping verification")
         return True
 
     print(f"🔐 Verifying file integrity...")
-    actual_md5 = calculate_md5(file_path)
-
-    if not actual_md5:
-        return False
-
-    if actual_md5.lower() == expected_md5.lower():
-        print(f"✅ Checksum verified: {actual_md5}")
+    if result.matches(expected_sha256, expected_md5):
+        if expected_sha256:
+            print(f"✅ SHA-256 verified: {result.sha256}")
+        if expected_md5:
+            print(f"✅ MD5 verified: {result.md5}")
         return True
     else:
         print(f"❌ CHECKSUM MISMATCH!")
-        print(f"   Expected: {expected_md5}")
-        print(f"   Got:      {actual_md5}")
+        if expected_sha256:
+            print(f"   Expected SHA-256: {expected_sha256}")
+            print(f"   Got:              {result.sha256}")
+        if expected_md5:
+            print(f"   Expected MD5:     {expected_md5}")
+            print(f"   Got:              {result.md5}")
         print(f"⚠️  File may be corrupted or tampered with!")
         return False
 
 
-def download_update(download_url, version, expected_md5=None):
-    """Download the new version"""
+def print_progress(downloaded, total_size):
+    if total_size:
+        percent = (downloaded / total_size) * 100
+        bar_length = 30
+        filled = int(bar_length * downloaded / total_size)
+        bar = "█" * filled + "░" * (bar_length - filled)
+        print(f"\r   Progress: [{bar}] {percent:.1f}%", end="")
+
+
+def download_update(download_url, version, expected_md5=None, expected_sha256=None):
+    """Download the new version, resuming an interrupted attempt"""
+    file_extension = ".exe" if download_url.endswith(".exe") else ".py"
+    temp_file = f"updates/volume_limiter_v{version}{file_extension}"
     try:
         print(f"\n⬇️  Downloading version {version}...")
         if not os.path.exists("updates"):
             os.makedirs("updates")
-        file_extension = ".exe" if download_url.endswith(".exe") else ".py"
-        temp_file = f"updates/volume_limiter_v{version}{file_extension}"
 
-        req = urllib.request.Request(
-            download_url, headers={"User-Agent": f"DiscordVolumeLimiter/{VERSION}"}
+        result = updater.download(
+            download_url, temp_file, timeout=30,
+            user_agent=f"DiscordVolumeLimiter/{VERSION}", progress=print_progress,
         )
-        with urllib.request.urlopen(req, timeout=30) as response:
-            total_size = int(response.headers.get("content-length", 0))
-            downloaded = 0
-            chunk_size = 8192
-
-            with open(temp_file, "wb") as f:
-                while True:
-                    chunk = response.read(chunk_size)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        percent = (downloaded / total_size) * 100
-                        bar_length = 30
-                        filled = int(bar_length * downloaded / total_size)
-                        bar = "█" * filled + "░" * (bar_length - filled)
-                        print(f"\r   Progress: [{bar}] {percent:.1f}%", end="")
-
+        if result.resumed_from:
+            print(f"\n   Resumed from {result.resumed_from / 1024:.0f} KB")
         print(f"\n✅ Download complete!")
 
-        # Verify checksum if provided
-        if expected_md5:
-            if not verify_checksum(temp_file, expected_md5):
+        # Verify checksum if provided (hashed while streaming, no second read)
+        if expected_md5 or expected_sha256:
+            if not verify_checksum(result, expected_md5, expected_sha256):
                 print(f"❌ Checksum verification failed!")
                 response = input("Continue anyway? (NOT RECOMMENDED) (y/n): ").lower().strip()
                 if response not in ["y", "yes"]:
@@ -108,6 +166,8 @@ def download_update(download_url, version, expected_md5=None):
         return temp_file
     except Exception as e:
         print(f"\n❌ Download failed: {e}")
+        if os.path.exists(f"{temp_file}.part"):
+            print("   Run the update again to resume where it stopped")
         return None
 
 
@@ -156,146 +216,666 @@ def install_update(temp_file, is_executable):
     return True
 
 
+def fetch_update_info():
+    """Fetch version.json, revalidating the cached copy (a 304 when unchanged)"""
+    manifest, _ = updater.fetch_manifest(
+        UPDATE_CHECK_URL, cache_path=UPDATE_CACHE_FILE, timeout=UPDATE_CHECK_TIMEOUT,
+        user_agent=f"DiscordVolumeLimiter/{VERSION}",
+    )
+    return manifest
+
+
+def check_for_updates_in_background(notify):
+    """Look for a newer version on a daemon thread; never prompts or blocks"""
+    def run():
+        try:
+            data = fetch_update_info()
+        except Exception as e:
+            notify(f"⚠️  Update check failed: {e}")
+            return
+        latest_version = data.get("version", VERSION)
+        if latest_version != VERSION:
+            notify(f"📢 UPDATE AVAILABLE: {VERSION} → {latest_version}. Run with --update to install it.")
+
+    thread = threading.Thread(target=run, name="update-check", daemon=True)
+    thread.start()
+    return thread
+
+
 def check_for_updates():
     """Check if a newer version is available and offer to download"""
     try:
-        req = urllib.request.Request(
-            UPDATE_CHECK_URL, headers={"User-Agent": f"DiscordVolumeLimiter/{VERSION}"}
-        )
-        with urllib.request.urlopen(req, timeout=UPDATE_CHECK_TIMEOUT) as response:
-            data = json.loads(response.read().decode())
-            latest_version = data.get("version", VERSION)
-            download_url = data.get("download_url", "")
-            changelog = data.get("changelog", "")
-            md5_checksum = data.get("md5_checksum", "")  # Get MD5 from version.json
-
-            if latest_version != VERSION:
-                print("\n" + "🔔" * 35)
-                print(f"📢 UPDATE AVAILABLE!")
-                print(f"   Current Version: {VERSION}")
-                print(f"   Latest Version:  {latest_version}")
-                if md5_checksum:
-                    print(f"   MD5 Checksum:    {md5_checksum}")
-                if changelog:
-                    print(f"\n   What's New:")
-                    for line in changelog.split("\n"):
-                        if line.strip():
-                            print(f"   {line}")
-                print("🔔" * 35 + "\n")
-                if download_url:
-                    response = input(
-                        "Would you like to download and install this update now? (y/n): "
-                    ).lower().strip()
-                    if response in ["y", "yes"]:
-                        temp_file = download_update(download_url, latest_version, md5_checksum)
-                        if temp_file:
-                            is_executable = temp_file.endswith(".exe")
-                            print(f"\n📦 Update downloaded to: {temp_file}")
-                            install_response = input(
-                                "Install now? This will restart the application. (y/n): "
-                            ).lower().strip()
-                            if install_response in ["y", "yes"]:
-                                install_update(temp_file, is_executable)
-                            else:
-                                print(
-                                    f"✅ Update saved. You can install it manually later from '{temp_file}'"
-                                )
-                    else:
-                        print("Update skipped. You can download it later from:")
-                        print(f"   {download_url}\n")
+        data = fetch_update_info()
+        latest_version = data.get("version", VERSION)
+        download_url = data.get("download_url", "")
+        changelog = data.get("changelog", "")
+        md5_checksum = data.get("md5_checksum", "")  # Get MD5 from version.json
+        sha256_checksum = data.get("sha256_checksum", "")
+
+        if latest_version != VERSION:
+            print("\n" + "🔔" * 35)
+            print(f"📢 UPDATE AVAILABLE!")
+            print(f"   Current Version: {VERSION}")
+            print(f"   Latest Version:  {latest_version}")
+            if sha256_checksum:
+                print(f"   SHA-256:         {sha256_checksum}")
+            if md5_checksum:
+                print(f"   MD5 Checksum:    {md5_checksum}")
+            if changelog:
+                print(f"\n   What's New:")
+                for line in changelog.split("\n"):
+                    if line.strip():
+                        print(f"   {line}")
+            print("🔔" * 35 + "\n")
+            if download_url:
+                response = input(
+                    "Would you like to download and install this update now? (y/n): "
+                ).lower().strip()
+                if response in ["y", "yes"]:
+                    temp_file = download_update(download_url, latest_version, md5_checksum, sha256_checksum)
+                    if temp_file:
+                        is_executable = temp_file.endswith(".exe")
+                        print(f"\n📦 Update downloaded to: {temp_file}")
+                        install_response = input(
+                            "Install now? This will restart the application. (y/n): "
+                        ).lower().strip()
+                        if install_response in ["y", "yes"]:
+                            install_update(temp_file, is_executable)
+                        else:
+                            print(
+                                f"✅ Update saved. You can install it manually later from '{temp_file}'"
+                            )
                 else:
-                    print("⚠️  No download URL provided\n")
-                return True
+                    print("Update skipped. You can download it later from:")
+                    print(f"   {download_url}\n")
             else:
-                print(f"✅ You're running the latest version ({VERSION})\n")
-                return False
+                print("⚠️  No download URL provided\n")
+            return True
+        else:
+            print(f"✅ You're running the latest version ({VERSION})\n")
+            return False
     except Exception as e:
         print(f"⚠️  Update check failed: {e}")
         return False
 
 
 class DiscordOutputLimiter:
-    def __init__(self):
+    def __init__(self, backend=None, clock=None, config_file=CONFIG_FILE, log_file=LOG_FILE,
+                 headless=False, startup=None, daemon=False):
+        # Audio access and timing are injectable so the monitor can run
+        # against a simulated backend on a virtual clock
+        self.backend = backend if backend is not None else PycawBackend()
+        self.clock = clock if clock is not None else SystemClock()
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self.metrics_snapshot = None
+        # Daemon mode waits for Discord indefinitely and always serves the control socket
+        self.daemon = daemon
+        self.control = None
+        self.paused = False
+        self.sessions = SessionRegistry(self.backend, self.metrics)
+        self.watcher = SessionWatcher(self.sessions, DISCORD_VARIANTS, self.clock)
+
         # Load config if exists
+        self.config_file = config_file
         self.load_config()
+        # Sustained-window trip point: THRESHOLD, or the learned one in adaptive mode
+        self.threshold = self.THRESHOLD
+        # Restart-only keys whose value in self.settings is not yet in effect
+        self.pending_restart = []
+        self.config_watcher = None
+        if self.CONFIG_RELOAD_INTERVAL > 0:
+            self.config_watcher = ConfigWatcher(self.config_file, CONFIG_DEFAULTS, self.CONFIG_RELOAD_INTERVAL)
 
         self.is_running = False
+        # Set only by on_transition in single-app mode, by the tick in multi-app mode
         self.is_limiting = False
-        self.peak_history = []
+        # Session volume as last read by the monitor loop (for the control socket)
+        self.session_volume = None
+        # Every limiter state timer, run by the monitor loop
+        self.timers = TimerQueue()
+        self.detector = self.create_detector()
+        self.scheduler = self.create_scheduler()
+        self.envelope = self.create_envelope()
+        self.capture = None
+        self.recorder = None
+        # Incidents of the current tick, logged once its flight recorder sample is in
+        self._pending_incidents = []
+        self.baseline = None
+        self._baseline_due = 0.0
+        self._baseline_saved = 0.0
+        self.multi_app = None
+        self.renderer = ConsoleRenderer(fps=self.DISPLAY_FPS, show_status=not headless)
+        # StartupProfile while --startup-profile waits for the first protected tick
+        self.startup = startup
 
         # Logging setup
-        self.log_file = "earrape_incidents.log"
+        self.log_file = log_file
         self.init_log_file()
+        self.register_metrics()
 
     def load_config(self):
-        """Load settings from JSON config"""
-        defaults = {
-            "THRESHOLD": 0.85,
-            "REDUCTION": 0.2,
-            "RECOVERY_TIME": 5.0,
-            "DEFAULT_VOLUME": 1.0,
-            "PEAK_WINDOW": 10
-        }
-        if os.path.exists(CONFIG_FILE):
+        """Load and validate settings from JSON config"""
+        settings = Settings(CONFIG_DEFAULTS)
+        if os.path.exists(self.config_file):
             try:
-                with open(CONFIG_FILE, "r") as f:
-                    cfg = json.load(f)
-                    for key in defaults:
-                        setattr(self, key, cfg.get(key, defaults[key]))
+                settings, problems = load_settings(self.config_file, CONFIG_DEFAULTS)
+                for problem in problems:
+                    print(f"⚠️ config.json: {problem} (using the default)")
             except Exception as e:
                 print(f"⚠️ Failed to load config.json, using defaults ({e})")
-                for key in defaults:
-                    setattr(self, key, defaults[key])
         else:
-            for key in defaults:
-                setattr(self, key, defaults[key])
             # Create a default config
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(defaults, f, indent=4)
+            with open(self.config_file, "w") as f:
+                json.dump(CONFIG_DEFAULTS, f, indent=4)
+        # The immutable snapshot; the attributes below mirror it for the monitor
+        self.settings = settings
+        for key in settings:
+            setattr(self, key, getattr(settings, key))
+
+    def check_config(self, now):
+        """Apply config.json edits made while running (called between ticks)"""
+        if not self.config_watcher:
+            return
+        try:
+            settings = self.config_watcher.poll(now)
+        except ConfigError as e:
+            self.metrics.counter("config_reloads_total", "config.json reloads", result="rejected").inc()
+            if self.control:
+                self.control.publish("config", result="rejected", source="file", problems=e.problems)
+            self.renderer.message("❌ config.json change rejected, keeping the current settings:\n"
+                                  + "\n".join(f"   • {problem}" for problem in e.problems))
+            return
+        if settings is not None:
+            self.apply_settings(settings)
+
+    def apply_settings(self, settings, source="file", saved=False):
+        """Swap in new settings, resizing the running detector without losing its samples
+
+        source is "file" for a config.json reload or "control" for a change
+        made over the control socket (saved when it was also written to
+        config.json). Returns (applied, restart): the changed keys now in
+        force and those that only take effect after a restart.
+        """
+        changed = settings.changed(self.settings)
+        live = [key for key in changed if key not in RESTART_KEYS]
+        # The attributes still hold the values in effect, so an edit that was
+        # reverted before a restart needs none
+        pending = [key for key in settings.changed(self) if key in RESTART_KEYS]
+        restart = [key for key in changed if key in pending]
+        report = [f"{key} {getattr(self, key)!r} → {getattr(settings, key)!r}" for key in live if key != "APPS"]
+        if "APPS" in live:
+            report.append("APPS updated")
+
+        self.settings = settings
+        for key in live:
+            setattr(self, key, getattr(settings, key))
+        self.pending_restart = pending
+        if "THRESHOLD" in live:
+            self.threshold = self.THRESHOLD
+        if self.baseline:
+            if any(key in BASELINE_KEYS for key in live):
+                self.baseline.configure(self.BASELINE_QUANTILE, self.BASELINE_MARGIN_DB,
+                                        self.BASELINE_HALF_LIFE, self.FAST_SAMPLE_RATE)
+            self._baseline_due = 0.0
+        if any(key in DETECTOR_KEYS for key in live):
+            self.detector.resize(*self.detector_windows())
+        if any(key in SCHEDULER_KEYS for key in live):
+            self.scheduler.configure(self.FAST_SAMPLE_RATE, self.IDLE_SAMPLE_RATE, self.ACTIVE_LEVEL)
+        if any(key in ENVELOPE_KEYS for key in live):
+            self.envelope.configure(self.ATTACK_TIME, self.RECOVERY_TIME, self.RELEASE_TIME,
+                                    self.RELEASE_CURVE, self.VOLUME_TOLERANCE)
+        if self.recorder:
+            self.recorder.snapshot_seconds = self.SNAPSHOT_SECONDS
+            self.recorder.max_rate = self.FAST_SAMPLE_RATE
+        if self.multi_app and live:
+            self.multi_app.apply_settings()
+
+        if source == "file":
+            self.metrics.counter("config_reloads_total", "config.json reloads", result="applied").inc()
+            title = "config.json reloaded"
+        else:
+            self.metrics.counter("control_config_changes_total", "Settings changed over the control socket",
+                                 saved=str(saved).lower()).inc()
+            title = "Settings changed over the control socket" + (" and saved" if saved else "")
+        if self.control:
+            self.control.publish("config", result="applied", source=source, saved=saved,
+                                 changed=live, restart=restart)
+        if report:
+            self.renderer.message(f"⚙️  {title}: " + ", ".join(report))
+        if restart:
+            self.renderer.message(f"⚠️  Restart to apply: {', '.join(restart)}")
+        return live, restart
+
+    def configure(self, changes, save=False):
+        """Apply setting changes made over the control socket; returns (applied, restart)
+
+        The changes are validated together with the running settings and
+        rejected as a whole (ConfigError) if any value is invalid or is one
+        of the startup-only RESTART_KEYS. With save they are also written to
+        config.json, which the config watcher then treats as already loaded.
+        """
+        if not isinstance(changes, dict):
+            raise ConfigError(["set must map setting names to values"])
+        # Paths, ports and the like are only read at startup; they stay a config.json edit
+        refused = [f"{key} can only be changed in config.json" for key in changes if key in RESTART_KEYS]
+        if refused:
+            raise ConfigError(refused)
+        values, problems = validate({**self.settings.as_dict(), **changes}, CONFIG_DEFAULTS)
+        if problems:
+            raise ConfigError(problems)
+        settings = Settings(values)
+        if save:
+            temp_path = self.config_file + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(settings.as_dict(), f, indent=4)
+            os.replace(temp_path, self.config_file)
+            if self.config_watcher:
+                self.config_watcher.acknowledge()
+        return self.apply_settings(settings, source="control", saved=save)
+
+    def window_samples(self, window):
+        """Convert a window given in 100 ms samples to fast-rate samples"""
+        return max(1, int(round(window * WINDOW_UNIT * self.FAST_SAMPLE_RATE)))
+
+    def detector_windows(self):
+        """(windows, history) for the detector under the current settings"""
+        windows = [("sustained", self.window_samples(self.PEAK_WINDOW), self.threshold)]
+        if self.FAST_WINDOW > 0:
+            # Short window with a higher bar trips on brief but extreme blasts
+            windows.append(("fast", self.window_samples(self.FAST_WINDOW), self.FAST_THRESHOLD))
+        history = self.window_samples(self.PRE_INCIDENT_SECONDS / WINDOW_UNIT)
+        return windows, history
+
+    def create_detector(self):
+        """Build the sliding-window detector for the current settings"""
+        windows, history = self.detector_windows()
+        return WindowDetector(windows, history=history)
+
+    def create_envelope(self):
+        """Build the attack/hold/release envelope for the current settings"""
+        envelope = GainEnvelope(
+            attack_time=self.ATTACK_TIME,
+            hold_time=self.RECOVERY_TIME,
+            release_time=self.RELEASE_TIME,
+            curve=self.RELEASE_CURVE,
+            tolerance=self.VOLUME_TOLERANCE,
+            timers=self.timers,
+        )
+        envelope.add_listener(self.on_transition)
+        return envelope
+
+    def count_transition(self, old, new, at, reason, session=None, app=None):
+        """Envelope listener that counts state changes and reports them to subscribers"""
+        self.metrics.counter("limiter_transitions_total", "Limiter state machine transitions",
+                             **{"from": old, "to": new}).inc()
+        if self.control:
+            self.control.publish("state", **{"from": old, "to": new, "reason": reason, "time": time.time(),
+                                             "app": app, "process": session.name if session else None,
+                                             "pid": session.pid if session else None})
+
+    def on_transition(self, old, new, at, reason):
+        """Follow the single-app envelope from idle to limiting and back"""
+        self.count_transition(old, new, at, reason, self.watcher.current())
+        if new == ATTACK:
+            self.is_limiting = True
+        elif new == IDLE:
+            self.is_limiting = False
+            self.detector.reset()
+            if reason == "release done":
+                self.renderer.message(f"🔊 RESTORED: Discord back to {int(self.DEFAULT_VOLUME*100)}%                    ")
+
+    def open_capture(self):
+        """Start the optional PCM capture pipeline named by CAPTURE_SOURCE"""
+        if not self.CAPTURE_SOURCE:
+            return None
+        try:
+            # numpy/pyaudio are only needed when capture is switched on
+            from capture import open_capture
+
+            capture = open_capture(self.CAPTURE_SOURCE, clock=self.clock, device_index=self.CAPTURE_DEVICE)
+            capture.start()
+        except Exception as e:
+            print(f"⚠️  Loudness capture unavailable, using the peak meter only ({e})")
+            return None
+        print(f"🎙️  Loudness capture: {self.CAPTURE_SOURCE} @ {capture.sample_rate} Hz"
+              f" (trigger above {self.LOUDNESS_THRESHOLD:.0f} LUFS)")
+        if self.DISTORTION_THRESHOLD > 0:
+            print(f"🔬 Sustained trips need a distortion score of {self.DISTORTION_THRESHOLD:.2f}"
+                  f" (loud but clean audio is left alone)")
+        return capture
+
+    def open_flight_recorder(self):
+        """Map the peak/volume ring file named by FLIGHT_RECORDER_FILE"""
+        if not self.FLIGHT_RECORDER_FILE:
+            return None
+        # Relative paths live next to config.json
+        path = os.path.join(os.path.dirname(self.config_file), self.FLIGHT_RECORDER_FILE)
+        recorder = FlightRecorder(
+            path,
+            capacity=int(self.FLIGHT_RECORDER_HOURS * 3600 * self.FAST_SAMPLE_RATE),
+            snapshot_dir=os.path.join(os.path.dirname(self.log_file), "incident_snapshots"),
+            snapshot_seconds=self.SNAPSHOT_SECONDS,
+            max_rate=self.FAST_SAMPLE_RATE,
+        )
+        try:
+            recorder.open(self.clock.time())
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Flight recorder unavailable ({e})")
+            return None
+        print(f"📼 Flight recorder: {path} (last {self.FLIGHT_RECORDER_HOURS:g} h)")
+        return recorder
+
+    def close_flight_recorder(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def baseline_path(self):
+        """Where the learned levels are kept, or None to keep them in memory only"""
+        if not self.BASELINE_FILE:
+            return None
+        # Relative paths live next to config.json
+        return os.path.join(os.path.dirname(self.config_file), self.BASELINE_FILE)
+
+    def open_baseline(self):
+        """Load the learned per-application levels if ADAPTIVE_THRESHOLD is on"""
+        if not self.ADAPTIVE_THRESHOLD:
+            return None
+        # NumPy is only needed in adaptive mode
+        from baseline import BaselineTable
+
+        table = BaselineTable(self.BASELINE_QUANTILE, self.BASELINE_MARGIN_DB,
+                              self.BASELINE_HALF_LIFE, self.FAST_SAMPLE_RATE)
+        now = self.clock.time()
+        path = self.baseline_path()
+        loaded = bool(path) and table.load(path, now)
+        table.start()
+        print(f"🧠 Adaptive threshold: trip {self.BASELINE_MARGIN_DB:g} dB above the learned"
+              f" {self.BASELINE_QUANTILE * 100:g}th percentile level"
+              f" ({'resuming from' if loaded else 'learning into'} {path or 'memory'})")
+        self._baseline_due = now
+        self._baseline_saved = now
+        return table
+
+    def baseline_due(self, now):
+        """True about once a second, when adaptive trip points should be recomputed"""
+        if now < self._baseline_due:
+            return False
+        self._baseline_due = now + BASELINE_REFRESH
+        if now - self._baseline_saved >= BASELINE_SAVE_INTERVAL and self.baseline_path():
+            self._baseline_saved = now
+            self.baseline.save(self.baseline_path(), now, background=True)
+        return True
+
+    def track_baseline(self, now):
+        """Learn the usual level of the session and move the trip point with it"""
+        # The baseline learns the same window mean the trip point is compared
+        # with; limiting turns the level down, so those ticks are skipped
+        if not self.is_limiting and self.detector.ready():
+            self.baseline.add((self.detector.mean(),), self.scheduler.samples_per_tick, now)
+        if not self.baseline_due(now) or not self.baseline.names:
+            return
+        threshold = float(self.baseline.trip_levels(self.THRESHOLD, now)[0])
+        if abs(threshold - self.threshold) >= 0.005:
+            self.threshold = threshold
+            self.detector.set_threshold("sustained", threshold)
+
+    def close_baseline(self):
+        if self.baseline:
+            # A queued background save must not land after the final one
+            self.baseline.close()
+            if self.baseline_path():
+                self.baseline.save(self.baseline_path(), self.clock.time())
+            self.baseline = None
+
+    def create_scheduler(self):
+        """Build the tick scheduler for the current settings"""
+        return TickScheduler(
+            self.clock,
+            fast_rate=self.FAST_SAMPLE_RATE,
+            idle_rate=self.IDLE_SAMPLE_RATE,
+            active_level=self.ACTIVE_LEVEL,
+        )
 
     def init_log_file(self):
-        """Initialize log file with header if it doesn't exist"""
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, "w") as f:
-                f.write("=" * 80 + "\n")
-                f.write("Discord Ear-Rape Detection Log\n")
-                f.write("=" * 80 + "\n\n")
-
-    def log_incident(self, peak_level, avg_peak):
-        """Log an ear-rape incident with timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.log_file, "a") as f:
-            f.write(f"[{timestamp}] EAR-RAPE DETECTED!\n")
-            f.write(f"  - Peak Level: {int(peak_level * 100)}%\n")
-            f.write(f"  - Average Peak: {int(avg_peak * 100)}%\n")
-            f.write(
-                f"  - Action: Reduced Discord volume to {int(self.REDUCTION * 100)}%\n"
-            )
-            f.write(f"  ⚠️  CHECK DISCORD NOW to see who is speaking!\n")
-            f.write("-" * 80 + "\n\n")
+        """Set up the background incident writer (text and/or JSON Lines)"""
+        text_path = self.log_file if self.LOG_FORMAT in ("text", "both") else None
+        jsonl_path = None
+        if self.LOG_FORMAT in ("jsonl", "both"):
+            jsonl_path = os.path.splitext(self.log_file)[0] + ".jsonl"
+        self.incident_log = IncidentLogWriter(
+            text_path=text_path,
+            jsonl_path=jsonl_path,
+            max_bytes=self.LOG_MAX_BYTES,
+            max_age=self.LOG_MAX_AGE_DAYS * 86400,
+            backups=self.LOG_BACKUPS,
+        )
 
-    def get_discord_session(self):
-        """Robustly detect Discord session with improved error handling"""
+    def register_metrics(self):
+        """Create the hot-path metrics and the gauges read at collect time"""
+        m = self.metrics
+        self.tick_seconds = m.histogram("monitor_tick_seconds", "Work per monitor tick, excluding the wait")
+        self.ticks_total = m.counter("monitor_ticks_total", "Monitor ticks completed")
+        self.detection_latency = m.histogram(
+            "detection_latency_seconds", "First loud sample to volume reduction", DETECTION_BUCKETS
+        )
+        self.incidents_total = m.counter("incidents_total", "Incidents detected")
+        self.distortion_gated = m.counter(
+            "distortion_gated_total", "Ticks whose sustained trip was ignored as loud but clean audio"
+        )
+        m.gauge("limiting", "1 while a volume reduction is active", lambda: int(self.is_limiting))
+        m.gauge("limiter_timers_pending", "Limiter state timers waiting to fire", lambda: len(self.timers))
+        m.gauge("trip_threshold", "Sustained-window trip level (learned in adaptive mode)", lambda: self.threshold)
+        for key in ("rate_hz", "missed", "overruns", "jitter_ms", "mean_lateness_ms", "max_lateness_ms"):
+            m.gauge(f"scheduler_{key}", "Tick scheduler statistics", lambda key=key: self.scheduler.stats()[key])
+        for key in ("hits", "misses", "invalidations", "enumerations", "cached_sessions"):
+            m.gauge(f"session_cache_{key}", "Session registry statistics", lambda key=key: self.sessions.stats()[key])
+        for key in ("written", "dropped", "errors"):
+            m.gauge(f"incident_log_{key}", "Incident log writer statistics",
+                    lambda key=key: getattr(self.incident_log, key))
+        m.gauge("flight_recorder_errors", "Flight recorder samples that could not be written",
+                lambda: self.recorder.errors if self.recorder else 0)
+
+    def record_error(self, error):
+        """Count a monitor-loop exception; the first of each kind is shown"""
+        name = type(error).__name__
+        counter = self.metrics.counter("monitor_errors_total", "Monitor ticks lost to exceptions", type=name)
+        if not counter.value:
+            self.renderer.message(f"⚠️  Monitor error ({name}): {error}")
+        counter.inc()
+
+    def start_metrics(self):
+        """Start the metrics endpoint and snapshot file if configured"""
+        if self.METRICS_PORT and self.metrics_server is None:
+            # Profiling samples the thread running the monitor loop
+            server = MetricsServer(self.metrics, self.METRICS_PORT, profile_thread=threading.get_ident())
+            try:
+                server.start()
+                self.metrics_server = server
+                print(f"📈 Metrics at http://127.0.0.1:{server.port}/metrics")
+            except OSError as e:
+                print(f"⚠️  Could not start metrics endpoint on port {self.METRICS_PORT}: {e}")
+        if self.METRICS_FILE and self.metrics_snapshot is None:
+            self.metrics_snapshot = SnapshotWriter(self.metrics, self.METRICS_FILE, self.METRICS_INTERVAL)
+            self.metrics_snapshot.start()
+
+    def stop_metrics(self):
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.metrics_snapshot:
+            self.metrics_snapshot.stop()
+            self.metrics_snapshot = None
+
+    def start_control(self):
+        """Open the control socket if configured (always in daemon mode)"""
+        if self.control is not None:
+            return
+        port = self.CONTROL_PORT or (CONTROL_DEFAULT_PORT if self.daemon and not self.CONTROL_SOCKET else 0)
+        if not port and not self.CONTROL_SOCKET:
+            return
+        path = None
+        # Relative paths live next to config.json
+        config_dir = os.path.dirname(self.config_file)
+        if self.CONTROL_SOCKET:
+            path = os.path.join(config_dir, self.CONTROL_SOCKET)
+        server = ControlServer(port=port, path=path, token_path=os.path.join(config_dir, CONTROL_TOKEN_FILE))
         try:
-            sessions = AudioUtilities.GetAllSessions()
-            discord_variants = ["discord.exe", "discordptb.exe", "discordcanary.exe",
-                              "discord", "discordptb", "discordcanary"]
+            server.start()
+        except OSError as e:
+            print(f"⚠️  Could not open the control socket at {path or port}: {e}")
+            return
+        self.control = server
+        m = self.metrics
+        m.gauge("control_clients", "Connected control socket clients", lambda: server.clients)
+        m.gauge("control_requests", "Control requests answered", lambda: server.served)
+        print(f"🔌 Control socket at {server.address} (python control.py status)")
 
-            for session in sessions:
-                if session.Process:
+    def stop_control(self):
+        if self.control:
+            self.control.stop()
+            self.control = None
+
+    def check_control(self):
+        """Answer queued control requests (called between ticks)"""
+        if self.control:
+            self.control.serve(self.handle_request)
+
+    def handle_request(self, request):
+        """Run one control request on the monitor thread; returns the response"""
+        cmd = request["cmd"]
+        if cmd == "status":
+            return self.status()
+        if cmd == "peaks":
+            seconds = float(request.get("seconds", self.PRE_INCIDENT_SECONDS))
+            if not math.isfinite(seconds) or seconds <= 0:
+                raise ValueError(f"seconds must be a positive number (got {request.get('seconds')!r})")
+            # The detector keeps no more history than this
+            return self.recent_peaks(min(seconds, self.PRE_INCIDENT_SECONDS))
+        if cmd == "config":
+            if "set" not in request:
+                # Values in effect, with restart-only edits listed separately
+                values = self.settings.as_dict()
+                pending = {key: values[key] for key in self.pending_restart}
+                values.update({key: getattr(self, key) for key in pending})
+                return {"settings": values, "pending_restart": pending}
+            save = request.get("save", False)
+            if not isinstance(save, bool):
+                raise ValueError(f"save must be true or false (got {save!r})")
+            applied, restart = self.configure(request["set"], save=save)
+            return {"applied": applied, "restart": restart, "saved": save}
+        if cmd in ("pause", "resume"):
+            self.set_paused(cmd == "pause")
+            return {"paused": self.paused}
+        raise ValueError(f"unknown command {cmd!r}")
+
+    def status(self):
+        """Current protection state for the control socket"""
+        status = {
+            "version": VERSION,
+            "running": self.is_running,
+            "paused": self.paused,
+            "limiting": self.is_limiting,
+            "threshold": round(self.threshold, 4),
+            "incidents": int(self.incidents_total.value),
+        }
+        if self.multi_app:
+            status["sessions"] = self.multi_app.status()
+            return status
+        session = self.watcher.current()
+        status["state"] = self.envelope.phase
+        status["session"] = None
+        if session:
+            recent = self.detector.recent(1)
+            status["session"] = {
+                "process": session.name,
+                "pid": session.pid,
+                "peak": round(recent[0], 4) if recent else 0.0,
+                "volume": None if self.session_volume is None else round(self.session_volume, 4),
+            }
+        return status
+
+    def recent_peaks(self, seconds):
+        """Peak history (fast-rate samples, oldest first) kept by the detector"""
+        if seconds < 0:
+            raise ValueError("seconds must not be negative")
+        count = self.window_samples(seconds / WINDOW_UNIT)
+        if self.multi_app:
+            return {"sample_rate": self.FAST_SAMPLE_RATE, "sessions": self.multi_app.recent_peaks(count)}
+        return {"sample_rate": self.FAST_SAMPLE_RATE,
+                "peaks": [round(peak, 4) for peak in self.detector.recent(count)]}
+
+    def set_paused(self, paused):
+        """Pause or resume protection; pausing hands any reduced volume back"""
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if paused:
+            if self.multi_app:
+                self.multi_app.pause()
+            elif self.envelope.active:
+                self.envelope.cancel(self.clock.time())
+                session = self.watcher.current()
+                if session:
                     try:
-                        process_name = session.Process.name()
-                        if process_name:
-                            name_lower = process_name.lower()
-                            # Check if any Discord variant matches
-                            if any(variant in name_lower for variant in discord_variants):
-                                return session
-                    except (AttributeError, OSError) as e:
-                        # Process may have terminated, skip it
-                        continue
-                    except Exception as e:
-                        # Log unexpected errors but continue searching
-                        continue
+                        self.sessions.controls(session).set_volume(self.DEFAULT_VOLUME)
+                        self.envelope.sync(self.DEFAULT_VOLUME)
+                    except Exception:
+                        self.sessions.invalidate(session)
+        if self.control:
+            self.control.publish("pause", paused=paused, time=time.time())
+        self.renderer.message("⏸️  Protection paused" if paused else "▶️  Protection resumed")
+
+    def log_incident(self, peak_level, avg_peak, loudness=None, window=None,
+                     time_to_action=None, session=None, app=None, reduction=None,
+                     window_seconds=None, pre_incident=None, distortion=None):
+        """Build an ear-rape incident record; submit_incidents() queues it at the end of the tick"""
+        self.incidents_total.inc()
+        if time_to_action is not None:
+            self.detection_latency.observe(time_to_action)
+        if pre_incident is None:
+            pre_incident = self.detector.recent(self.window_samples(self.PRE_INCIDENT_SECONDS / WINDOW_UNIT))
+        if window_seconds is None:
+            window_seconds = (self.FAST_WINDOW if window == "fast" else self.PEAK_WINDOW) * WINDOW_UNIT
+        record = {
+            "time": time.time(),
+            "peak": round(float(peak_level), 4),
+            "average": round(float(avg_peak), 4),
+            "loudness": None if loudness is None else round(float(loudness), 2),
+            "distortion": None if distortion is None else round(float(distortion), 3),
+            "window": window or "sustained",
+            "window_seconds": window_seconds,
+            "time_to_action": None if time_to_action is None else round(time_to_action, 4),
+            "reduction": self.REDUCTION if reduction is None else reduction,
+            "app": app,
+            "process": session.name if session else None,
+            "pid": session.pid if session else None,
+            "sample_rate": self.FAST_SAMPLE_RATE,
+            "snapshot": None,
+            "pre_incident": [round(v, 3) for v in pre_incident],
+        }
+        self._pending_incidents.append(record)
+
+    def submit_incidents(self):
+        """Queue this tick's incidents for the background writer (after the recorder sample)"""
+        if not self._pending_incidents:
+            return
+        # Taken after the tick's sample so it ends with the peak that tripped. In
+        # multi-app mode the recorder follows the loudest session, which need not
+        # be the one that tripped, so snapshots are named by time only
+        snapshot = self.recorder.snapshot(self.clock.time()) if self.recorder else None
+        records, self._pending_incidents = self._pending_incidents, []
+        for record in records:
+            record["snapshot"] = snapshot
+            self.incident_log.submit(record)
+            if self.control:
+                self.control.publish("incident", **record)
+
+    def get_discord_session(self):
+        """Robustly detect Discord session with improved error handling"""
+        try:
+            return self.sessions.find(DISCORD_VARIANTS)
         except Exception as e:
             print(f"❌ Error getting audio sessions: {e}")
 
@@ -304,57 +884,91 @@ class DiscordOutputLimiter:
     def get_discord_peak_level(self, session):
         """Get Discord's audio output peak level"""
         try:
-            meter = session._ctl.QueryInterface(IAudioMeterInformation)
-            return meter.GetPeakValue()
+            return self.sessions.controls(session).get_peak()
         except Exception:
+            # Stale handle: resolve the interfaces again on the next tick
+            self.sessions.invalidate(session)
             return 0.0
 
     def monitor_discord_output(self):
         """Monitor Discord's actual audio output with improved session detection"""
+        if self.MULTI_APP:
+            self.monitor_apps()
+            return
+
         print("\n" + "=" * 70)
         print("🎮 Discord Output Monitor & Limiter")
         print("=" * 70)
-        print(f"\n📊 Trigger Threshold: {int(self.THRESHOLD * 100)}% peak")
+        print(f"\n📊 Trigger Threshold: {int(self.THRESHOLD * 100)}% peak"
+              + (" (until the adaptive baseline is learned)" if self.ADAPTIVE_THRESHOLD else ""))
         print(f"📉 Will reduce to: {int(self.REDUCTION * 100)}%")
         print(f"🔊 Default volume: {int(self.DEFAULT_VOLUME * 100)}%")
-        print(f"⏱️  Must sustain {self.PEAK_WINDOW / 10:.1f}s to trigger")
+        print(f"⏱️  Must sustain {self.PEAK_WINDOW * WINDOW_UNIT:.1f}s to trigger")
+        if self.FAST_WINDOW > 0:
+            print(f"⚡ Fast trip: {int(self.FAST_THRESHOLD * 100)}% over {self.FAST_WINDOW * WINDOW_UNIT:.1f}s")
+        print(f"📡 Sampling: {self.FAST_SAMPLE_RATE} Hz when active, {self.IDLE_SAMPLE_RATE} Hz when quiet")
         print(f"📝 Logging incidents to: {self.log_file}")
         print("\n💡 Monitoring Discord's AUDIO OUTPUT (what you hear)")
         print("⚠️  When ear-rape is detected, check Discord to see who's speaking!")
         print("=" * 70 + "\n")
 
-        # Wait for Discord session with retry logic
-        session = None
-        retry_count = 0
-        max_retries = 30  # 60 seconds total (30 * 2s)
+        # Settings may have changed since __init__, size the windows now
+        self.threshold = self.THRESHOLD
+        self.detector = self.create_detector()
+        self.scheduler = self.create_scheduler()
+        self.envelope = self.create_envelope()
+        self.capture = self.open_capture()
+        self.incident_log.start()
+        self.start_metrics()
+        self.start_control()
+        self.recorder = self.open_flight_recorder()
+        self.baseline = self.open_baseline()
 
         print("🔍 Searching for Discord process...")
         print("   Make sure Discord is running and playing audio!")
 
         self.is_running = True
 
-        while not session and retry_count < max_retries:
+        # Session discovery runs on the watcher thread from here on
+        self.watcher.start()
+        session = None
+        wait_started = self.clock.time()
+        # A daemon keeps waiting; the console gives up after a minute
+        max_wait = math.inf if self.daemon else 60  # seconds
+        last_elapsed = 0
+
+        while self.is_running and not session and self.clock.time() - wait_started < max_wait:
             try:
-                session = self.get_discord_session()
+                self.check_control()
+                session = self.watcher.current()
                 if session:
                     print("✅ Discord session detected and locked!")
+                    if self.startup:
+                        self.startup.mark("session found")
                     # Initialize volume
-                    vol_iface = session._ctl.QueryInterface(ISimpleAudioVolume)
-                    vol_iface.SetMasterVolume(self.DEFAULT_VOLUME, None)
+                    self.sessions.controls(session).set_volume(self.DEFAULT_VOLUME)
+                    if self.baseline:
+                        self.baseline.set_rows([session.name])
                     break
 
-                retry_count += 1
-                elapsed = retry_count * 2
-                print(f"⏳ Waiting for Discord... ({elapsed}s elapsed)                     ", end="\r")
-                time.sleep(2)
+                elapsed = int(self.clock.time() - wait_started)
+                if elapsed != last_elapsed:
+                    last_elapsed = elapsed
+                    print(f"⏳ Waiting for Discord... ({elapsed}s elapsed)                     ", end="\r")
+                self.clock.sleep(0.1)
 
             except KeyboardInterrupt:
                 print("\n❌ Cancelled by user")
                 self.is_running = False
+                self.watcher.stop()
+                self.stop_metrics()
+                self.stop_control()
+                self.close_flight_recorder()
+                self.close_baseline()
                 return
             except Exception as e:
                 print(f"\n⚠️  Error during detection: {e}")
-                time.sleep(2)
+                self.clock.sleep(0.1)
 
         if not session:
             print("\n❌ Could not find Discord after 60 seconds.")
@@ -363,111 +977,169 @@ class DiscordOutputLimiter:
             print("   • You're in a voice channel or playing audio")
             print("   • Discord is not muted in Windows Volume Mixer")
             self.is_running = False
+            self.watcher.stop()
+            self.stop_metrics()
+            self.stop_control()
+            self.close_flight_recorder()
+            self.close_baseline()
             return
 
-        # Start monitoring loop with session recovery
-        last_session_check = time.time()
-        SESSION_CHECK_INTERVAL = 5  # Re-verify session every 5 seconds
+        # Start monitoring loop; the watcher reports session changes
+        seen_version = self.watcher.version
+        self.renderer.start()
+        self.scheduler.start()
+        loud_since = None
 
         while self.is_running:
             try:
-                # Periodically re-check if Discord session is still valid
-                if time.time() - last_session_check > SESSION_CHECK_INTERVAL:
-                    test_session = self.get_discord_session()
-                    if not test_session:
-                        print("\n⚠️  Discord session lost! Reconnecting...")
-                        session = None
-                        while not session and self.is_running:
-                            session = self.get_discord_session()
-                            if session:
-                                print("✅ Reconnected to Discord!")
-                                vol_iface = session._ctl.QueryInterface(ISimpleAudioVolume)
-                                vol_iface.SetMasterVolume(self.DEFAULT_VOLUME, None)
-                                break
-                            time.sleep(2)
+                tick_start = time.perf_counter()
+                self.check_config(self.clock.time())
+                self.check_control()
+                # Phase ends (attack, hold, release) due since the last tick
+                self.timers.run_due(self.clock.time())
+                if self.watcher.version != seen_version:
+                    seen_version = self.watcher.version
+                    changed_session = self.watcher.current()
+                    if not changed_session:
+                        self.renderer.message("⚠️  Discord session lost! Waiting for it to come back...")
                     else:
-                        session = test_session
-                    last_session_check = time.time()
+                        self.renderer.message("✅ Reconnected to Discord!")
+                        self.sessions.controls(changed_session).set_volume(self.DEFAULT_VOLUME)
+                        self.detector.reset()
+                        if self.baseline:
+                            self.baseline.set_rows([changed_session.name])
+                            self._baseline_due = 0.0
+                    session = changed_session
 
                 if not session:
-                    time.sleep(1)
+                    # Keep ticking so a returning session is picked up at once
+                    self.scheduler.observe(0.0)
+                    self.scheduler.wait()
                     continue
 
+                controls = self.sessions.controls(session)
                 peak_level = self.get_discord_peak_level(session)
-                self.peak_history.append(peak_level)
-                if len(self.peak_history) > self.PEAK_WINDOW:
-                    self.peak_history.pop(0)
-
-                vol_iface = session._ctl.QueryInterface(ISimpleAudioVolume)
-                current_volume = vol_iface.GetMasterVolume()
-
-                if len(self.peak_history) >= self.PEAK_WINDOW:
-                    avg_peak = np.mean(self.peak_history)
-                    max_peak = max(self.peak_history)
-                    if avg_peak > self.THRESHOLD and not self.is_limiting:
-                        self.is_limiting = True
-                        vol_iface.SetMasterVolume(self.REDUCTION, None)
-                        self.log_incident(max_peak, avg_peak)
+                # Slow ticks stand for several fast samples so the windows
+                # always cover the same stretch of time
+                self.detector.update(peak_level, self.scheduler.samples_per_tick)
+
+                current_volume = controls.get_volume()
+                self.session_volume = current_volume
+
+                now = self.clock.time()
+                if self.baseline:
+                    self.track_baseline(now)
+                # Start of the current run of above-threshold samples
+                if peak_level > self.threshold:
+                    if loud_since is None:
+                        loud_since = now
+                else:
+                    loud_since = None
+                tripped = self.detector.tripped()
+                loud = False
+                if self.capture:
+                    self.capture.poll()
+                    loud = self.capture.meter.momentary_lufs > self.LOUDNESS_THRESHOLD
+                    if (tripped == "sustained" and not self.is_limiting and self.DISTORTION_THRESHOLD > 0
+                            and self.capture.distortion_score < self.DISTORTION_THRESHOLD):
+                        # Loud but clean (a raised voice, music): not ear-rape
+                        self.distortion_gated.inc()
+                        tripped = None
+                    if not tripped and self.capture.short_term_lufs > self.LOUDNESS_THRESHOLD:
+                        tripped = LOUDNESS_TRIP
+                if self.paused:
+                    # Keep metering for the control socket, but never limit
+                    tripped = None
+                if tripped or self.detector.ready():
+                    window = None if tripped == LOUDNESS_TRIP else tripped
+                    avg_peak = self.detector.mean(window)
+                    max_peak = self.detector.max(window)
+                    # A blast during the release ramp re-attenuates at once
+                    if tripped and self.envelope.phase in (IDLE, RELEASE):
+                        if not self.envelope.active:
+                            self.envelope.sync(current_volume)
+                        self.envelope.trigger(now, self.REDUCTION, self.DEFAULT_VOLUME)
+                        self.apply_envelope(controls, now)
+                        self.log_incident(
+                            max_peak,
+                            avg_peak,
+                            loudness=self.capture.short_term_lufs if self.capture else None,
+                            distortion=self.capture.distortion_score if self.capture else None,
+                            window=tripped,
+                            time_to_action=now - loud_since if loud_since is not None else None,
+                            session=session,
+                        )
                         timestamp = datetime.now().strftime("%H:%M:%S")
-                        print(
-                            f"\n🔇 [{timestamp}] EAR-RAPE DETECTED! Discord reduced to {int(self.REDUCTION*100)}%"
+                        self.renderer.message(
+                            f"🔇 [{timestamp}] EAR-RAPE DETECTED! Discord reduced to {int(self.REDUCTION*100)}%"
                         )
-                        threading.Thread(target=self.restore_after_delay, daemon=True).start()
-                    elif avg_peak <= self.THRESHOLD * 0.7 and self.is_limiting:
-                        self.restore_volume_now()
-
-                # Visual display
-                status = "🔴 LIMITING" if self.is_limiting else "🟢 MONITORING"
-                peak_bar = "█" * int(peak_level * 30)
-                peak_pct = int(peak_level * 100)
-                vol_bar = "█" * int(current_volume * 20)
-                vol_pct = int(current_volume * 100)
-                if peak_level > 0.85:
-                    indicator = "🔴 VERY LOUD"
-                elif peak_level > 0.6:
-                    indicator = "🟡 LOUD"
-                elif peak_level > 0.2:
-                    indicator = "🟢 ACTIVE"
-                else:
-                    indicator = "🔵 QUIET"
+                    elif avg_peak <= self.threshold * 0.7 and self.is_limiting and not loud:
+                        self.envelope.release(now)
+                self.apply_envelope(controls, now)
+                if self.startup:
+                    self.finish_startup_profile()
+                if self.recorder:
+                    volume = self.envelope.written if self.envelope.active else current_volume
+                    self.recorder.record(now, peak_level, volume, self.envelope.phase)
+                self.submit_incidents()
 
-                print(
-                    f"{status} | Peak:[{peak_bar:<30}]{peak_pct:3d}% | Vol:[{vol_bar:<20}]{vol_pct:3d}% | {indicator}    ",
-                    end="\r",
+                # Visual display happens on the renderer thread
+                self.renderer.update(
+                    self.is_limiting,
+                    peak_level,
+                    current_volume,
+                    self.capture.short_term_lufs if self.capture else None,
                 )
 
+                self.scheduler.observe(peak_level, self.is_limiting or loud)
+                self.tick_seconds.observe(time.perf_counter() - tick_start)
+                self.ticks_total.inc()
+
             except Exception as e:
-                # Log errors but keep trying
-                time.sleep(1)
+                # Count errors but keep trying with freshly resolved interfaces
+                self.record_error(e)
+                if session:
+                    self.sessions.invalidate(session)
+                self.clock.sleep(1)
 
-            time.sleep(0.1)
+            self.scheduler.wait()
 
-    def restore_after_delay(self):
-        time.sleep(self.RECOVERY_TIME)
-        self.restore_volume_now()
+        self.watcher.stop()
+        self.renderer.stop()
+        if self.capture:
+            self.capture.stop()
+        self.incident_log.stop()
+        self.stop_metrics()
+        self.stop_control()
+        self.close_flight_recorder()
+        self.close_baseline()
 
-    def restore_volume_now(self):
-        if not self.is_limiting:
-            return
-        session = self.get_discord_session()
-        if session:
-            try:
-                vol_iface = session._ctl.QueryInterface(ISimpleAudioVolume)
-                current = vol_iface.GetMasterVolume()
-                target = self.DEFAULT_VOLUME
-                steps = 20
-                step_size = (target - current) / steps
-                for _ in range(steps):
-                    if not self.is_running:
-                        break
-                    current += step_size
-                    vol_iface.SetMasterVolume(min(current, 1.0), None)
-                    time.sleep(0.05)
-                print(f"\n🔊 RESTORED: Discord back to {int(target*100)}%                    ")
-            except Exception:
-                pass
-        self.is_limiting = False
-        self.peak_history.clear()
+    def finish_startup_profile(self):
+        """Report the startup timeline once the first protected tick has run"""
+        self.startup.mark("first protected tick")
+        self.renderer.message(self.startup.report())
+        self.startup = None
+
+    def monitor_apps(self):
+        """Protect every application listed under APPS from one loop"""
+        # NumPy is only needed for multi-app metering
+        from multi_app import MultiAppMonitor, SessionPolicy
+
+        self.scheduler = self.create_scheduler()
+        self.incident_log.start()
+        self.start_metrics()
+        self.start_control()
+        self.recorder = self.open_flight_recorder()
+        self.baseline = self.open_baseline()
+        self.is_running = True
+        self.multi_app = MultiAppMonitor(self, SessionPolicy.from_config(self.APPS, self))
+        self.multi_app.run()
+
+    def apply_envelope(self, controls, now):
+        """Advance the gain envelope and write the volume only if it moved"""
+        gain = self.envelope.advance(now)
+        if gain is not None:
+            controls.set_volume(min(gain, 1.0))
 
     def start(self):
         if self.is_running:
@@ -481,31 +1153,68 @@ class DiscordOutputLimiter:
 
     def stop(self):
         self.is_running = False
+        self.watcher.stop()
+        self.renderer.stop()
+        if self.capture:
+            self.capture.stop()
+        self.incident_log.stop()
+        self.stop_metrics()
+        self.stop_control()
+        self.close_flight_recorder()
+        self.close_baseline()
+        if self.multi_app:
+            self.multi_app.stop()
+            self.multi_app = None
         session = self.get_discord_session()
         if session and self.is_limiting:
             try:
-                vol_iface = session._ctl.QueryInterface(ISimpleAudioVolume)
-                vol_iface.SetMasterVolume(self.DEFAULT_VOLUME, None)
+                self.sessions.controls(session).set_volume(self.DEFAULT_VOLUME)
             except Exception:
                 pass
+        stats = self.scheduler.stats()
         print("\n\n❌ Stopped")
+        if stats["ticks"]:
+            print(
+                f"📊 {stats['ticks']} ticks | {stats['missed']} missed | {stats['overruns']} overruns"
+                f" | jitter {stats['jitter_ms']:.1f} ms | max late {stats['max_lateness_ms']:.1f} ms"
+            )
 
 
 if __name__ == "__main__":
+    startup = StartupProfile()
+    parser = argparse.ArgumentParser(description="Discord Ear-Rape Protection")
+    parser.add_argument("--headless", action="store_true",
+                        help="no live status line (for services and hosts without a console)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run headless in the background, keep waiting for Discord and serve the"
+                             " control socket (CONTROL_PORT, default %d)" % CONTROL_DEFAULT_PORT)
+    parser.add_argument("--update", action="store_true",
+                        help="check for updates, offer to install them, and exit")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print how long startup took once the first protected tick has run")
+    args = parser.parse_args()
+
     print("=" * 70)
     print("🎧 Discord Ear-Rape Protection")
     print(f"   Version {VERSION}")
     print("=" * 70)
+
+    if args.update:
+        print("🔍 Checking for updates...")
+        check_for_updates()
+        sys.exit(0)
+
     print("\nThis monitors Discord's AUDIO OUTPUT and limits volume")
     print("when someone is ear-raping (sustained loud audio)")
     print("\n⚠️  IMPORTANT: When ear-rape is detected, immediately check Discord")
     print("   to see who is speaking and manually note their username/ID!")
     print("   All incidents are logged to 'earrape_incidents.log'\n")
 
-    print("🔍 Checking for updates...")
-    check_for_updates()
-
-    limiter = DiscordOutputLimiter()
+    # Protection starts right away; the version check runs alongside it
+    limiter = DiscordOutputLimiter(headless=args.headless or args.daemon, daemon=args.daemon,
+                                   startup=startup if args.startup_profile else None)
+    startup.mark("limiter created")
+    check_for_updates_in_background(limiter.renderer.message)
     try:
         limiter.start()
     except KeyboardInterrupt:
@@ -0,0 +1,82 @@
+import queue
+import threading
+
+
+class BackgroundWorker:
+    """One long-lived thread for deferred file writes off the monitor path
+
+    The thread is created by start() at startup and runs jobs one at a
+    time in the order they were submitted, so a burst of incidents never
+    creates threads while protection is running. The queue is bounded: a
+    full queue drops the job (counted in dropped) rather than blocking the
+    monitor. Before start() or after stop(), submit() runs the job inline.
+    """
+
+    def __init__(self, name, queue_size=16, poll_interval=0.5):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args):
+        """Queue function(*args); returns False if it had to be dropped"""
+        if not self.running:
+            self._call(function, args)
+            return True
+        try:
+            self._queue.put_nowait((function, args))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=5.0):
+        """Finish every queued job, then end the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still writing: leave the rest to the (daemon) thread
+                return
+            self._thread = None
+        self._drain()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                function, args = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            self._call(function, args)
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                function, args = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._call(function, args)
+
+    def _call(self, function, args):
+        try:
+            function(*args)
+            self.completed += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"\n⚠️  Background {self.name} job failed: {e}")